@@ -4,24 +4,29 @@ import json
 import logging
 import tempfile
 import threading
-import wave
+import time
 from dataclasses import dataclass
-from importlib.resources import as_file, files
 from pathlib import Path
-from typing import Optional
+from typing import AsyncIterator, Optional
 
 import numpy as np
-import sounddevice as sd
-import soundfile as sf
-from asyncua import Client, ua
 from openai import AsyncOpenAI
 from transitions.extensions.asyncio import AsyncMachine
 
+from .helper.audio.capture import CaptureEngine, Recording
+from .helper.audio.encoding import encode_for_upload
+from .helper.audio.playback import AudioEngine
+from .helper.audio.sounds import SoundBank
+from .helper.audio.vad import VoiceActivityDetector
+from .helper.completion import CompletionStream
 from .helper.configuration import Configuration
 from .helper.controller.base import Button, State
 from .helper.controller.joycon import JoyCon
 from .helper.controller.keyboard import Keyboard
+from .helper.embedding_cache import EmbeddingCache
 from .helper.message import Conversation, Message, MessageRole
+from .helper.publisher import StatePublisher
+from .helper.speech import SpeechPipeline
 from .helper.tools.base import Tool
 from .helper.tools.database_read import DatabaseRead
 from .helper.tools.opcua_read import OPCUARead
@@ -34,8 +39,14 @@ logger = logging.getLogger(__name__)
 
 @dataclass
 class Arguments:
-    user_recording_path: Path | None
+    user_recording: np.ndarray | None
     model_response: str
+    response_stream: CompletionStream | None
+
+    # progress of the tool loop within the current turn
+    tool_steps: int = 0
+    tool_tokens: int = 0
+    turn_started: float = 0.0
 
 
 class States(enum.Enum):
@@ -51,13 +62,17 @@ class States(enum.Enum):
 class Assistant:
     states = [state.value for state in States]
 
+    RECORDING_SAMPLE_RATE = 44100
+    PLAYBACK_SAMPLE_RATE = 24000  # OpenAI's TTS default rate
+
     def __init__(self, config: Configuration, directory: Path):
         self._config = config
         self._working_directory = directory
 
         self._args = Arguments(
-            user_recording_path=None,
+            user_recording=None,
             model_response=None,
+            response_stream=None,
         )
 
         self._controller = (
@@ -65,22 +80,46 @@ class Assistant:
         )
         logger.info(f"Using {self._controller.__class__.__name__} controller")
 
+        self._sounds = SoundBank(sample_rate=self.PLAYBACK_SAMPLE_RATE)
+        self._sounds.load_package("msm_assistant.assets")
+        self._audio = AudioEngine(self._sounds, sample_rate=self.PLAYBACK_SAMPLE_RATE)
+        self._capture = CaptureEngine(sample_rate=self.RECORDING_SAMPLE_RATE)
+
         self._openai_client = AsyncOpenAI()
         self._conversation = Conversation(
             Message.create(MessageRole.DEVELOPER, content=self._config.chat.prompt)
         )
-        self._opcua_client = (
-            Client(url=self._config.opcua.url)
-            if self._config.additional.get("use_opcua_rag")
-            else None
-        )
+        self._publisher: StatePublisher | None = None
+        if self._config.additional.get("share_state"):
+            opcua = self._config.opcua
+            self._publisher = StatePublisher(
+                url=opcua.url,
+                state_node_id=opcua.state_node_id,
+                conversation_node_id=opcua.conversation_node_id,
+                read_state=lambda: self.state,
+                read_conversation=lambda: self._conversation.to_json(
+                    last=opcua.publish_last
+                ),
+                window=opcua.publish_window,
+            )
+            self._conversation.add_listener(self._publisher.notify)
+
+        self._summary_task: asyncio.Task | None = None
 
         self._tools: dict[str, Tool] = {}
         self._populate_tools()
 
+        states = Assistant.states
+        if self._publisher:
+            # * publish on entry, as the on_enter_* callbacks only return once the
+            # * next state has been entered
+            states = [
+                {"name": state, "on_enter": [self._publisher.notify]}
+                for state in states
+            ]
         self._machine = AsyncMachine(
             model=self,
-            states=Assistant.states,
+            states=states,
             initial=States.INITIAL.value,
         )
         self._populate_machine()
@@ -91,10 +130,17 @@ class Assistant:
                 url=self._config.database.url,
                 collection=self._config.database.collection,
                 description=self._config.database.description,
+                cache=EmbeddingCache(self._config.database.embedding_cache),
+                local_index=self._config.database.local_index,
+                max_local_points=self._config.database.max_local_points,
+                snapshot=self._config.database.index_snapshot,
+                refresh_interval=self._config.database.refresh_interval,
+                payload_fields=self._config.database.payload_fields,
+                max_limit=self._config.database.max_limit,
+                score_threshold=self._config.database.score_threshold,
+                max_tokens=self._config.database.max_result_tokens,
             )
-        self._opcua_client = None
         if self._config.additional.get("use_opcua_rag"):
-            self._opcua_client = Client(url=self._config.opcua.url)
             self._tools[OPCUARead.name()] = OPCUARead(
                 url=self._config.opcua.url, categories=self._config.opcua.categories
             )
@@ -138,6 +184,10 @@ class Assistant:
         )
 
     async def on_enter_initial(self):
+        # start the audio engines (the input stream stays open for the session)
+        await self._audio.start()
+        await self._capture.start()
+
         # initialise the controller listen
         await self._controller.listen()
         logger.info("Started controller listener")
@@ -147,40 +197,34 @@ class Assistant:
             await tool.init()
             logger.info(f"Tool {tool.name()} initialized")
 
-        # initialise the opcua client
-        if self._config.additional.get("share_state"):
-            await self._opcua_client.connect()
-            asyncio.create_task(self._update_state())
-            logger.info("Connected to OPCUA server")
+        # publish state changes to the opcua server
+        if self._publisher:
+            await self._publisher.start()
 
         # transition to idle
         await self.start_idle()
 
     async def on_enter_reset(self):
         logger.info("Resetting conversation...")
+        if self._summary_task:
+            self._summary_task.cancel()
         self._conversation.reset()
-        self._args.user_recording_path = None
+        self._args.user_recording = None
         self._args.model_response = None
+        await self._close_response_stream()
 
         await self.start_idle()
 
     async def on_enter_error(self):
         logger.error("An error occurred. Please check the logs.")
 
-        sound_path = files("msm_assistant.assets").joinpath("error.wav")
-        with as_file(sound_path) as path:
-            # path is a pathlib.Path you can hand to sounddevice, pydub, etc.
-            data, sample_rate = sf.read(path, dtype="int16")
-            sd.play(data, sample_rate, blocking=True)
+        await self._audio.play("error")
 
         await self.start_reset()
 
     async def on_enter_idle(self):
         # play idle sound
-        sound_path = files("msm_assistant.assets").joinpath("available_chime.wav")
-        with as_file(sound_path) as path:
-            data, sample_rate = sf.read(path, dtype="int16")
-            sd.play(data, sample_rate, blocking=True)
+        await self._audio.play("available_chime", wait=False)
 
         # await on controller input
         event = asyncio.Event()
@@ -209,13 +253,14 @@ class Assistant:
             await self.start_listening()
 
     async def on_enter_listening(self):
-        TIMEOUT = 10  # seconds
+        GRACE_PERIOD = 2  # seconds
+        TIMEOUT = self._config.recording.max_duration + GRACE_PERIOD
 
-        # play listening sound
-        sound_path = files("msm_assistant.assets").joinpath("button_chime.wav")
-        with as_file(sound_path) as path:
-            data, sample_rate = sf.read(path, dtype="int16")
-            sd.play(data, sample_rate, blocking=True)
+        # play listening sound (waiting so that it is not recorded)
+        await self._audio.play("button_chime")
+        # * the chime's tail is still being heard and captured for the stream latencies
+        echo = self._audio.latency + self._capture.latency
+        chime_end = self._capture.position + int(echo * self._capture.sample_rate)
 
         # wait for a button press
         stop_flag = threading.Event()
@@ -232,8 +277,8 @@ class Assistant:
 
         listener_id = await self._controller.add_listener(listener)
         try:
-            self._args.user_recording_path = await asyncio.wait_for(
-                asyncio.to_thread(self._record_audio, stop_flag),
+            self._args.user_recording = await asyncio.wait_for(
+                asyncio.to_thread(self._record_audio, stop_flag, chime_end),
                 timeout=TIMEOUT,
             )
         except asyncio.TimeoutError:
@@ -256,28 +301,23 @@ class Assistant:
 
     async def on_enter_processing(self):
         # play processing sound
-        sound_path = files("msm_assistant.assets").joinpath("correct_chime.wav")
-        with as_file(sound_path) as path:
-            data, sample_rate = sf.read(path, dtype="int16")
-            sd.play(data, sample_rate, blocking=True)
+        await self._audio.play("correct_chime", wait=False)
 
         try:
             # transcribe speech
-            user_text = await self._transcribe_audio(self._args.user_recording_path)
+            user_text = await self._transcribe_audio(self._args.user_recording)
             logger.info(f"User: {user_text}")
             self._conversation.add(Message.create(MessageRole.USER, content=user_text))
 
-            # generate response
-            messages = await self._generate_response(self._conversation)
+            # generate response (the reply itself is streamed while speaking)
+            messages, self._args.response_stream = await self._generate_response(
+                self._conversation
+            )
             for message in messages:
                 self._conversation.add(message)
-
-            self._args.model_response = messages[-1].content
-            logger.info(f"Assistant: {self._args.model_response}")
         except Exception as e:
             # transition to error state
             logger.error(f"Error during processing: {e}")
-            sd.stop()
             await self.start_error()
             return
 
@@ -285,11 +325,8 @@ class Assistant:
         await self.start_speaking()
 
     async def on_enter_speaking(self):
-        # play speaking sound
-        sound_path = files("msm_assistant.assets").joinpath("start_chime.wav")
-        with as_file(sound_path) as path:
-            data, sample_rate = sf.read(path, dtype="int16")
-            sd.play(data, sample_rate, blocking=True)
+        # play speaking sound (speech is mixed over it as soon as it arrives)
+        await self._audio.play("start_chime", wait=False)
 
         event = asyncio.Event()
 
@@ -301,44 +338,102 @@ class Assistant:
         # stream the audio while checking for interruptions
         logger.info(f"Generating speech... Press {Button.SECONDARY} to interrupt")
         listener_id = await self._controller.add_listener(listener)
+        preambles: list[str] = []  # * text already recorded with tool calls
+        failed = False
         try:
-            await self._generate_speech(self._args.model_response, event)
+            self._args.model_response = await self._generate_speech(
+                self._reply_text(preambles), event
+            )
+            logger.info(f"Assistant: {self._args.model_response}")
+            reply = self._args.model_response[len("".join(preambles)) :]
+            self._conversation.add(Message.create(MessageRole.ASSISTANT, content=reply))
         except Exception as e:
-            # transition to error state
             logger.error(f"Error during speech generation: {e}")
-            await self._controller.remove_listener(listener_id)
+            failed = True
+        finally:
+            #! closed before transitioning, as entering the next state only returns
+            #! once the next interaction has finished
+            await self._close_response_stream()
+        await self._controller.remove_listener(listener_id)
+
+        if failed:
+            # transition to error state
             await self.start_error()
             return
 
+        # keep the context within budget without delaying the next turn
+        self._schedule_summary()
+
         # transition to idle (either through interruption or finishing)
-        await self._controller.remove_listener(listener_id)
         await self.start_idle()
 
-    async def _update_state(self):
-        POLLING_PERIOD = 0.2  # seconds
-        state_node = self._opcua_client.get_node(self._config.opcua.state_node_id)
-        conversation_node = self._opcua_client.get_node(
-            self._config.opcua.conversation_node_id
+    async def _close_response_stream(self) -> None:
+        stream, self._args.response_stream = self._args.response_stream, None
+        if stream is not None:
+            await stream.close()
+
+    def _schedule_summary(self) -> None:
+        if self._summary_task and not self._summary_task.done():
+            return  # * the next turn will schedule another summary if required
+
+        self._summary_task = asyncio.create_task(self._summarise_conversation())
+
+    async def _summarise_conversation(self) -> None:
+        SUMMARY_PROMPT = (
+            "Summarise the following conversation between a user and a lab assistant "
+            "in a single short paragraph. Keep names, numbers, lab equipment and any "
+            "facts retrieved by tools that may be needed later. Do not add anything "
+            "that is not in the conversation."
         )
 
-        while True:
-            await state_node.write_value(
-                ua.Variant(
-                    self.state,
-                    ua.VariantType.String,
-                )
+        messages = self._conversation.foldable(
+            self._config.chat.context_budget, self._config.chat.keep_turns
+        )
+        if not messages:
+            return
+
+        try:
+            completion = await self._openai_client.chat.completions.create(
+                model=self._config.chat.model,
+                messages=[
+                    {"role": MessageRole.DEVELOPER.value, "content": SUMMARY_PROMPT},
+                    {
+                        "role": MessageRole.USER.value,
+                        "content": self._conversation.transcript(messages),
+                    },
+                ],
             )
-            await conversation_node.write_value(
-                ua.Variant(
-                    json.dumps(self._conversation.to_messages(to_dict=True)),
-                    ua.VariantType.String,
-                )
+            self._conversation.fold(messages, completion.choices[0].message.content)
+            logger.info(
+                f"Folded {len(messages)} messages into the conversation summary "
+                f"({self._conversation.tokens} tokens in context)"
+            )
+        except Exception as e:
+            logger.error(f"Error during conversation summarisation: {e}")
+
+    async def _generate_speech(
+        self, deltas: AsyncIterator[str], stop_flag: asyncio.Event
+    ) -> str:
+        pipeline = SpeechPipeline(
+            synthesise=self._synthesise_speech, play=self._audio.enqueue_pcm
+        )
+        try:
+            text = await pipeline.run(deltas, stop_flag)
+
+            # wait for the queued speech to finish playing unless interrupted
+            playing = asyncio.create_task(self._audio.drain())
+            interrupted = asyncio.create_task(stop_flag.wait())
+            await asyncio.wait(
+                {playing, interrupted}, return_when=asyncio.FIRST_COMPLETED
             )
-            await asyncio.sleep(POLLING_PERIOD)
+            playing.cancel()
+            interrupted.cancel()
+        finally:
+            self._audio.clear_speech()
 
-    async def _generate_speech(self, text: str, stop_flag: asyncio.Event):
-        SAMPLE_RATE = 24000  # OpenAI's TTS default rate
+        return text
 
+    async def _synthesise_speech(self, text: str) -> AsyncIterator[bytes]:
         async with self._openai_client.audio.speech.with_streaming_response.create(
             model=self._config.speech.model,
             voice=self._config.speech.voice,
@@ -346,125 +441,215 @@ class Assistant:
             instructions=self._config.speech.instructions,
             response_format="pcm",
         ) as response:
-            with sd.OutputStream(
-                samplerate=SAMPLE_RATE, channels=1, dtype="int16"
-            ) as stream:
-                async for chunk in response.iter_bytes(chunk_size=1024):
-                    if stop_flag.is_set():
-                        print("Playback interrupted!")
-                        break
-
-                    audio_array = np.frombuffer(chunk, dtype=np.int16)
-                    stream.write(audio_array)
+            async for chunk in response.iter_bytes(chunk_size=1024):
+                yield chunk
+
+    async def _stream_completion(
+        self, messages: list, tools: list[dict] | None = None, use_tools: bool = True
+    ) -> CompletionStream:
+        kwargs = {}
+        if tools:
+            kwargs["tools"] = tools
+            kwargs["tool_choice"] = "auto" if use_tools else "none"
+
+        stream = CompletionStream(
+            await self._openai_client.chat.completions.create(
+                model=self._config.chat.model,
+                messages=messages,
+                stream=True,
+                stream_options={"include_usage": True},
+                **kwargs,
+            )
+        )
+        await stream.prime()
+        return stream
 
     async def _generate_response(
         self, conversation: Conversation
-    ) -> list[Message]:  #! return all messages in the conversation
+    ) -> tuple[list[Message], CompletionStream]:
+        """
+        Runs the tool loop until the model replies or a budget is exhausted.
+
+        Returns the messages leading up to the reply (i.e. tool calls and their results)
+        alongside the stream of the reply itself.
+        """
+        self._args.tool_steps = 0
+        self._args.tool_tokens = 0
+        self._args.turn_started = time.monotonic()
+        return await self._continue_response(conversation.to_messages())
+
+    async def _continue_response(
+        self, history: list[dict]
+    ) -> tuple[list[Message], CompletionStream]:
+        """Continue the tool loop of the current turn from `history`."""
+        chat = self._config.chat
         tools = [tool.get_definition() for tool in self._tools.values()]
-        completion = await self._openai_client.chat.completions.create(
-            model=self._config.chat.model,
-            messages=conversation.to_messages(),
-            tools=tools,
-        )
-
-        # handle tool calls
         messages = []
-        if completion.choices[0].finish_reason == "tool_calls":
-            messages.append(
-                completion.choices[0].message
-            )  # append model's function call message
-
-            # execute the tool calls
-            tool_calls = completion.choices[0].message.tool_calls
-            for tool_call in tool_calls:
-                args = json.loads(tool_call.function.arguments)
-                result = await self._tools[tool_call.function.name].execute(args)
-                messages.append(
-                    Message.create(
-                        MessageRole.TOOL,
-                        tool_call_id=tool_call.id,
-                        content=str(result),
-                    )
-                )
 
-            # generate another response
-            completion_alt = await self._openai_client.chat.completions.create(
-                model=self._config.chat.model,
-                messages=conversation.to_messages()
-                + [message.to_dict() for message in messages],
-            )
-            content = completion_alt.choices[0].message.content
-            messages.append(
-                Message.create(
-                    MessageRole.ASSISTANT,
-                    content=content,
-                )
+        while True:
+            # once a budget is exhausted the model has to answer with what it has
+            self._args.tool_steps += 1
+            within_budget = (
+                self._args.tool_steps < chat.max_steps
+                and self._args.tool_tokens < chat.max_tokens
+                and time.monotonic() - self._args.turn_started < chat.max_duration
             )
-        elif completion.choices[0].finish_reason == "stop":
-            messages.append(
-                Message.create(
-                    MessageRole.ASSISTANT,
-                    content=completion.choices[0].message.content,
-                )
+            stream = await self._stream_completion(
+                history, tools=tools, use_tools=within_budget
             )
-        else:
+            if not (within_budget and stream.has_tool_calls):
+                break
+
+            step_messages = await self._run_tool_step(stream)
+            messages.extend(step_messages)
+            history = history + [message.to_dict() for message in step_messages]
+
+        if stream.finish_reason not in (None, "stop"):
+            await stream.close()
             raise ValueError(
-                f"Encountered unhandled finish reason: {completion.choices[0].finish_reason}"
+                f"Encountered unhandled finish reason: {stream.finish_reason}"
+            )
+
+        return messages, stream
+
+    async def _run_tool_step(self, stream: CompletionStream) -> list[Message]:
+        """Execute the tool calls of a stream, returning the call and its results."""
+        await stream.collect()
+        self._args.tool_tokens += stream.usage.total_tokens if stream.usage else 0
+        tool_call_message = stream.to_message()
+        logger.info(
+            f"Step {self._args.tool_steps}: calling "
+            + ", ".join(
+                call["function"]["name"] for call in tool_call_message.tool_calls
+            )
+        )
+
+        tool_messages = await self._execute_tool_calls(tool_call_message.tool_calls)
+        return [tool_call_message, *tool_messages]
+
+    async def _reply_text(self, preambles: list[str]) -> AsyncIterator[str]:
+        """
+        Yield the text of the reply as it arrives.
+
+        A reply can start with text and only then call tools (e.g. "Let me check
+        that..."). That text has already been spoken, so it is recorded with the tool
+        calls (and appended to `preambles`) and the tool loop continues into the text
+        of the next reply.
+        """
+        while True:
+            stream = self._args.response_stream
+            async for delta in stream.text():
+                yield delta
+            if not stream.has_tool_calls:
+                return
+
+            preambles.append(stream.content)
+            for message in await self._run_tool_step(stream):
+                self._conversation.add(message)
+            await stream.close()
+
+            messages, self._args.response_stream = await self._continue_response(
+                self._conversation.to_messages()
             )
+            for message in messages:
+                self._conversation.add(message)
 
-        return messages
+    async def _execute_tool_calls(self, tool_calls: list[dict]) -> list[Message]:
+        """Execute tool calls concurrently, returning their results in call order."""
+        return await asyncio.gather(
+            *[self._execute_tool_call(tool_call) for tool_call in tool_calls]
+        )
 
-    async def _transcribe_audio(self, file_path: Path) -> str:
-        with open(file_path, "rb") as file:
-            # Assuming the async API method is called acreate:
-            transcription = await self._openai_client.audio.transcriptions.create(
-                model=self._config.transcription.model,
-                file=file,
-                response_format="text",
+    async def _execute_tool_call(self, tool_call: dict) -> Message:
+        """Execute a single tool call, turning any failure into an error result."""
+        name = tool_call["function"]["name"]
+        timeout = self._config.tools.timeout_for(name)
+        try:
+            if name not in self._tools:
+                raise ValueError(f"No tool named '{name}' is available")
+
+            args = json.loads(tool_call["function"]["arguments"])
+            result = await asyncio.wait_for(self._tools[name].execute(args), timeout)
+            content = (
+                result
+                if isinstance(result, str)
+                else json.dumps(
+                    result, separators=(",", ":"), ensure_ascii=False, default=str
+                )
             )
+        except asyncio.TimeoutError:
+            logger.warning(f"Tool {name} timed out after {timeout}s")
+            content = json.dumps({"error": f"The tool timed out after {timeout}s"})
+        except Exception as e:
+            logger.error(f"Error during tool call {name}: {e}")
+            content = json.dumps({"error": f"The tool failed: {e}"})
+
+        return Message.create(
+            MessageRole.TOOL, tool_call_id=tool_call["id"], content=content
+        )
+
+    async def _transcribe_audio(self, audio: np.ndarray) -> str:
+        # * compress in memory - the upload is a large share of the turn latency
+        file = encode_for_upload(
+            audio,
+            self.RECORDING_SAMPLE_RATE,
+            target_rate=self._config.transcription.upload_sample_rate,
+            format=self._config.transcription.upload_format,
+        )
+        transcription = await self._openai_client.audio.transcriptions.create(
+            model=self._config.transcription.model,
+            file=file,
+            response_format="text",
+        )
         return transcription
 
     def _record_audio(
-        self,
-        stop_flag: asyncio.Event,
-        file_name: str = "user.wav",
-        sample_rate: int = 44100,
-        channels: int = 1,
-    ) -> Optional[Path]:
+        self, stop_flag: asyncio.Event, not_before: int = 0
+    ) -> Optional[np.ndarray]:
         FRAME_DIVISOR = 10
-        SAMPLE_CONFIG = {"type": np.int16, "byte_width": 2}
+        sample_rate = self.RECORDING_SAMPLE_RATE
 
-        chunks = []
-        stream = sd.InputStream(
-            samplerate=sample_rate, channels=channels, dtype=SAMPLE_CONFIG["type"]
+        recording = Recording(
+            sample_rate, max_duration=self._config.recording.max_duration
+        )
+        vad = VoiceActivityDetector(
+            sample_rate,
+            trailing_silence=self._config.recording.trailing_silence,
+            energy_threshold=self._config.recording.energy_threshold,
         )
 
+        # include the audio captured just before recording started (but not the chime)
+        self._capture.rewind(self._config.recording.pre_roll, not_before=not_before)
+
         logger.info(
             f"Recording... Press {Button.PRIMARY} to stop or {Button.SECONDARY} to cancel."
         )
         try:
-            with stream:
-                while not stop_flag.is_set():
-                    audio_chunk, overflowed = stream.read(sample_rate // FRAME_DIVISOR)
-                    if overflowed:
-                        logger.warning("Warning: audio buffer overflowed")
-                    chunks.append(audio_chunk)
+            while not stop_flag.is_set():
+                audio_chunk, overflowed = self._capture.read(
+                    sample_rate // FRAME_DIVISOR
+                )
+                if overflowed:
+                    logger.warning("Warning: audio buffer overflowed")
+                recording.append(audio_chunk)
+
+                end_of_speech = vad.process(audio_chunk)
+                if end_of_speech and self._config.recording.endpointing:
+                    logger.info("End of speech detected")
+                    break
+                if recording.full:
+                    logger.warning("Maximum recording duration reached")
+                    break
         except Exception as e:
             logger.error(f"Error during recording: {e}")
             return
         logger.info("Finished recording.")
 
-        # Store audio samples to file if any chunks were recorded
-        if chunks:
-            audio_array = np.concatenate(chunks)
-            file_path = self._working_directory / file_name
-            with wave.open(str(file_path), "wb") as wf:
-                wf.setnchannels(channels)
-                wf.setsampwidth(SAMPLE_CONFIG["byte_width"])  # int16 = 2 bytes
-                wf.setframerate(sample_rate)
-                wf.writeframes(audio_array.tobytes())
-            logger.info(f"Audio saved to {file_path}")
-            return file_path
+        # Keep the trimmed samples in memory if any audio was recorded
+        if len(recording.data):
+            audio_array = vad.trim(recording.data)
+            logger.info(f"Recorded {len(audio_array) / sample_rate:.1f}s of audio")
+            return audio_array
         else:
             logger.warning("No audio was recorded")
             return None
@@ -0,0 +1,153 @@
+import logging
+import time
+
+import numpy as np
+import sounddevice as sd
+
+from .ring import RingBuffer
+
+logger = logging.getLogger(__name__)
+
+
+class Recording:
+    """
+    A recording appended into a preallocated array.
+
+    The array starts small and doubles in size when full, up to the size needed for
+    `max_duration`, so peak memory stays bounded however long the recording runs.
+    """
+
+    def __init__(
+        self,
+        sample_rate: int,
+        channels: int = 1,
+        dtype=np.int16,
+        initial_duration: float = 5.0,
+        max_duration: float = 30.0,
+    ):
+        self._max_length = int(sample_rate * max_duration)
+        initial_length = min(int(sample_rate * initial_duration), self._max_length)
+        self._buffer = np.empty((initial_length, channels), dtype=dtype)
+        self._length = 0
+
+    @property
+    def data(self) -> np.ndarray:
+        """A view of the samples recorded so far."""
+        return self._buffer[: self._length]
+
+    @property
+    def full(self) -> bool:
+        return self._length >= self._max_length
+
+    def append(self, samples: np.ndarray) -> int:
+        """
+        Append samples, growing the preallocated array if required.
+
+        Returns:
+            int: The number of samples appended (fewer once `max_duration` is reached).
+        """
+        count = min(len(samples), self._max_length - self._length)
+        required = self._length + count
+        if required > len(self._buffer):
+            capacity = min(max(required, 2 * len(self._buffer)), self._max_length)
+            grown = np.empty((capacity, self._buffer.shape[1]), self._buffer.dtype)
+            grown[: self._length] = self.data
+            self._buffer = grown
+
+        self._buffer[self._length : required] = samples[:count].reshape(count, -1)
+        self._length = required
+        return count
+
+
+class CaptureEngine:
+    """
+    Keeps one input stream open for the whole session.
+
+    PortAudio's callback writes every captured block into a preallocated ring buffer
+    holding the last `history_duration` seconds of audio. Starting a recording simply
+    rewinds the reader into that history, which gives a pre-roll without any device
+    start-up delay.
+    """
+
+    POLLING_PERIOD = 0.01  # seconds
+
+    def __init__(
+        self,
+        sample_rate: int = 44100,
+        channels: int = 1,
+        dtype=np.int16,
+        history_duration: float = 5.0,
+    ):
+        self._sample_rate = sample_rate
+        self._channels = channels
+        self._dtype = dtype
+
+        self._history = RingBuffer(
+            int(sample_rate * history_duration), channels, dtype, overwrite=True
+        )
+        self._stream: sd.InputStream | None = None
+
+    @property
+    def sample_rate(self) -> int:
+        return self._sample_rate
+
+    async def start(self) -> None:
+        self._stream = sd.InputStream(
+            samplerate=self._sample_rate,
+            channels=self._channels,
+            dtype=self._dtype,
+            callback=self._callback,
+        )
+        self._stream.start()
+        logger.info("Capture engine started")
+
+    async def stop(self) -> None:
+        if self._stream:
+            self._stream.close()
+            self._stream = None
+
+    @property
+    def position(self) -> int:
+        """The number of samples captured since the stream started."""
+        return self._history.written
+
+    @property
+    def latency(self) -> float:
+        """Seconds between sound reaching the device and its samples being captured."""
+        return self._stream.latency if self._stream else 0.0
+
+    def rewind(self, duration: float, not_before: int = 0) -> None:
+        """
+        Start reading from `duration` seconds before the latest captured sample.
+
+        Args:
+            duration (float): Seconds of captured history to include.
+            not_before (int): A `position` the reader never starts before, so that
+                sounds played just beforehand are left out. It may lie in the future.
+        """
+        start = self._history.written - int(self._sample_rate * duration)
+        self._history.seek(max(start, not_before))
+
+    def read(self, frames: int, timeout: float = 1.0) -> tuple[np.ndarray, bool]:
+        """
+        Block until `frames` samples are available and return them.
+
+        Args:
+            frames (int): The number of samples to read.
+            timeout (float): Seconds to wait before returning what is available.
+        Returns:
+            tuple[np.ndarray, bool]: The samples and whether any audio was lost.
+        """
+        deadline = time.monotonic() + timeout
+        while self._history.available < frames and time.monotonic() < deadline:
+            time.sleep(self.POLLING_PERIOD)
+
+        overflowed = self._history.overrun
+        out = np.empty((frames, self._channels), dtype=self._dtype)
+        count = self._history.read_into(out)
+        return out[:count], overflowed
+
+    def _callback(self, indata: np.ndarray, frames: int, time_info, status) -> None:
+        if status:
+            logger.warning(f"Audio input status: {status}")
+        self._history.write(indata)
@@ -0,0 +1,81 @@
+import io
+import logging
+
+import numpy as np
+import soundfile as sf
+
+logger = logging.getLogger(__name__)
+
+UPLOAD_FORMATS = {
+    # name: (soundfile format, soundfile subtype, mime type)
+    "flac": ("FLAC", "PCM_16", "audio/flac"),
+    "ogg": ("OGG", "OPUS", "audio/ogg"),
+    "wav": ("WAV", "PCM_16", "audio/wav"),
+}
+
+
+def resample(audio: np.ndarray, source_rate: int, target_rate: int) -> np.ndarray:
+    """
+    Resample audio with an FFT (band-limited) resampler.
+
+    Args:
+        audio (np.ndarray): Samples shaped (frames,) or (frames, channels).
+        source_rate (int): The sample rate of `audio`.
+        target_rate (int): The desired sample rate.
+    Returns:
+        np.ndarray: float32 samples at `target_rate`, keeping the input's scale.
+    """
+    samples = audio.astype(np.float32)
+    if source_rate == target_rate or len(samples) == 0:
+        return samples
+
+    length = len(samples)
+    target_length = max(1, round(length * target_rate / source_rate))
+
+    spectrum = np.fft.rfft(samples, axis=0)
+    bins = target_length // 2 + 1
+    if bins > spectrum.shape[0]:  # upsampling: zero-pad the spectrum
+        padding = [(0, bins - spectrum.shape[0])] + [(0, 0)] * (samples.ndim - 1)
+        spectrum = np.pad(spectrum, padding)
+    resampled = np.fft.irfft(spectrum[:bins], n=target_length, axis=0)
+
+    return (resampled * (target_length / length)).astype(np.float32)
+
+
+def encode_for_upload(
+    audio: np.ndarray,
+    sample_rate: int,
+    target_rate: int = 16000,
+    format: str = "flac",
+    name: str = "user",
+) -> tuple[str, bytes, str]:
+    """
+    Downmix, resample and compress a recording entirely in memory.
+
+    Args:
+        audio (np.ndarray): int16 samples shaped (frames,) or (frames, channels).
+        sample_rate (int): The sample rate of `audio`.
+        target_rate (int): The sample rate to upload at.
+        format (str): One of `UPLOAD_FORMATS`.
+        name (str): File name (without extension) reported to the API.
+    Returns:
+        tuple[str, bytes, str]: A (file name, content, mime type) upload tuple.
+    """
+    if format not in UPLOAD_FORMATS:
+        raise ValueError(f"The upload format must be one of {list(UPLOAD_FORMATS)}")
+    sf_format, sf_subtype, mime_type = UPLOAD_FORMATS[format]
+
+    if audio.ndim == 2:
+        audio = audio.mean(axis=1)
+    samples = resample(audio, sample_rate, target_rate)
+    samples = np.clip(np.round(samples), -32768, 32767).astype(np.int16)
+
+    buffer = io.BytesIO()
+    sf.write(buffer, samples, target_rate, format=sf_format, subtype=sf_subtype)
+    content = buffer.getvalue()
+
+    logger.debug(
+        f"Encoded {len(audio) / sample_rate:.1f}s of audio to {len(content)} bytes "
+        f"({format}, {target_rate} Hz)"
+    )
+    return f"{name}.{format}", content, mime_type
@@ -0,0 +1,168 @@
+import asyncio
+import logging
+import threading
+
+import numpy as np
+import sounddevice as sd
+
+from .ring import RingBuffer
+from .sounds import SoundBank
+
+logger = logging.getLogger(__name__)
+
+
+class _Voice:
+    """A preloaded sound being mixed into the output."""
+
+    def __init__(self, data: np.ndarray, done: asyncio.Future):
+        self.data = data
+        self.position = 0
+        self.done = done
+
+
+class AudioEngine:
+    """
+    Real-time audio output engine.
+
+    A single persistent `sd.OutputStream` is driven by a callback on PortAudio's audio
+    thread, so nothing on the asyncio loop ever blocks on the sound device. Streamed
+    speech is passed to the callback through a lock-free ring buffer, and preloaded
+    sounds from the `SoundBank` are mixed over the top of it.
+    """
+
+    POLLING_PERIOD = 0.02  # seconds
+
+    def __init__(
+        self,
+        sounds: SoundBank,
+        sample_rate: int = 24000,
+        channels: int = 1,
+        buffer_duration: float = 10.0,
+    ):
+        """
+        Args:
+            sounds (SoundBank): Sounds loaded at `sample_rate` with `channels` channels.
+            sample_rate (int): Output sample rate (OpenAI's TTS default rate).
+            channels (int): Number of output channels.
+            buffer_duration (float): Seconds of speech that can be queued ahead.
+        """
+        self._sounds = sounds
+        self._sample_rate = sample_rate
+        self._channels = channels
+
+        self._speech = RingBuffer(int(sample_rate * buffer_duration), channels)
+        self._clear_speech = threading.Event()
+        self._voices: list[_Voice] = []  # * replaced, never mutated, by the loop
+        self._remainder = b""
+
+        self._loop: asyncio.AbstractEventLoop | None = None
+        self._stream: sd.OutputStream | None = None
+
+    @property
+    def sample_rate(self) -> int:
+        return self._sample_rate
+
+    @property
+    def latency(self) -> float:
+        """Seconds between a sample being mixed and it being heard."""
+        return self._stream.latency if self._stream else 0.0
+
+    async def start(self) -> None:
+        self._loop = asyncio.get_running_loop()
+        self._stream = sd.OutputStream(
+            samplerate=self._sample_rate,
+            channels=self._channels,
+            dtype="float32",
+            callback=self._callback,
+        )
+        self._stream.start()
+        logger.info("Audio engine started")
+
+    async def stop(self) -> None:
+        if self._stream:
+            self._stream.close()
+            self._stream = None
+
+    async def play(self, name: str, wait: bool = True) -> None:
+        """
+        Mix a preloaded sound into the output.
+
+        Args:
+            name (str): The name of the sound in the sound bank.
+            wait (bool): Whether to wait until the sound has finished playing.
+        """
+        done = self._loop.create_future()
+        self._voices = self._voices + [_Voice(self._sounds[name], done)]
+        if wait:
+            await done
+
+    async def enqueue_pcm(self, data: bytes | np.ndarray) -> None:
+        """
+        Queue streamed speech for playback, waiting only while the buffer is full.
+
+        Args:
+            data (bytes | np.ndarray): int16 PCM bytes or float samples in [-1, 1].
+        """
+        if isinstance(data, bytes):
+            # * chunks are not guaranteed to be aligned to whole int16 samples
+            data = self._remainder + data
+            usable = len(data) - len(data) % 2
+            self._remainder = data[usable:]
+            samples = np.frombuffer(data[:usable], dtype=np.int16) / 32768.0
+        else:
+            samples = data
+
+        samples = samples.astype(np.float32).reshape(len(samples), -1)
+        if samples.shape[1] != self._channels:
+            samples = np.repeat(samples[:, :1], self._channels, axis=1)
+
+        written = 0
+        while written < len(samples):
+            written += self._speech.write(samples[written:])
+            if written < len(samples):
+                await asyncio.sleep(self.POLLING_PERIOD)
+
+    async def drain(self) -> None:
+        """Wait until all queued speech has been played."""
+        while self._speech.available > 0 and not self._clear_speech.is_set():
+            await asyncio.sleep(self.POLLING_PERIOD)
+
+        # * the last samples read from the buffer are still in the device's buffers
+        if not self._clear_speech.is_set():
+            await asyncio.sleep(self.latency)
+
+    def clear_speech(self) -> None:
+        """Drop any queued speech (e.g. on interruption)."""
+        self._remainder = b""
+        self._clear_speech.set()
+
+    def _callback(self, outdata: np.ndarray, frames: int, time, status) -> None:
+        if status:
+            logger.warning(f"Audio output status: {status}")
+
+        if self._clear_speech.is_set():
+            self._speech.discard()
+            self._clear_speech.clear()
+
+        outdata.fill(0)
+        self._speech.read_into(outdata)
+
+        voices = self._voices
+        finished = []
+        for voice in voices:
+            segment = voice.data[voice.position : voice.position + frames]
+            outdata[: len(segment)] += segment
+            voice.position += len(segment)
+            if voice.position >= len(voice.data):
+                finished.append(voice)
+
+        if finished:
+            self._loop.call_soon_threadsafe(self._finish, finished)
+
+        np.clip(outdata, -1.0, 1.0, out=outdata)
+
+    def _finish(self, finished: list[_Voice]) -> None:
+        self._voices = [voice for voice in self._voices if voice not in finished]
+        for voice in finished:
+            if not voice.done.done():
+                voice.done.set_result(None)
@@ -0,0 +1,117 @@
+import numpy as np
+
+
+class RingBuffer:
+    """
+    Lock-free single-producer / single-consumer ring buffer of audio samples.
+
+    The producer only ever advances the write counter and the consumer only ever
+    advances the read counter, so neither side needs a lock (each counter update is a
+    single atomic assignment). Counters increase monotonically and are mapped onto
+    the preallocated storage with a modulo.
+
+    In `overwrite` mode the producer never waits for the consumer: the buffer keeps
+    the most recent `capacity` samples as a history and a consumer that falls behind
+    skips ahead, losing the oldest samples.
+    """
+
+    def __init__(
+        self, capacity: int, channels: int = 1, dtype=np.float32, overwrite=False
+    ):
+        self._buffer = np.zeros((capacity, channels), dtype=dtype)
+        self._capacity = capacity
+        self._overwrite = overwrite
+        self._write = 0
+        self._read = 0
+
+    @property
+    def capacity(self) -> int:
+        return self._capacity
+
+    @property
+    def available(self) -> int:
+        """Number of samples that can be read."""
+        return max(0, min(self._write - self._read, self._capacity))
+
+    @property
+    def written(self) -> int:
+        """Number of samples written since the buffer was created."""
+        return self._write
+
+    @property
+    def free(self) -> int:
+        """Number of samples that can be written."""
+        return self._capacity - self.available
+
+    def write(self, samples: np.ndarray) -> int:
+        """
+        Write as many samples as fit, or all of them in overwrite mode (producer side).
+
+        Args:
+            samples (np.ndarray): Samples shaped (frames,) or (frames, channels).
+        Returns:
+            int: The number of samples written.
+        """
+        samples = samples.reshape(len(samples), -1)
+        if self._overwrite:
+            # * only the most recent samples can be kept
+            skipped = max(0, len(samples) - self._capacity)
+            self._write += skipped
+            count = len(samples) - skipped
+            samples = samples[skipped:]
+        else:
+            count = min(len(samples), self.free)
+        if count == 0:
+            return 0
+
+        start = self._write % self._capacity
+        first = min(count, self._capacity - start)
+        self._buffer[start : start + first] = samples[:first]
+        self._buffer[: count - first] = samples[first:count]
+
+        self._write += count
+        return count
+
+    def read_into(self, out: np.ndarray) -> int:
+        """
+        Read up to `len(out)` samples into `out` (consumer side).
+
+        Returns:
+            int: The number of samples read. The rest of `out` is left untouched.
+        """
+        if self._write - self._read > self._capacity:  # * overrun in overwrite mode
+            self._read = self._write - self._capacity
+
+        count = min(len(out), self.available)
+        if count == 0:
+            return 0
+
+        start = self._read % self._capacity
+        first = min(count, self._capacity - start)
+        out[:first] = self._buffer[start : start + first]
+        out[first:count] = self._buffer[: count - first]
+
+        self._read += count
+        return count
+
+    @property
+    def overrun(self) -> bool:
+        """Whether the producer has overwritten samples the consumer has not read."""
+        return self._write - self._read > self._capacity
+
+    def discard(self) -> None:
+        """Drop everything that has been written so far (consumer side)."""
+        self._read = self._write
+
+    def rewind(self, count: int) -> None:
+        """Position the consumer `count` samples before the latest write (consumer side)."""
+        self.seek(self._write - count)
+
+    def seek(self, position: int) -> None:
+        """
+        Position the consumer at the absolute sample `position` (consumer side).
+
+        Positions that have been overwritten are clamped to the oldest sample kept, and
+        positions that have not been written yet are waited for by the consumer.
+        """
+        self._read = max(position, self._write - self._capacity, 0)
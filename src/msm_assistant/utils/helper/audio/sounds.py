@@ -0,0 +1,55 @@
+import logging
+from importlib.resources import as_file, files
+
+import numpy as np
+import soundfile as sf
+
+from .encoding import resample
+
+logger = logging.getLogger(__name__)
+
+
+class SoundBank:
+    """
+    Sounds decoded once and held in memory, ready to be mixed by the audio engine.
+
+    Every sound is converted to float32 at the engine's sample rate and channel count
+    when the bank is loaded, so playing a sound is just a buffer copy.
+    """
+
+    def __init__(self, sample_rate: int, channels: int = 1):
+        self._sample_rate = sample_rate
+        self._channels = channels
+        self._sounds: dict[str, np.ndarray] = {}
+
+    def __contains__(self, name: str) -> bool:
+        return name in self._sounds
+
+    def __getitem__(self, name: str) -> np.ndarray:
+        if name not in self._sounds:
+            raise KeyError(f"No sound named '{name}' has been loaded")
+        return self._sounds[name]
+
+    def load_package(self, package: str = "msm_assistant.assets") -> None:
+        """Load every WAV file shipped in a package, keyed by file stem."""
+        for resource in files(package).iterdir():
+            if resource.name.endswith(".wav"):
+                with as_file(resource) as path:
+                    self.add(path.stem, *sf.read(path, dtype="float32", always_2d=True))
+
+        logger.info(f"Loaded {len(self._sounds)} sounds into the sound bank")
+
+    def add(self, name: str, data: np.ndarray, sample_rate: int) -> None:
+        """
+        Add a sound to the bank.
+
+        Args:
+            name (str): The key used to play the sound.
+            data (np.ndarray): float samples in [-1, 1] shaped (frames, channels).
+            sample_rate (int): The sample rate of `data`.
+        """
+        data = data.reshape(len(data), -1)
+        if data.shape[1] != self._channels:
+            data = np.repeat(data.mean(axis=1, keepdims=True), self._channels, axis=1)
+
+        self._sounds[name] = resample(data, sample_rate, self._sample_rate)
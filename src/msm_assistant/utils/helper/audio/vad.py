@@ -0,0 +1,133 @@
+import logging
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+
+class VoiceActivityDetector:
+    """
+    Energy / zero-crossing voice activity detector used to endpoint recordings.
+
+    Audio is processed in the chunks the recorder already reads. Each chunk is split
+    into short frames which are classified in a single vectorised pass: a frame is
+    speech if it is sufficiently louder than the tracked noise floor, or if it is
+    moderately loud with a high zero-crossing rate (unvoiced sounds such as "s").
+    """
+
+    FRAME_DURATION = 0.01  # seconds
+    MARGIN_DB = 12.0  # required level above the noise floor
+    UNVOICED_MARGIN_DB = 6.0
+    UNVOICED_ZCR = 0.3  # zero crossings per sample
+    NOISE_ADAPTATION = 0.05
+
+    def __init__(
+        self,
+        sample_rate: int,
+        trailing_silence: float = 1.0,
+        energy_threshold: float = -45.0,
+        min_speech: float = 0.2,
+        padding: float = 0.2,
+    ):
+        """
+        Args:
+            sample_rate (int): Sample rate of the audio being processed.
+            trailing_silence (float): Seconds of silence after speech that end the capture.
+            energy_threshold (float): Minimum frame level (dBFS) that can count as speech.
+            min_speech (float): Seconds of speech required before endpointing is armed.
+            padding (float): Seconds of audio kept either side of the speech when trimming.
+        """
+        self._frame_length = max(1, int(sample_rate * self.FRAME_DURATION))
+        self._trailing_frames = int(trailing_silence / self.FRAME_DURATION)
+        self._min_speech_frames = int(min_speech / self.FRAME_DURATION)
+        self._padding = int(sample_rate * padding)
+        self._energy_threshold = energy_threshold
+
+        self.reset()
+
+    def reset(self) -> None:
+        self._noise_floor = self._energy_threshold - self.MARGIN_DB
+        self._flags: list[np.ndarray] = []
+        self._remainder = np.empty(0, dtype=np.float32)
+        self._speech_frames = 0
+        self._silent_frames = 0
+
+    @property
+    def speech_detected(self) -> bool:
+        return self._speech_frames >= self._min_speech_frames
+
+    def process(self, chunk: np.ndarray) -> bool:
+        """
+        Classify a chunk of audio.
+
+        Args:
+            chunk (np.ndarray): int16 or float samples, shaped (frames,) or (frames, channels).
+        Returns:
+            bool: True once speech has been followed by the trailing silence window.
+        """
+        samples = self._to_float(chunk)
+        samples = np.concatenate([self._remainder, samples])
+        count = len(samples) // self._frame_length
+        self._remainder = samples[count * self._frame_length :]
+        if count == 0:
+            return False
+
+        frames = samples[: count * self._frame_length].reshape(count, -1)
+        flags = self._classify(frames)
+        self._flags.append(flags)
+
+        self._speech_frames += int(flags.sum())
+        if flags.any():
+            # trailing silence only counts frames after the last speech frame
+            self._silent_frames = count - 1 - int(np.flatnonzero(flags)[-1])
+        else:
+            self._silent_frames += count
+
+        return self.speech_detected and self._silent_frames >= self._trailing_frames
+
+    def trim(self, audio: np.ndarray) -> np.ndarray:
+        """
+        Trim leading and trailing silence from the audio passed through `process`.
+
+        Audio is returned untouched if no speech was detected.
+        """
+        if not self._flags:
+            return audio
+
+        speech = np.flatnonzero(np.concatenate(self._flags))
+        if len(speech) == 0:
+            return audio
+
+        start = max(0, speech[0] * self._frame_length - self._padding)
+        end = min(len(audio), (speech[-1] + 1) * self._frame_length + self._padding)
+        return audio[start:end]
+
+    def _classify(self, frames: np.ndarray) -> np.ndarray:
+        energy = 10 * np.log10(np.mean(frames**2, axis=1) + 1e-10)
+        signs = np.signbit(frames)
+        zcr = np.mean(signs[:, 1:] != signs[:, :-1], axis=1)
+
+        threshold = max(self._noise_floor + self.MARGIN_DB, self._energy_threshold)
+        voiced = energy > threshold
+        unvoiced = (energy > threshold - self.UNVOICED_MARGIN_DB) & (
+            zcr > self.UNVOICED_ZCR
+        )
+        flags = voiced | unvoiced
+
+        # track the noise floor: drop immediately to quieter frames, rise slowly
+        noise = float(energy.min())
+        if noise < self._noise_floor:
+            self._noise_floor = noise
+        else:
+            self._noise_floor += self.NOISE_ADAPTATION * (noise - self._noise_floor)
+
+        return flags
+
+    @staticmethod
+    def _to_float(chunk: np.ndarray) -> np.ndarray:
+        samples = chunk.astype(np.float32)
+        if np.issubdtype(chunk.dtype, np.integer):
+            samples /= np.iinfo(chunk.dtype).max
+        if samples.ndim == 2:
+            samples = samples.mean(axis=1)
+        return samples
@@ -0,0 +1,119 @@
+import logging
+from collections import deque
+from typing import AsyncIterator
+
+from .message import ToolCallMessage
+
+logger = logging.getLogger(__name__)
+
+
+class CompletionStream:
+    """
+    Wraps a streamed chat completion and separates text deltas from tool call deltas.
+
+    The stream is consumed lazily so that the text of a reply can be handed to the
+    speech pipeline while later tokens are still arriving.
+    """
+
+    def __init__(self, stream):
+        self._stream = stream
+        self._iterator = stream.__aiter__()
+        self._exhausted = False
+
+        self._pending: deque[str] = deque()
+        self._content: list[str] = []
+        self._tool_calls: dict[int, dict] = {}
+
+        self.finish_reason: str | None = None
+        self.usage = None
+
+    @property
+    def content(self) -> str:
+        """The text received so far."""
+        return "".join(self._content)
+
+    @property
+    def has_tool_calls(self) -> bool:
+        return len(self._tool_calls) > 0
+
+    async def _read(self) -> bool:
+        """
+        Read a single chunk from the stream.
+
+        Returns:
+            bool: False once the stream has been exhausted.
+        """
+        if self._exhausted:
+            return False
+
+        try:
+            chunk = await self._iterator.__anext__()
+        except StopAsyncIteration:
+            self._exhausted = True
+            return False
+
+        if getattr(chunk, "usage", None):
+            self.usage = chunk.usage
+        if not chunk.choices:  # * e.g. the trailing usage chunk
+            return True
+
+        choice = chunk.choices[0]
+        delta = choice.delta
+        if delta.content:
+            self._pending.append(delta.content)
+            self._content.append(delta.content)
+
+        for tool_call in delta.tool_calls or []:
+            entry = self._tool_calls.setdefault(
+                tool_call.index, {"id": None, "name": "", "arguments": ""}
+            )
+            if tool_call.id:
+                entry["id"] = tool_call.id
+            if tool_call.function and tool_call.function.name:
+                entry["name"] += tool_call.function.name
+            if tool_call.function and tool_call.function.arguments:
+                entry["arguments"] += tool_call.function.arguments
+
+        if choice.finish_reason:
+            self.finish_reason = choice.finish_reason
+
+        return True
+
+    async def prime(self) -> None:
+        """Read until it is known whether the reply is text or a set of tool calls."""
+        while not (self._pending or self.has_tool_calls or self.finish_reason):
+            if not await self._read():
+                break
+
+    async def collect(self) -> None:
+        """Read the remainder of the stream."""
+        while await self._read():
+            pass
+
+    async def text(self) -> AsyncIterator[str]:
+        """Yield the text deltas of the reply as they arrive."""
+        while True:
+            while self._pending:
+                yield self._pending.popleft()
+            if not await self._read():
+                return
+
+    def tool_calls(self) -> list[dict]:
+        """The accumulated tool calls in the order they were emitted."""
+        return [
+            {
+                "id": entry["id"],
+                "type": "function",
+                "function": {"name": entry["name"], "arguments": entry["arguments"]},
+            }
+            for _, entry in sorted(self._tool_calls.items())
+        ]
+
+    def to_message(self) -> ToolCallMessage:
+        """Build the assistant message that requested the tool calls."""
+        return ToolCallMessage(self.tool_calls(), content=self.content or None)
+
+    async def close(self) -> None:
+        """Close the underlying HTTP stream (e.g. on interruption)."""
+        self._exhausted = True
+        await self._stream.close()
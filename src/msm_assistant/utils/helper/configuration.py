@@ -21,6 +21,8 @@ class TranscriptionConfig:
         self._verify(config)
 
         self.model: str = config["model"]
+        self.upload_format: str = config.get("upload_format", "flac")
+        self.upload_sample_rate: int = config.get("upload_sample_rate", 16000)
 
     def _verify(self, config: dict):
         if "model" not in config:
@@ -28,6 +30,18 @@ class TranscriptionConfig:
                 "The transcription configuration needs to contain a 'model' field."
             )
 
+        VALID_UPLOAD_FORMATS = ["flac", "ogg", "wav"]
+        if config.get("upload_format", "flac") not in VALID_UPLOAD_FORMATS:
+            raise ConfigurationError(
+                f"The transcription upload format must be one of {VALID_UPLOAD_FORMATS}"
+            )
+
+        VALID_UPLOAD_SAMPLE_RATES = [8000, 12000, 16000, 24000, 48000]
+        if config.get("upload_sample_rate", 16000) not in VALID_UPLOAD_SAMPLE_RATES:
+            raise ConfigurationError(
+                f"The transcription upload sample rate must be one of {VALID_UPLOAD_SAMPLE_RATES}"
+            )
+
         VALID_MODELS = [
             "whisper-1",
             "gpt-4o-mini-transcribe",
@@ -45,6 +59,11 @@ class ChatConfig:
 
         self.model: str = config["model"]
         self.prompt: str = config["prompt"]
+        self.max_steps: int = config.get("max_steps", 4)
+        self.max_tokens: int = config.get("max_tokens", 20000)
+        self.max_duration: float = config.get("max_duration", 20.0)
+        self.context_budget: int = config.get("context_budget", 8000)
+        self.keep_turns: int = config.get("keep_turns", 2)
 
     def _verify(self, config: dict):
         if "model" not in config:
@@ -57,6 +76,25 @@ class ChatConfig:
                 "The chat configuration needs to contain a 'prompt' field."
             )
 
+        for key in ["max_steps", "max_tokens", "context_budget", "keep_turns"]:
+            value = config.get(key, 1)
+            if not isinstance(value, int) or isinstance(value, bool) or value < 1:
+                raise ConfigurationError(
+                    f"The chat '{key}' field must be a positive integer."
+                )
+
+        # * a tool call takes one completion and answering with its result another
+        if config.get("max_steps", 4) < 2:
+            raise ConfigurationError(
+                "The chat 'max_steps' field must be at least 2 so that tools can be used."
+            )
+
+        max_duration = config.get("max_duration", 20.0)
+        if not isinstance(max_duration, (int, float)) or max_duration <= 0:
+            raise ConfigurationError(
+                "The chat 'max_duration' field must be a positive number of seconds."
+            )
+
         VALID_MODELS = [
             "o3-mini",
             "gpt-4o",
@@ -124,6 +162,17 @@ class DatabaseConfig:
         self.url: str = config["url"]
         self.collection: str = config["collection"]
         self.description: str = config["description"]
+        self.embedding_cache: str | None = config.get("embedding_cache")
+        self.local_index: bool = config.get("local_index", False)
+        self.max_local_points: int = config.get("max_local_points", 10_000)
+        self.index_snapshot: str | None = config.get("index_snapshot")
+        self.refresh_interval: float = config.get("refresh_interval", 60.0)
+        self.payload_fields: list[str] = config.get(
+            "payload_fields", ["text", "file", "pages", "files"]
+        )
+        self.max_limit: int = config.get("max_limit", 10)
+        self.score_threshold: float | None = config.get("score_threshold")
+        self.max_result_tokens: int = config.get("max_result_tokens", 1500)
 
     def _verify(self, config: dict):
         if "url" not in config:
@@ -141,6 +190,53 @@ class DatabaseConfig:
                 "The database configuration needs to contain a 'description' field."
             )
 
+        for key in ["embedding_cache", "index_snapshot"]:
+            if not isinstance(config.get(key, ""), str):
+                raise ConfigurationError(f"The database '{key}' field must be a path.")
+
+        if not isinstance(config.get("local_index", False), bool):
+            raise ConfigurationError(
+                "The database 'local_index' field must be true or false."
+            )
+
+        for key, default in [
+            ("max_local_points", 10_000),
+            ("max_limit", 10),
+            ("max_result_tokens", 1500),
+        ]:
+            value = config.get(key, default)
+            if not isinstance(value, int) or isinstance(value, bool) or value < 1:
+                raise ConfigurationError(
+                    f"The database '{key}' field must be a positive integer."
+                )
+
+        payload_fields = config.get(
+            "payload_fields", ["text", "file", "pages", "files"]
+        )
+        if (
+            not isinstance(payload_fields, list)
+            or not payload_fields
+            or not all(isinstance(field, str) for field in payload_fields)
+        ):
+            raise ConfigurationError(
+                "The database 'payload_fields' field must be a list of field names."
+            )
+
+        score_threshold = config.get("score_threshold")
+        if score_threshold is not None and (
+            not isinstance(score_threshold, (int, float))
+            or not -1.0 <= score_threshold <= 1.0
+        ):
+            raise ConfigurationError(
+                "The database 'score_threshold' field must be between -1 and 1."
+            )
+
+        refresh_interval = config.get("refresh_interval", 60.0)
+        if not isinstance(refresh_interval, (int, float)) or refresh_interval <= 0:
+            raise ConfigurationError(
+                "The database 'refresh_interval' field must be a positive number."
+            )
+
 
 class CategoryConfig:
     def __init__(self, config: dict):
@@ -192,6 +288,8 @@ class OPCUAConfig:
             CategoryConfig(category_dict)
             for category_dict in config.get("categories", [])
         ]
+        self.publish_window: float = config.get("publish_window", 0.1)
+        self.publish_last: int | None = config.get("publish_last")
 
     def _verify(self, config: dict):
         REQUIRED_KEYS = [
@@ -205,6 +303,88 @@ class OPCUAConfig:
                     f"Missing required key '{key}' in the OPCUA configuration."
                 )
 
+        publish_window = config.get("publish_window", 0.1)
+        if not isinstance(publish_window, (int, float)) or publish_window < 0:
+            raise ConfigurationError(
+                "The OPCUA 'publish_window' field must be a non-negative number."
+            )
+
+        publish_last = config.get("publish_last")
+        if publish_last is not None and (
+            not isinstance(publish_last, int) or publish_last <= 0
+        ):
+            raise ConfigurationError(
+                "The OPCUA 'publish_last' field must be a positive integer."
+            )
+
+
+class RecordingConfig:
+    def __init__(self, config: dict):
+        self._verify(config)
+
+        self.endpointing: bool = config.get("endpointing", True)
+        self.trailing_silence: float = config.get("trailing_silence", 1.0)
+        self.energy_threshold: float = config.get("energy_threshold", -45.0)
+        self.pre_roll: float = config.get("pre_roll", 0.3)
+        self.max_duration: float = config.get("max_duration", 30.0)
+
+    def _verify(self, config: dict):
+        if not isinstance(config.get("endpointing", True), bool):
+            raise ConfigurationError(
+                "The recording 'endpointing' field must be true or false."
+            )
+
+        trailing_silence = config.get("trailing_silence", 1.0)
+        if not isinstance(trailing_silence, (int, float)) or trailing_silence <= 0:
+            raise ConfigurationError(
+                "The recording 'trailing_silence' field must be a positive number of seconds."
+            )
+
+        energy_threshold = config.get("energy_threshold", -45.0)
+        if not isinstance(energy_threshold, (int, float)) or energy_threshold >= 0:
+            raise ConfigurationError(
+                "The recording 'energy_threshold' field must be a negative level in dBFS."
+            )
+
+        pre_roll = config.get("pre_roll", 0.3)
+        if not isinstance(pre_roll, (int, float)) or not 0 <= pre_roll <= 2:
+            raise ConfigurationError(
+                "The recording 'pre_roll' field must be between 0 and 2 seconds."
+            )
+
+        max_duration = config.get("max_duration", 30.0)
+        if not isinstance(max_duration, (int, float)) or max_duration <= 0:
+            raise ConfigurationError(
+                "The recording 'max_duration' field must be a positive number of seconds."
+            )
+
+
+class ToolsConfig:
+    def __init__(self, config: dict):
+        self._verify(config)
+
+        self.timeout: float = config.get("timeout", 10.0)
+        self.timeouts: dict[str, float] = config.get("timeouts", {})
+
+    def timeout_for(self, name: str) -> float:
+        """Get the timeout (in seconds) of a tool by name"""
+        return self.timeouts.get(name, self.timeout)
+
+    def _verify(self, config: dict):
+        timeout = config.get("timeout", 10.0)
+        if not isinstance(timeout, (int, float)) or timeout <= 0:
+            raise ConfigurationError(
+                "The tools 'timeout' field must be a positive number of seconds."
+            )
+
+        timeouts = config.get("timeouts", {})
+        if not isinstance(timeouts, dict) or not all(
+            isinstance(value, (int, float)) and value > 0 for value in timeouts.values()
+        ):
+            raise ConfigurationError(
+                "The tools 'timeouts' field must map tool names to positive numbers of seconds."
+            )
+
 
 class Configuration:
     def __init__(self, path: Path):
@@ -225,6 +405,8 @@ class Configuration:
         self.speech: SpeechConfig = SpeechConfig(config["speech"])
         self.database: DatabaseConfig = DatabaseConfig(config["database"])
         self.opcua: OPCUAConfig = OPCUAConfig(config["opcua"])
+        self.recording: RecordingConfig = RecordingConfig(config.get("recording", {}))
+        self.tools: ToolsConfig = ToolsConfig(config.get("tools", {}))
 
         self.additional: dict[str, any] = {}
 
@@ -0,0 +1,179 @@
+import hashlib
+import logging
+import sqlite3
+import time
+from collections import OrderedDict
+from pathlib import Path
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+
+def model_key(model: str, dimensions: int | None = None) -> str:
+    """The cache key of an embedding model, including any shortened dimensions."""
+    return f"{model}:{dimensions}" if dimensions else model
+
+
+class EmbeddingCache:
+    """
+    A two-tier cache of embeddings keyed by (embedding model, normalised text).
+
+    Recently used embeddings are kept in an in-process LRU. All embeddings are also
+    written to an SQLite store (when a path is given) as float32 blobs so they survive
+    restarts and can be shared between the assistant and the ingest scripts. Both
+    tiers evict their least recently used entries once they exceed their size.
+
+    Access times are only needed for eviction, so they are buffered and written to
+    disk in batches (and before any eviction) rather than on every hit.
+    """
+
+    MAX_PENDING_ACCESSES = 256
+
+    def __init__(
+        self,
+        path: Path | str | None = None,
+        max_memory_entries: int = 1024,
+        max_disk_entries: int = 100_000,
+    ):
+        """
+        Args:
+            path (Path | str | None): The SQLite file, or None for an in-memory cache.
+            max_memory_entries (int): The number of embeddings kept in the LRU.
+            max_disk_entries (int): The number of embeddings kept on disk.
+        """
+        self._max_memory_entries = max_memory_entries
+        self._max_disk_entries = max_disk_entries
+        self._memory: OrderedDict[tuple[str, str], list[float]] = OrderedDict()
+        self._accessed: dict[tuple[str, str], float] = {}  # * not yet written to disk
+
+        self.hits = 0
+        self.misses = 0
+
+        self._db: sqlite3.Connection | None = None
+        if path is not None:
+            path = Path(path).expanduser()
+            path.parent.mkdir(parents=True, exist_ok=True)
+            self._db = sqlite3.connect(path, check_same_thread=False)
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS embeddings ("
+                "model TEXT NOT NULL, key TEXT NOT NULL, vector BLOB NOT NULL, "
+                "accessed REAL NOT NULL, PRIMARY KEY (model, key))"
+            )
+            self._db.execute(
+                "CREATE INDEX IF NOT EXISTS embeddings_accessed "
+                "ON embeddings (accessed)"
+            )
+            self._db.commit()
+
+    @staticmethod
+    def normalise(text: str) -> str:
+        """Collapse whitespace and case so trivially different texts share an entry."""
+        return " ".join(text.split()).casefold()
+
+    @classmethod
+    def key(cls, text: str) -> str:
+        return hashlib.sha256(cls.normalise(text).encode()).hexdigest()
+
+    @property
+    def hit_rate(self) -> float:
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.0
+
+    def get(self, model: str, text: str) -> list[float] | None:
+        """
+        Look up an embedding, first in memory and then on disk.
+
+        Returns:
+            list[float] | None: The embedding, or None on a miss.
+        """
+        key = (model, self.key(text))
+        if key in self._memory:
+            self._memory.move_to_end(key)
+            self._touch(key)
+            self.hits += 1
+            return self._memory[key]
+
+        if self._db is not None:
+            row = self._db.execute(
+                "SELECT vector FROM embeddings WHERE model = ? AND key = ?", key
+            ).fetchone()
+            if row is not None:
+                vector = np.frombuffer(row[0], dtype=np.float32).tolist()
+                self._remember(key, vector)
+                self._touch(key)
+                self.hits += 1
+                return vector
+
+        self.misses += 1
+        return None
+
+    def get_many(self, model: str, texts: list[str]) -> list[list[float] | None]:
+        return [self.get(model, text) for text in texts]
+
+    def put(self, model: str, text: str, vector: list[float]) -> None:
+        self.put_many(model, [text], [vector])
+
+    def put_many(
+        self, model: str, texts: list[str], vectors: list[list[float]]
+    ) -> None:
+        """Store embeddings in both tiers."""
+        rows = []
+        now = time.time()
+        for text, vector in zip(texts, vectors, strict=True):
+            key = (model, self.key(text))
+            self._remember(key, vector)
+            rows.append((*key, np.asarray(vector, dtype=np.float32).tobytes(), now))
+
+        if self._db is not None:
+            self._db.executemany(
+                "INSERT OR REPLACE INTO embeddings (model, key, vector, accessed) "
+                "VALUES (?, ?, ?, ?)",
+                rows,
+            )
+            self._write_accessed()
+            self._evict()
+            self._db.commit()
+
+    def flush(self) -> None:
+        """Write any buffered access times to disk."""
+        if self._db is not None and self._accessed:
+            self._write_accessed()
+            self._db.commit()
+
+    def close(self) -> None:
+        if self._db is not None:
+            self.flush()
+            self._db.close()
+            self._db = None
+
+    def _touch(self, key: tuple[str, str]) -> None:
+        if self._db is None:
+            return
+        self._accessed[key] = time.time()
+        if len(self._accessed) >= self.MAX_PENDING_ACCESSES:
+            self.flush()
+
+    def _write_accessed(self) -> None:
+        self._db.executemany(
+            "UPDATE embeddings SET accessed = ? WHERE model = ? AND key = ?",
+            [(accessed, *key) for key, accessed in self._accessed.items()],
+        )
+        self._accessed.clear()
+
+    def _remember(self, key: tuple[str, str], vector: list[float]) -> None:
+        self._memory[key] = vector
+        self._memory.move_to_end(key)
+        while len(self._memory) > self._max_memory_entries:
+            self._memory.popitem(last=False)
+
+    def _evict(self) -> None:
+        (count,) = self._db.execute("SELECT COUNT(*) FROM embeddings").fetchone()
+        excess = count - self._max_disk_entries
+        if excess > 0:
+            self._db.execute(
+                "DELETE FROM embeddings WHERE rowid IN ("
+                "SELECT rowid FROM embeddings ORDER BY accessed LIMIT ?)",
+                (excess,),
+            )
+            logger.debug(f"Evicted {excess} embeddings from the cache")
@@ -1,8 +1,12 @@
+import json
 from abc import ABC, abstractmethod
 from enum import Enum
+from typing import Callable
 
 from openai.types.chat import ChatCompletionMessage
 
+from .tokens import MESSAGE_OVERHEAD, count_tokens
+
 
 class MessageRole(Enum):
     DEVELOPER = "developer"
@@ -12,18 +16,23 @@ class MessageRole(Enum):
 
 
 class Message(ABC):
+    __slots__ = ()
     _registry = {}
 
-    def __init_subclass__(cls, **kwargs):
+    def __init_subclass__(cls, register: bool = True, **kwargs):
         super().__init_subclass__(**kwargs)
 
-        if hasattr(cls, "role"):
+        if register and hasattr(cls, "role"):
             Message._registry[cls.role] = cls
 
     @abstractmethod
     def to_dict() -> dict:
         pass
 
+    def to_record(self) -> dict:
+        """The JSON form of the message shared outside of the assistant (e.g. OPCUA)."""
+        return self.to_dict()
+
     @classmethod
     def create(cls, role: MessageRole, **kwargs):
         if role.value not in cls._registry:
@@ -32,6 +41,7 @@ class Message(ABC):
 
 
 class UserMessage(Message):
+    __slots__ = ("content",)
     role = MessageRole.USER.value
 
     def __init__(self, content: str):
@@ -42,6 +52,7 @@ class UserMessage(Message):
 
 
 class DeveloperMessage(Message):
+    __slots__ = ("content",)
     role = MessageRole.DEVELOPER.value
 
     def __init__(self, content: str):
@@ -52,6 +63,7 @@ class DeveloperMessage(Message):
 
 
 class AssistantMessage(Message):
+    __slots__ = ("content",)
     role = MessageRole.ASSISTANT.value
 
     def __init__(self, content: str):
@@ -61,7 +73,57 @@ class AssistantMessage(Message):
         return {"role": self.role, "content": self.content}
 
 
+class ToolCallMessage(Message, register=False):
+    """An assistant message requesting tool calls, held as compact dicts."""
+
+    __slots__ = ("content", "tool_calls")
+    role = MessageRole.ASSISTANT.value
+
+    def __init__(self, tool_calls: list[dict], content: str | None = None):
+        self.tool_calls = tool_calls
+        self.content = content
+
+    @classmethod
+    def from_completion(cls, message: ChatCompletionMessage):
+        """Convert every tool call of a completion message (once) into a compact dict."""
+        return cls(
+            tool_calls=[
+                {
+                    "id": tool_call.id,
+                    "type": "function",
+                    "function": {
+                        "name": tool_call.function.name,
+                        "arguments": tool_call.function.arguments,
+                    },
+                }
+                for tool_call in message.tool_calls
+            ],
+            content=getattr(message, "content", None),
+        )
+
+    def to_dict(self) -> dict:
+        return {
+            "role": self.role,
+            "content": self.content,
+            "tool_calls": self.tool_calls,
+        }
+
+    def to_record(self) -> dict:
+        return {
+            "role": self.role,
+            "tool_calls": [
+                {
+                    "id": tool_call["id"],
+                    "function_name": tool_call["function"]["name"],
+                    "arguments": tool_call["function"]["arguments"],
+                }
+                for tool_call in self.tool_calls
+            ],
+        }
+
+
 class ToolMessage(Message):
+    __slots__ = ("tool_call_id", "content")
     role = MessageRole.TOOL.value
 
     def __init__(self, tool_call_id: str, content: str):
@@ -77,43 +139,180 @@ class ToolMessage(Message):
 
 
 class Conversation:
+    """
+    The conversation history, kept alongside its serialized forms.
+
+    Messages are serialized once when they are added, both for the API and for the
+    JSON form shared over OPCUA, so producing either form never re-serializes the
+    history. The caches are only rebuilt by `reset` and `fold`. Listeners added with
+    `add_listener` are called after every change.
+    """
+
+    SUMMARY_PREFIX = "Summary of the earlier conversation:\n"
+
     def __init__(self, prompt: DeveloperMessage):
-        self._state: list[Message] = []
         self._prompt = prompt
+        self._prompt_dict = prompt.to_dict()
+        self._prompt_tokens = self.count_tokens(prompt)
+        self._listeners: list[Callable[[], None]] = []
+        self.reset()
+
+    @property
+    def tokens(self) -> int:
+        """The (cached) number of tokens the conversation sends with a completion."""
+        return self._prompt_tokens + self._summary_tokens + sum(self._tokens)
+
+    @property
+    def summary(self) -> str | None:
+        if self._summary is None:
+            return None
+        return self._summary.content.removeprefix(self.SUMMARY_PREFIX)
 
     def reset(self):
-        self._state = []
+        self._state: list[Message] = []
+        self._tokens: list[int] = []  # * token count of each message in the state
+        self._summary: DeveloperMessage | None = None
+        self._summary_tokens = 0
+
+        # serialized forms, appended to by `add`
+        self._header: list[dict] = [self._prompt_dict]
+        self._dicts: list[dict] = []
+        self._records: list[dict] = []
+        self._json: dict[int | None, str] = {}
+        self._changed()
+
+    def add_listener(self, listener: Callable[[], None]):
+        """Call `listener` whenever the conversation changes."""
+        self._listeners.append(listener)
+
+    def _changed(self):
+        self._json.clear()
+        for listener in self._listeners:
+            listener()
 
     def add(self, message: Message | ChatCompletionMessage):
-        #! ChatCompletionMessages that contain tool calls need to be preserved as they are in the conversation history
-        if isinstance(message, ChatCompletionMessage) and message.tool_calls is None:
-            raise ValueError(
-                "ChatCompletionMessage instances should only be added for tool calls"
-            )
+        #! ChatCompletionMessages that contain tool calls need to be preserved in the conversation history
+        if isinstance(message, ChatCompletionMessage):
+            if message.tool_calls is None:
+                raise ValueError(
+                    "ChatCompletionMessage instances should only be added for tool calls"
+                )
+            message = ToolCallMessage.from_completion(message)
+        elif not isinstance(message, Message):
+            raise ValueError(f"Unknown message type: {type(message)}")
 
         self._state.append(message)
+        self._tokens.append(self.count_tokens(message))
+        self._dicts.append(message.to_dict())
+        self._records.append(message.to_record())
+        self._changed()
+
+    def foldable(self, budget: int, keep_turns: int = 2) -> list[Message]:
+        """
+        Get the oldest messages that need to be folded into the summary to fit the budget.
+
+        Only whole turns (a user message and everything that follows it) are folded and
+        the latest `keep_turns` turns are always kept.
+
+        Args:
+            budget (int): The maximum number of tokens the conversation should use.
+            keep_turns (int): The number of recent turns that are never folded.
+        """
+        excess = self.tokens - budget
+        if excess <= 0:
+            return []
+
+        turn_starts = [
+            index
+            for index, message in enumerate(self._state)
+            if isinstance(message, UserMessage)
+        ]
+
+        count = 0
+        for start in turn_starts[1 : len(turn_starts) - keep_turns + 1]:
+            count = start
+            if sum(self._tokens[:count]) >= excess:
+                break
+
+        return self._state[:count]
+
+    def fold(self, messages: list[Message], summary: str):
+        """
+        Replace the oldest messages with a rolling summary.
+
+        Args:
+            messages (list[Message]): The messages returned by `foldable`.
+            summary (str): A summary of the previous summary and `messages`.
+        """
+        count = len(messages)
+        if self._state[:count] != messages:
+            raise ValueError(
+                "The folded messages are no longer part of the conversation"
+            )
 
-    def to_messages(self, to_dict: bool = False) -> list[dict]:
-        messages = []
-
-        for message in self._state:
-            if isinstance(message, Message):
-                messages.append(message.to_dict())
-            elif isinstance(
-                message, ChatCompletionMessage
-            ):  #! specifically in the case of a tool call
-                message: ChatCompletionMessage
-                if to_dict:
-                    tool_call_message = {
-                        "id": message.tool_calls[0].id,
-                        "function_name": message.tool_calls[0].function.name,
-                        "arguments": message.tool_calls[0].function.name,
-                    }
-                    messages.append(tool_call_message)
-                else:
-                    messages.append(message)
+        self._state = self._state[count:]
+        self._tokens = self._tokens[count:]
+        self._dicts = self._dicts[count:]
+        self._records = self._records[count:]
+
+        self._summary = DeveloperMessage(self.SUMMARY_PREFIX + summary)
+        self._summary_tokens = self.count_tokens(self._summary)
+        self._header = [self._prompt_dict, self._summary.to_dict()]
+        self._changed()
+
+    def transcript(self, messages: list[Message], max_length: int = 2000) -> str:
+        """
+        Render the summary and `messages` as plain text for summarisation.
+
+        Args:
+            messages (list[Message]): The messages to render.
+            max_length (int): The number of characters kept from each message.
+        """
+        lines = []
+        if self.summary:
+            lines.append(f"summary: {self.summary}")
+
+        for message in messages:
+            if isinstance(message, ToolCallMessage):
+                for tool_call in message.tool_calls:
+                    lines.append(
+                        f"assistant called {tool_call['function']['name']}"
+                        f"({tool_call['function']['arguments'][:max_length]})"
+                    )
             else:
-                raise ValueError(f"Unknown message type: {type(message)}")
+                lines.append(f"{message.role}: {message.content[:max_length]}")
 
-        messages.insert(0, self._prompt.to_dict())
-        return messages
+        return "\n".join(lines)
+
+    @staticmethod
+    def count_tokens(message: Message) -> int:
+        text = message.content or ""
+        if isinstance(message, ToolCallMessage):
+            for tool_call in message.tool_calls:
+                text += (
+                    tool_call["function"]["name"] + tool_call["function"]["arguments"]
+                )
+
+        return MESSAGE_OVERHEAD + count_tokens(text)
+
+    def to_messages(self, to_dict: bool = False) -> list[dict]:
+        """
+        Get the conversation (prompt first) in API form, or in its JSON form.
+
+        The returned list is a new list of the cached dicts which must not be modified.
+        """
+        if to_dict:
+            return [self._prompt_dict] + self._records
+        return self._header + self._dicts
+
+    def to_json(self, last: int | None = None) -> str:
+        """
+        The (cached) JSON form of the conversation.
+
+        Args:
+            last (int | None): Only include the prompt and the last `last` messages.
+        """
+        if last not in self._json:
+            records = self._records[-last:] if last else self._records
+            self._json[last] = json.dumps([self._prompt_dict] + records)
+        return self._json[last]
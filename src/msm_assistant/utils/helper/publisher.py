@@ -0,0 +1,118 @@
+import asyncio
+import logging
+from typing import Callable
+
+from asyncua import Client, ua
+
+logger = logging.getLogger(__name__)
+
+
+class StatePublisher:
+    """
+    Publishes the assistant state and conversation to an OPCUA server on change.
+
+    Changes are signalled with `notify`. Bursts of changes within `window` seconds are
+    coalesced and both nodes are written in a single `write_values` call, skipping the
+    write entirely if nothing has changed since the last one. If the session drops,
+    the client reconnects with exponential backoff and publishes the latest values.
+    """
+
+    INITIAL_BACKOFF = 0.5  # seconds
+    MAX_BACKOFF = 30.0  # seconds
+
+    def __init__(
+        self,
+        url: str,
+        state_node_id: str,
+        conversation_node_id: str,
+        read_state: Callable[[], str],
+        read_conversation: Callable[[], str],
+        window: float = 0.1,
+    ):
+        """
+        Args:
+            url (str): The URL of the OPCUA server.
+            state_node_id (str): The node the assistant state is written to.
+            conversation_node_id (str): The node the conversation JSON is written to.
+            read_state (Callable[[], str]): Returns the current state.
+            read_conversation (Callable[[], str]): Returns the current conversation JSON.
+            window (float): Seconds to wait for further changes before publishing.
+        """
+        self._url = url
+        self._state_node_id = state_node_id
+        self._conversation_node_id = conversation_node_id
+        self._read_state = read_state
+        self._read_conversation = read_conversation
+        self._window = window
+
+        self._client: Client | None = None
+        self._nodes = None
+        self._changed = asyncio.Event()
+        self._published: tuple[str, str] | None = None
+        self._task: asyncio.Task | None = None
+
+    async def start(self) -> None:
+        self._changed.set()  # * publish the initial state
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+        await self._disconnect()
+
+    def notify(self, *args, **kwargs) -> None:
+        """Signal that the state or the conversation has changed."""
+        self._changed.set()
+
+    async def _run(self) -> None:
+        backoff = self.INITIAL_BACKOFF
+        while True:
+            await self._changed.wait()
+            await asyncio.sleep(self._window)  # * coalesce bursts of changes
+            self._changed.clear()
+
+            try:
+                if self._client is None:
+                    await self._connect()
+                await self._publish()
+                backoff = self.INITIAL_BACKOFF
+            except Exception as e:
+                logger.warning(
+                    f"Failed to publish state to OPCUA ({e}), retrying in {backoff}s"
+                )
+                await self._disconnect()
+                await asyncio.sleep(backoff)
+                backoff = min(2 * backoff, self.MAX_BACKOFF)
+                self._changed.set()  # * republish the latest values once reconnected
+
+    async def _publish(self) -> None:
+        values = (self._read_state(), self._read_conversation())
+        if values == self._published:
+            return
+
+        await self._client.write_values(
+            self._nodes,
+            [ua.Variant(value, ua.VariantType.String) for value in values],
+        )
+        self._published = values
+
+    async def _connect(self) -> None:
+        self._client = Client(url=self._url)
+        await self._client.connect()
+        self._nodes = [
+            self._client.get_node(self._state_node_id),
+            self._client.get_node(self._conversation_node_id),
+        ]
+        self._published = None  # * the server may have restarted
+        logger.info("Connected to OPCUA server")
+
+    async def _disconnect(self) -> None:
+        if self._client is None:
+            return
+        try:
+            await self._client.disconnect()
+        except Exception:
+            pass  # * the session is usually already gone
+        self._client = None
@@ -0,0 +1,176 @@
+import asyncio
+import logging
+import re
+from typing import AsyncIterator, Awaitable, Callable
+
+logger = logging.getLogger(__name__)
+
+
+class SentenceSplitter:
+    """
+    Incrementally splits streamed text into sentences.
+
+    Text is fed in as it arrives and complete sentences are returned as soon as a
+    sentence boundary has been seen. Any trailing text is returned by `flush`.
+    """
+
+    BOUNDARY = re.compile(r"[.!?]+[\"')\]]*\s+|\n\s*\n")
+    ABBREVIATIONS = {
+        "dr",
+        "mr",
+        "mrs",
+        "ms",
+        "prof",
+        "st",
+        "vs",
+        "etc",
+        "e.g",
+        "i.e",
+        "approx",
+        "no",
+    }
+
+    def __init__(self, min_length: int = 10):
+        self._min_length = min_length
+        self._buffer = ""
+
+    def feed(self, text: str) -> list[str]:
+        """
+        Add text to the buffer.
+
+        Args:
+            text (str): The next piece of streamed text.
+        Returns:
+            list[str]: The sentences completed by this piece of text.
+        """
+        self._buffer += text
+
+        sentences = []
+        start = 0
+        for match in self.BOUNDARY.finditer(self._buffer):
+            candidate = self._buffer[start : match.end()].strip()
+            if len(candidate) < self._min_length or self._is_abbreviation(candidate):
+                continue
+
+            sentences.append(candidate)
+            start = match.end()
+
+        self._buffer = self._buffer[start:]
+        return sentences
+
+    def flush(self) -> str | None:
+        """Return whatever text is left in the buffer."""
+        remainder = self._buffer.strip()
+        self._buffer = ""
+        return remainder if remainder else None
+
+    def _is_abbreviation(self, candidate: str) -> bool:
+        words = candidate.rstrip("\"')]").split()
+        if not words or not words[-1].endswith("."):
+            return False
+
+        return words[-1].rstrip(".").lower() in self.ABBREVIATIONS
+
+
+class SpeechPipeline:
+    """
+    Streams text deltas into sentence-level speech synthesis.
+
+    Each completed sentence is sent to the speech endpoint while later text is still
+    arriving. Audio is played back strictly in sentence order, with up to `lookahead`
+    sentences being synthesised ahead of the one that is currently playing.
+    """
+
+    _END = object()
+
+    def __init__(
+        self,
+        synthesise: Callable[[str], AsyncIterator[bytes]],
+        play: Callable[[bytes], Awaitable[None]],
+        lookahead: int = 2,
+    ):
+        self._synthesise = synthesise
+        self._play = play
+        self._lookahead = lookahead
+
+    async def run(self, deltas: AsyncIterator[str], stop_flag: asyncio.Event) -> str:
+        """
+        Speak the streamed text until it is exhausted or `stop_flag` is set.
+
+        Args:
+            deltas (AsyncIterator[str]): The streamed text of the reply.
+            stop_flag (asyncio.Event): Interrupts both the text and the audio streams.
+        Returns:
+            str: The text that was received before the pipeline finished.
+        """
+        received: list[str] = []
+        sentences: asyncio.Queue = asyncio.Queue(maxsize=self._lookahead)
+        synthesis_tasks: list[asyncio.Task] = []
+
+        async def produce():
+            splitter = SentenceSplitter()
+            try:
+                async for delta in deltas:
+                    received.append(delta)
+                    for sentence in splitter.feed(delta):
+                        await sentences.put(
+                            self._start_synthesis(sentence, synthesis_tasks)
+                        )
+
+                remainder = splitter.flush()
+                if remainder:
+                    await sentences.put(
+                        self._start_synthesis(remainder, synthesis_tasks)
+                    )
+            except Exception:
+                await sentences.put(self._END)  # * let queued speech finish first
+                raise
+            await sentences.put(self._END)
+
+        async def consume():
+            while (audio := await sentences.get()) is not self._END:
+                while (chunk := await audio.get()) is not self._END:
+                    if isinstance(chunk, BaseException):
+                        raise chunk
+                    await self._play(chunk)
+
+        producer = asyncio.create_task(produce())
+        consumer = asyncio.create_task(consume())
+        stopper = asyncio.create_task(stop_flag.wait())
+        try:
+            done, _ = await asyncio.wait(
+                {consumer, stopper}, return_when=asyncio.FIRST_COMPLETED
+            )
+            if stopper in done:
+                logger.info("Speech interrupted")
+            else:
+                consumer.result()  # * raises synthesis and playback errors
+                await producer  # * raises text stream errors
+        finally:
+            for task in [producer, consumer, stopper, *synthesis_tasks]:
+                task.cancel()
+            await asyncio.gather(
+                producer, consumer, stopper, *synthesis_tasks, return_exceptions=True
+            )
+
+        return "".join(received)
+
+    def _start_synthesis(
+        self, sentence: str, tasks: list[asyncio.Task]
+    ) -> asyncio.Queue:
+        """Start synthesising a sentence in the background, returning its audio queue."""
+        audio: asyncio.Queue = asyncio.Queue()
+
+        async def synthesise():
+            try:
+                async for chunk in self._synthesise(sentence):
+                    audio.put_nowait(chunk)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                audio.put_nowait(e)
+            finally:
+                audio.put_nowait(self._END)
+
+        tasks.append(asyncio.create_task(synthesise()))
+        return audio
@@ -0,0 +1,42 @@
+import logging
+from functools import lru_cache
+
+logger = logging.getLogger(__name__)
+try:
+    import tiktoken as _tiktoken
+except ImportError:
+    _tiktoken = None
+    logger.info("tiktoken is not installed, token counts will be estimated")
+
+CHARACTERS_PER_TOKEN = 4  # rough average for English text
+MESSAGE_OVERHEAD = 4  # tokens added per message by the chat format
+DEFAULT_ENCODING = "o200k_base"
+
+
+@lru_cache(maxsize=8)
+def _get_encoding(model: str | None):
+    try:
+        return _tiktoken.encoding_for_model(model)
+    except (KeyError, TypeError):
+        return _tiktoken.get_encoding(DEFAULT_ENCODING)
+
+
+def count_tokens(text: str | None, model: str | None = None) -> int:
+    """
+    Count the tokens in a piece of text.
+
+    Uses tiktoken when it is installed and falls back to an estimate otherwise.
+
+    Args:
+        text (str | None): The text to count.
+        model (str | None): The model whose tokenizer should be used.
+    Returns:
+        int: The number of tokens.
+    """
+    if not text:
+        return 0
+
+    if _tiktoken is None:
+        return -(-len(text) // CHARACTERS_PER_TOKEN)
+
+    return len(_get_encoding(model).encode(text, disallowed_special=()))
@@ -1,25 +1,54 @@
+import json
+import logging
+import time
+from pathlib import Path
+
+import numpy as np
 from openai import AsyncOpenAI
 from qdrant_client import AsyncQdrantClient
 from qdrant_client.models import (FieldCondition, Filter, MatchValue,
-                                  ScoredPoint)
+                                  QuantizationSearchParams, QueryRequest,
+                                  ScoredPoint, SearchParams)
 
+from ..embedding_cache import EmbeddingCache, model_key
+from ..tokens import count_tokens
+from ..vector_index import VectorIndex
 from .base import Tool
 
+logger = logging.getLogger(__name__)
+
 # todo: move this to a constants file
 METADATA_COLLECTION_NAME = "metadata"
 
 
 class Metadata:
-    def __init__(self, name: str, embedding_model: str, dimensionality: int):
+    def __init__(
+        self,
+        name: str,
+        embedding_model: str,
+        dimensionality: int,
+        version: str | None = None,
+        dimensions: int | None = None,
+        quantization: str | None = None,
+        collection: str | None = None,
+    ):
         self.name = name
         self.embedding_model = embedding_model
         self.dimensionality = dimensionality
+        self.version = version
+        self.dimensions = dimensions  # * shortened embedding size (None if native)
+        self.quantization = quantization
+        self.collection = collection  # * the versioned collection behind the alias
 
     def to_dict(self) -> dict:
         return {
             "name": self.name,
             "embedding_model": self.embedding_model,
             "dimensionality": self.dimensionality,
+            "version": self.version,
+            "dimensions": self.dimensions,
+            "quantization": self.quantization,
+            "collection": self.collection,
         }
 
     @classmethod
@@ -28,12 +57,28 @@ class Metadata:
             name=data["name"],
             embedding_model=data["embedding_model"],
             dimensionality=data["dimensionality"],
+            version=data.get("version"),  # * collections created before versioning
+            dimensions=data.get("dimensions"),
+            quantization=data.get("quantization"),
+            collection=data.get("collection"),
         )
 
 
 class DatabaseRead(Tool):
     def __init__(
-        self, url: str, collection: str, description: str | None = None
+        self,
+        url: str,
+        collection: str,
+        description: str | None = None,
+        cache: EmbeddingCache | None = None,
+        local_index: bool = False,
+        max_local_points: int = 10_000,
+        snapshot: Path | str | None = None,
+        refresh_interval: float = 60.0,
+        payload_fields: list[str] | None = None,
+        max_limit: int = 10,
+        score_threshold: float | None = None,
+        max_tokens: int = 1500,
     ):  #! consider making the description a parameter
         self._url = url
         self._collection = collection
@@ -42,15 +87,217 @@ class DatabaseRead(Tool):
 
         self._qdrant_client = AsyncQdrantClient(url=self._url)
         self._openai_client = AsyncOpenAI()
+        self._cache = cache if cache else EmbeddingCache()
 
         self._metadata: Metadata | None = None
 
+        # * optional in-process mirror of the collection
+        self._local_index = local_index
+        self._max_local_points = max_local_points
+        self._snapshot = Path(snapshot) if snapshot else None
+        self._refresh_interval = refresh_interval
+        self._index: VectorIndex | None = None
+        self._checked = 0.0
+
+        # * bounds on what is returned to the model
+        self._payload_fields = (
+            payload_fields if payload_fields else ["text", "file", "pages", "files"]
+        )
+        self._max_limit = max_limit
+        self._score_threshold = score_threshold
+        self._max_tokens = max_tokens
+
     @classmethod
     def name(self) -> str:
         return "search_knowledge_base"
 
     async def init(self) -> None:
         """Initialize the knowledge base with metadata."""
+        try:
+            self._metadata = await self._read_metadata()
+        except Exception as e:
+            # * start from the snapshot while Qdrant is unreachable
+            index = VectorIndex.load(self._snapshot) if self._snapshot else None
+            if index is None or index.metadata is None:
+                raise
+            logger.warning(
+                f"Failed to read the metadata ({e}), "
+                f"searching the snapshot of {self._collection} until Qdrant is back"
+            )
+            self._metadata = Metadata.from_dict(index.metadata)
+            self._index = index
+            self._checked = time.monotonic()
+            return
+
+        self._checked = time.monotonic()
+        if self._local_index:
+            await self._build_index()
+
+    async def execute(self, arguments: dict) -> str:
+        """
+        Execute the knowledge base search.
+
+        Returns the merged results as compact JSON, packed to fit the token budget.
+
+        args (dict): Tool call arguments
+        """
+        if not self._metadata:
+            await self.init()
+        else:
+            await self._refresh()
+
+        # * a single query is still accepted from older tool definitions
+        queries = arguments.get("queries") or [arguments["query"]]
+        limit = min(max(arguments["limit"], 1), self._max_limit)
+
+        try:
+            hits = await self._search(queries, limit)
+        except Exception as e:
+            if not await self._dimensions_changed():
+                raise
+            #! the collection was rebuilt with other embeddings since the last refresh
+            logger.warning(f"Re-reading the metadata of {self._collection}: {e}")
+            await self._refresh(force=True)
+            hits = await self._search(queries, limit)
+
+        return self._pack(self._merge(hits))
+
+    async def _search(self, queries: list[str], limit: int) -> list[list[tuple]]:
+        """Get the (id, score, payload) hits of each query."""
+        # Get the embeddings for all queries in one request
+        query_embeddings = await self._encode_many(queries)
+
+        # Search the local index or the knowledge base
+        if self._index is not None:
+            hits = [
+                self._index.search(query_embedding, limit, self._score_threshold)
+                for query_embedding in query_embeddings
+            ]
+        else:
+            responses = await self._qdrant_client.query_batch_points(
+                collection_name=self._collection,
+                requests=[
+                    QueryRequest(
+                        query=query_embedding,
+                        limit=limit,
+                        with_payload=self._payload_fields,
+                        score_threshold=self._score_threshold,
+                        params=self._search_params(),
+                    )
+                    for query_embedding in query_embeddings
+                ],
+            )
+            hits = []
+            for response in responses:
+                points: list[ScoredPoint] = response.points
+                hits.append(
+                    [(point.id, point.score, point.payload) for point in points]
+                )
+        return hits
+
+    async def _dimensions_changed(self) -> bool:
+        """Whether the collection holds vectors of another size than the metadata."""
+        try:
+            info = await self._qdrant_client.get_collection(
+                collection_name=self._collection
+            )
+        except Exception as e:
+            logger.warning(f"Failed to read the collection {self._collection}: {e}")
+            return False
+        return info.config.params.vectors.size != self._metadata.dimensionality
+
+    def _search_params(self) -> SearchParams | None:
+        """Rescore quantized collections with the original vectors."""
+        OVERSAMPLING = 2.0
+
+        if not self._metadata.quantization:
+            return None
+        return SearchParams(
+            quantization=QuantizationSearchParams(
+                rescore=True, oversampling=OVERSAMPLING
+            )
+        )
+
+    def _merge(self, hits: list[list[tuple]]) -> list[dict]:
+        """Merge the hits of each query, keeping the best score of each point."""
+        best: dict[object, tuple[float, dict]] = {}
+        for query_hits in hits:
+            for point_id, score, payload in query_hits:
+                if point_id not in best or score > best[point_id][0]:
+                    best[point_id] = (score, payload)
+
+        ranked = sorted(best.values(), key=lambda hit: hit[0], reverse=True)
+        return [
+            {
+                "score": round(score, 4),
+                **{
+                    field: payload[field]
+                    for field in self._payload_fields
+                    if field in payload
+                },
+            }
+            for score, payload in ranked
+        ]
+
+    def _pack(self, results: list[dict]) -> str:
+        """Serialize the best results that fit within the token budget."""
+        packed = []
+        tokens = 2  # * the enclosing brackets
+        for result in results:
+            item = self._dumps(result)
+            item_tokens = count_tokens(item) + 1
+            if tokens + item_tokens > self._max_tokens:
+                if not packed:
+                    # * always return the best result, even if it has to be cut short
+                    item = self._truncate(result, self._max_tokens - tokens - 1)
+                    if item is not None:
+                        packed.append(item)
+                break
+
+            packed.append(item)
+            tokens += item_tokens
+
+        # * the items were counted separately, so check the output as a whole
+        output = "[" + ",".join(packed) + "]"
+        while packed and count_tokens(output) > self._max_tokens:
+            packed.pop()
+            output = "[" + ",".join(packed) + "]"
+
+        if len(packed) < len(results):
+            logger.info(
+                f"Returned {len(packed)} of {len(results)} results within "
+                f"{self._max_tokens} tokens"
+            )
+        return output
+
+    def _truncate(self, result: dict, max_tokens: int) -> str | None:
+        """Serialize a result with the longest prefix of its text that fits."""
+        text = result.get("text")
+        if not isinstance(text, str):
+            return None
+
+        def fits(length: int) -> bool:
+            item = self._dumps({**result, "text": text[:length]})
+            return count_tokens(item) <= max_tokens
+
+        # * escaping and tokenisation vary, so search on measured token counts
+        low, high = 0, len(text)
+        while low < high:
+            middle = (low + high + 1) // 2
+            if fits(middle):
+                low = middle
+            else:
+                high = middle - 1
+
+        if low == 0:
+            return None
+        return self._dumps({**result, "text": text[:low]})
+
+    @staticmethod
+    def _dumps(result: dict) -> str:
+        return json.dumps(result, separators=(",", ":"), ensure_ascii=False)
+
+    async def _read_metadata(self) -> Metadata:
         scroll_result = await self._qdrant_client.scroll(
             collection_name=METADATA_COLLECTION_NAME,
             scroll_filter=Filter(
@@ -66,41 +313,93 @@ class DatabaseRead(Tool):
         )
 
         if scroll_result[0]:
-            self._metadata = Metadata.from_dict(scroll_result[0][0].payload)
+            return Metadata.from_dict(scroll_result[0][0].payload)
         else:
             raise ValueError(f"Metadata for collection {self._collection} not found.")
 
-    async def execute(self, arguments: dict) -> list:
+    async def _build_index(self) -> None:
+        """Mirror the collection locally, unless it is too large to search in-process."""
+        self._checked = time.monotonic()
+        count = await self._qdrant_client.count(
+            collection_name=self._versioned_collection(), exact=True
+        )
+        if count.count > self._max_local_points:
+            logger.info(
+                f"Collection {self._collection} has {count.count} points, "
+                f"searching with Qdrant instead of a local index"
+            )
+            self._index = None
+            return
+
+        index = VectorIndex.load(self._snapshot) if self._snapshot else None
+        if (
+            index is None
+            or index.version is None
+            or index.version != self._metadata.version
+        ):
+            index = await self._scroll_index()
+            if self._snapshot:
+                index.save(self._snapshot)
+
+        self._index = index
+        logger.info(f"Local index of {self._collection} holds {len(index)} points")
+
+    def _versioned_collection(self) -> str:
         """
-        Execute the knowledge base search.
+        The collection that the metadata describes.
 
-        args (dict): Tool call arguments
+        The alias is only swapped after the metadata is written, so mirroring the alias
+        could store the previous version under the new version.
         """
-        if not self._metadata:
-            await self.init()
+        return self._metadata.collection or self._collection
 
-        query = arguments["query"]
-        limit = arguments["limit"]
+    async def _scroll_index(self) -> VectorIndex:
+        BATCH_SIZE = 256
 
-        # Get the embedding for the query
-        query_embedding = await self._encode(query)
+        ids, vectors, payloads = [], [], []
+        offset = None
+        while True:
+            points, offset = await self._qdrant_client.scroll(
+                collection_name=self._versioned_collection(),
+                limit=BATCH_SIZE,
+                offset=offset,
+                with_payload=True,
+                with_vectors=True,
+            )
+            for point in points:
+                ids.append(point.id)
+                vectors.append(point.vector)
+                payloads.append(point.payload)
+            if offset is None:
+                break
 
-        # Search the knowledge base
-        search_result = await self._qdrant_client.query(
-            collection_name=self._collection,
-            query_vector=query_embedding,
-            limit=limit,
-            with_payload=True,
-            with_vectors=False,
+        return VectorIndex(
+            ids=ids,
+            vectors=np.array(vectors, dtype=np.float32).reshape(
+                len(vectors), self._metadata.dimensionality
+            ),
+            payloads=payloads,
+            version=self._metadata.version,
+            metadata=self._metadata.to_dict(),
         )
 
-        # Extract the results
-        results = []
-        for point in search_result:
-            point: ScoredPoint
-            results.append(point.payload)
+    async def _refresh(self, force: bool = False) -> None:
+        """Re-read the metadata, rebuilding the local index if the collection changed."""
+        if not force and time.monotonic() - self._checked < self._refresh_interval:
+            return
 
-        return results
+        self._checked = time.monotonic()
+        try:
+            metadata = await self._read_metadata()
+            if metadata.version is None or metadata.version != self._metadata.version:
+                self._metadata = metadata
+                if self._local_index:
+                    await self._build_index()
+                else:
+                    self._index = None  # * a snapshot searched while Qdrant was down
+        except Exception as e:
+            # * keep answering with what we have while Qdrant is unreachable
+            logger.warning(f"Failed to refresh the metadata: {e}")
 
     async def _encode(self, query: str) -> list:
         """
@@ -108,11 +407,44 @@ class DatabaseRead(Tool):
 
         query (str): The query to encode.
         """
-        response = await self._openai_client.embeddings.create(
-            input=query,
-            model=self._metadata.embedding_model,
+        return (await self._encode_many([query]))[0]
+
+    async def _encode_many(self, queries: list[str]) -> list[list]:
+        """
+        Encode several queries, embedding any that aren't cached in a single request.
+
+        queries (list[str]): The queries to encode.
+        """
+        model = self._metadata.embedding_model
+        dimensions = self._metadata.dimensions  # * must match the collection
+        key = model_key(model, dimensions)
+        embeddings = [self._cache.get(key, query) for query in queries]
+
+        missing = list(
+            dict.fromkeys(
+                query
+                for query, embedding in zip(queries, embeddings)
+                if embedding is None
+            )
+        )
+        if missing:
+            response = await self._openai_client.embeddings.create(
+                input=missing,
+                model=model,
+                **({"dimensions": dimensions} if dimensions else {}),
+            )
+            new_embeddings = [data.embedding for data in response.data]
+            self._cache.put_many(key, missing, new_embeddings)
+            lookup = dict(zip(missing, new_embeddings))
+            embeddings = [
+                embedding if embedding is not None else lookup[query]
+                for query, embedding in zip(queries, embeddings)
+            ]
+
+        logger.debug(
+            f"Embedding cache: {self._cache.hits} hits, {self._cache.misses} misses"
         )
-        return response.data[0].embedding
+        return embeddings
 
     def get_definition(self) -> dict:
         return {
@@ -124,16 +456,17 @@ class DatabaseRead(Tool):
                 "parameters": {
                     "type": "object",
                     "properties": {
-                        "query": {
-                            "type": "string",
-                            "description": "The question, keywords, or phrase to use for searching the database.",
+                        "queries": {
+                            "type": "array",
+                            "items": {"type": "string"},
+                            "description": "The questions, keywords, or phrases to use for searching the database. Use one query for each facet of the question.",
                         },
                         "limit": {
                             "type": "integer",
-                            "description": "The maximum number of results to return.",
+                            "description": f"The maximum number of results to return for each query (at most {self._max_limit}).",
                         },
                     },
-                    "required": ["query", "limit"],
+                    "required": ["queries", "limit"],
                     "additionalProperties": False,
                 },
             },
@@ -0,0 +1,155 @@
+import json
+import logging
+import os
+import tempfile
+from pathlib import Path
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+
+class VectorIndex:
+    """
+    An in-process cosine similarity index over a small collection.
+
+    Vectors are held in one contiguous float32 matrix, normalised up front so that a
+    search is a single matrix-vector product followed by a partial sort of the top
+    `limit` scores. The index can be saved as an `.npy` snapshot (with a `.json`
+    sidecar for the ids, payloads and collection metadata) and loaded back
+    memory-mapped, so it can be searched even when the database is unreachable.
+    """
+
+    def __init__(
+        self,
+        ids: list,
+        vectors: np.ndarray,
+        payloads: list[dict],
+        version: str | None = None,
+        normalised: bool = False,
+        metadata: dict | None = None,
+    ):
+        """
+        Args:
+            ids (list): The id of each point.
+            vectors (np.ndarray): An (N, D) matrix of point vectors.
+            payloads (list[dict]): The payload of each point.
+            version (str | None): The metadata version the index was built from.
+            normalised (bool): Whether the vectors already have unit length.
+            metadata (dict | None): The metadata of the collection the index mirrors.
+        """
+        if not (len(ids) == len(vectors) == len(payloads)):
+            raise ValueError("Every point needs an id, a vector and a payload")
+
+        if not normalised:
+            vectors = np.asarray(vectors, dtype=np.float32)
+            norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+            vectors = vectors / np.maximum(norms, np.finfo(np.float32).tiny)
+
+        self.ids = ids
+        self.vectors = vectors
+        self.payloads = payloads
+        self.version = version
+        self.metadata = metadata
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def search(
+        self, query: list[float], limit: int, score_threshold: float | None = None
+    ) -> list[tuple[object, float, dict]]:
+        """
+        Find the points most similar to the query.
+
+        Args:
+            query (list[float]): The query vector.
+            limit (int): The maximum number of results.
+            score_threshold (float | None): The minimum similarity of a result.
+        Returns:
+            list[tuple[object, float, dict]]: (id, score, payload) by descending score.
+        """
+        limit = min(limit, len(self))
+        if limit <= 0:
+            return []
+
+        query = np.asarray(query, dtype=np.float32)
+        scores = self.vectors @ (query / max(np.linalg.norm(query), 1e-12))
+
+        top = np.argpartition(-scores, limit - 1)[:limit]
+        top = top[np.argsort(-scores[top])]
+        if score_threshold is not None:
+            top = top[scores[top] >= score_threshold]
+        return [(self.ids[i], float(scores[i]), self.payloads[i]) for i in top]
+
+    def save(self, path: Path) -> None:
+        """
+        Write the index to `path` (.npy) and its sidecar (.json).
+
+        Both files are written to temporary files and moved into place, the sidecar
+        last, so a reader never sees a partly written snapshot and an interrupted save
+        leaves the sidecar of the previous snapshot (whose version is then stale).
+        """
+        path = Path(path).expanduser()
+        path.parent.mkdir(parents=True, exist_ok=True)
+        sidecar = {
+            "version": self.version,
+            "metadata": self.metadata,
+            "ids": self.ids,
+            "payloads": self.payloads,
+        }
+        self._replace(
+            path.with_suffix(".npy"), lambda file: np.save(file, self.vectors)
+        )
+        self._replace(
+            path.with_suffix(".json"),
+            lambda file: file.write(json.dumps(sidecar).encode()),
+        )
+
+    @staticmethod
+    def _replace(path: Path, write) -> None:
+        """Write a file through a temporary file in the same directory."""
+        descriptor, temporary = tempfile.mkstemp(
+            dir=path.parent, prefix=f".{path.name}.", suffix=".tmp"
+        )
+        try:
+            with os.fdopen(descriptor, "wb") as file:
+                write(file)
+                file.flush()
+                os.fsync(file.fileno())
+            os.replace(temporary, path)
+        except BaseException:
+            Path(temporary).unlink(missing_ok=True)
+            raise
+
+    @classmethod
+    def load(cls, path: Path):
+        """
+        Load a saved index with its vectors memory-mapped.
+
+        Returns:
+            VectorIndex | None: The index, or None if no snapshot exists.
+        """
+        path = Path(path).expanduser()
+        if not (
+            path.with_suffix(".npy").exists() and path.with_suffix(".json").exists()
+        ):
+            return None
+
+        try:
+            with open(path.with_suffix(".json"), "r") as file:
+                sidecar = json.load(file)
+            vectors = np.load(path.with_suffix(".npy"), mmap_mode="r")
+
+            # * snapshots saved before the metadata was kept have none
+            return cls(
+                ids=sidecar["ids"],
+                vectors=vectors,
+                payloads=sidecar["payloads"],
+                version=sidecar["version"],
+                normalised=True,
+                metadata=sidecar.get("metadata"),
+            )
+        except ValueError as e:
+            # * e.g. a save interrupted between replacing the vectors and the sidecar
+            logger.warning(f"Ignoring the unreadable snapshot {path}: {e}")
+            return None
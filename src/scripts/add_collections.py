@@ -1,75 +1,154 @@
 #!/usr/bin/env python3
 import argparse
 import asyncio
+import hashlib
 import json
 import logging
+import random
+import time
 import uuid
 from pathlib import Path
+from typing import Callable
 
+import numpy as np
 from dotenv import load_dotenv
-from openai import AsyncOpenAI
-from qdrant_client import AsyncQdrantClient
-from qdrant_client.models import (Distance, FieldCondition, Filter,
-                                  FilterSelector, MatchValue, PointStruct,
-                                  VectorParams)
+from openai import APIConnectionError, APIStatusError, AsyncOpenAI
+from qdrant_client import AsyncQdrantClient, models
 from yaspin import yaspin
 from yaspin.spinners import Spinners
 
+from msm_assistant.utils.helper import embedding_cache
+from msm_assistant.utils.helper.tokens import count_tokens
+from scripts.utils.dedup import near_duplicates
 from scripts.utils.interfaces import Collection, Summary
 
 logger = logging.getLogger(__name__)
 
+VERSION_SEPARATOR = "__v"  # * versioned collections are named <alias>__v<ms>
+
 EMBEDDING_MODELS = {
     "text-embedding-3-large": {
         "dimensions": 3072,
+        "shortenable": True,
     },
     "text-embedding-3-small": {
         "dimensions": 1536,
+        "shortenable": True,
     },
     "text-embedding-ada-002": {
         "dimensions": 1536,
+        "shortenable": False,
     },
 }
 
+QUANTIZATIONS = {
+    "scalar": models.ScalarQuantization(
+        scalar=models.ScalarQuantizationConfig(
+            type=models.ScalarType.INT8, always_ram=True
+        )
+    ),
+    "binary": models.BinaryQuantization(
+        binary=models.BinaryQuantizationConfig(always_ram=True)
+    ),
+}
+
 
 class Metadata:
-    def __init__(self, name: str, embedding_model: str, dimensionality: int):
+    def __init__(
+        self,
+        name: str,
+        embedding_model: str,
+        dimensionality: int,
+        version: str | None = None,
+        dimensions: int | None = None,
+        quantization: str | None = None,
+        replaced: dict[str, int] | None = None,
+        collection: str | None = None,
+    ):
         self.name = name
         self.embedding_model = embedding_model
         self.dimensionality = dimensionality
+        self.version = version if version else uuid.uuid4().hex
+        self.dimensions = dimensions  # * requested from the API (None if native)
+        self.quantization = quantization
+        # * when (ms) each previous version stopped being live, for garbage collection
+        self.replaced = replaced if replaced else {}
+        # * the versioned collection holding the points, which the alias may not
+        # * point to yet
+        self.collection = collection
 
     def to_dict(self) -> dict:
         return {
             "name": self.name,
             "embedding_model": self.embedding_model,
             "dimensionality": self.dimensionality,
+            "version": self.version,
+            "dimensions": self.dimensions,
+            "quantization": self.quantization,
+            "replaced": self.replaced,
+            "collection": self.collection,
         }
 
 
 class Chunk:
-    def __init__(self, file: str, text: str, vector: list[float] | None = None):
-        self._id = str(uuid.uuid4())
+    def __init__(
+        self,
+        collection: str,
+        file: str,
+        text: str,
+        vector: np.ndarray | None = None,
+        pages: list[int] | None = None,
+        files: list[str] | None = None,
+    ):
+        # * content-addressed, so an unchanged chunk keeps its id between runs
+        self._files = files if files else [file]
+        text_hash = hashlib.sha256(text.encode()).hexdigest()
+        self._id = str(
+            uuid.uuid5(
+                uuid.NAMESPACE_URL,
+                f"{collection}/{'|'.join(self._files)}/{text_hash}",
+            )
+        )
         self._file = file
         self._text = text
         self._vector = vector
+        self._pages = pages  # * the [first, last] page of a split PDF
 
-    def add_vector(self, vector: list[int]):
-        self._vector = vector
+    def add_vector(self, vector: list[float]):
+        # * float32 until serialisation, rather than a list of Python floats
+        self._vector = np.asarray(vector, dtype=np.float32)
 
     @property
     def payload(self) -> dict:
-        return {"file": self._file, "text": self._text}
+        payload = {"file": self._file, "text": self._text}
+        if self._pages is not None:
+            payload["pages"] = self._pages
+        if len(self._files) > 1:
+            payload["files"] = self._files  # * collapsed near duplicates
+        return payload
 
     @property
     def text(self) -> str:
         return self._text
 
+    @property
+    def file(self) -> str:
+        return self._file
+
+    @property
+    def files(self) -> list[str]:
+        return self._files
+
+    @property
+    def pages(self) -> list[int] | None:
+        return self._pages
+
     @property
     def id(self) -> str:
         return self._id
 
     @property
-    def vector(self) -> list[float]:
+    def vector(self) -> np.ndarray:
         if self._vector is None:
             raise ValueError("Chunk has not been assigned a vector.")
 
@@ -77,40 +156,220 @@ class Chunk:
 
 
 class Encoder:
-    def __init__(self, model: str):
+    """
+    Embeds chunks in batched requests.
+
+    Chunks are packed into requests by count and by token size, a bounded number of
+    requests run concurrently, and rate limit and server errors are retried with
+    jittered exponential backoff (honouring any `Retry-After` header).
+    """
+
+    MAX_RETRIES = 6
+    INITIAL_BACKOFF = 1.0  # seconds
+    MAX_BACKOFF = 60.0  # seconds
+
+    def __init__(
+        self,
+        model: str,
+        cache: embedding_cache.EmbeddingCache | None = None,
+        batch_size: int = 256,
+        batch_tokens: int = 100_000,
+        concurrency: int = 4,
+        dimensions: int | None = None,
+    ):
         if model not in EMBEDDING_MODELS.keys():
             raise ValueError(
                 f"The provided model '{model}' is not one of {EMBEDDING_MODELS}"
             )
 
-        self._openai_client = AsyncOpenAI()
+        if dimensions is not None and not (
+            EMBEDDING_MODELS[model]["shortenable"]
+            and 0 < dimensions <= EMBEDDING_MODELS[model]["dimensions"]
+        ):
+            raise ValueError(
+                f"The model '{model}' cannot produce {dimensions} dimensional embeddings"
+            )
+
+        self._openai_client = AsyncOpenAI(max_retries=0)  # * retried here instead
+        self._cache = cache if cache else embedding_cache.EmbeddingCache()
         self.model = model
+        self.dimensions = dimensions
+        self._cache_model = embedding_cache.model_key(model, dimensions)
+
+        self._batch_size = batch_size
+        self._batch_tokens = batch_tokens
+        # * shared by every collection being encoded, so the API sees at most
+        # * `concurrency` requests whatever the collection concurrency
+        self._requests = asyncio.Semaphore(concurrency)
 
     @property
     def dimensionality(self):
+        if self.dimensions:
+            return self.dimensions
         return EMBEDDING_MODELS[self.model]["dimensions"]
 
     async def encode(self, text: str) -> list[float]:
-        response = await self._openai_client.embeddings.create(
-            input=text,
-            model=self.model,
+        return (await self._encode_batch([text]))[0]
+
+    async def encode_collection(
+        self, chunks: list[str], report: Callable[[str], None] | None = None
+    ) -> list[list[float]]:
+        """
+        Embed chunks, only sending the ones that aren't in the cache.
+
+        Args:
+            chunks (list[str]): The text of each chunk.
+            report (Callable[[str], None] | None): Called with progress updates.
+        """
+        # only embed chunks that haven't been embedded by a previous run
+        encodings = dict(zip(chunks, self._cache.get_many(self._cache_model, chunks)))
+        missing = [chunk for chunk, encoding in encodings.items() if encoding is None]
+
+        started = time.monotonic()
+        done = {"chunks": 0, "tokens": 0}
+
+        async def encode_batch(batch: list[str], tokens: int):
+            batch_encodings = await self._encode_batch(batch)
+            self._cache.put_many(self._cache_model, batch, batch_encodings)
+            encodings.update(zip(batch, batch_encodings))
+
+            done["chunks"] += len(batch)
+            done["tokens"] += tokens
+            elapsed = max(time.monotonic() - started, 1e-6)
+            message = (
+                f"Embedded {done['chunks']}/{len(missing)} chunks "
+                f"({done['chunks'] / elapsed:.1f} chunks/s, "
+                f"{done['tokens'] / elapsed:.0f} tokens/s)"
+            )
+            logger.info(message)
+            if report:
+                report(message)
+
+        await asyncio.gather(
+            *[encode_batch(batch, tokens) for batch, tokens in self._batch(missing)]
         )
-        return response.data[0].embedding
 
-    async def encode_collection(self, chunks: list[str]) -> list[list[float]]:
-        tasks = [self.encode(chunk) for chunk in chunks]
-        encodings = await asyncio.gather(*tasks)
-        return encodings
+        logger.info(
+            f"Embedded {len(missing)} of {len(chunks)} chunks "
+            f"({self._cache.hits} cache hits, {self._cache.misses} misses)"
+        )
+        return [encodings[chunk] for chunk in chunks]
+
+    def _batch(self, chunks: list[str]) -> list[tuple[list[str], int]]:
+        """Pack chunks into batches limited by both count and tokens."""
+        batches = []
+        batch, batch_tokens = [], 0
+        for chunk in chunks:
+            tokens = count_tokens(chunk, self.model)
+            if batch and (
+                len(batch) >= self._batch_size
+                or batch_tokens + tokens > self._batch_tokens
+            ):
+                batches.append((batch, batch_tokens))
+                batch, batch_tokens = [], 0
+
+            batch.append(chunk)
+            batch_tokens += tokens
+
+        if batch:
+            batches.append((batch, batch_tokens))
+        return batches
+
+    async def _encode_batch(self, batch: list[str]) -> list[list[float]]:
+        for attempt in range(self.MAX_RETRIES + 1):
+            try:
+                async with self._requests:
+                    response = await self._openai_client.embeddings.create(
+                        input=batch,
+                        model=self.model,
+                        **({"dimensions": self.dimensions} if self.dimensions else {}),
+                    )
+                return [
+                    data.embedding
+                    for data in sorted(response.data, key=lambda data: data.index)
+                ]
+            except (APIStatusError, APIConnectionError) as e:
+                # * only rate limits (429) and server errors (5xx) are worth retrying
+                retryable = not isinstance(e, APIStatusError) or (
+                    e.status_code == 429 or e.status_code >= 500
+                )
+                if not retryable or attempt == self.MAX_RETRIES:
+                    raise
+
+                delay = self._retry_delay(e, attempt)
+                logger.warning(
+                    f"Embedding request failed ({e.__class__.__name__}), "
+                    f"retrying in {delay:.1f}s"
+                )
+                await asyncio.sleep(delay)
+
+    def _retry_delay(self, error: Exception, attempt: int) -> float:
+        response = getattr(error, "response", None)
+        retry_after = response.headers.get("retry-after") if response else None
+        try:
+            return float(retry_after) + random.uniform(0, 1)
+        except (TypeError, ValueError):
+            backoff = min(self.INITIAL_BACKOFF * 2**attempt, self.MAX_BACKOFF)
+            return random.uniform(backoff / 2, backoff)
+
+
+class Progress:
+    """A single spinner showing the status of every collection being processed."""
+
+    def __init__(self, spinner):
+        self._spinner = spinner
+        self._status: dict[str, str] = {}
+
+    def update(self, name: str, message: str):
+        self._status[name] = message
+        self._render()
+
+    def finish(self, name: str, message: str):
+        self._status.pop(name, None)
+        self._spinner.write(f"{name} - {message}")
+        self._render()
+
+    def _render(self):
+        self._spinner.text = " | ".join(
+            f"{name} - {message}" for name, message in self._status.items()
+        )
 
 
 class Database:
-    def __init__(self, url: str, model: str):
+    def __init__(
+        self,
+        url: str,
+        encoder: Encoder,
+        upsert_batch_size: int = 128,
+        upsert_concurrency: int = 4,
+        collection_concurrency: int = 2,
+        retention: float = 24 * 3600,
+        quantization: str | None = None,
+        on_disk: bool = False,
+        dedup_threshold: float | None = 0.9,
+    ):
         self._qdrant_client = AsyncQdrantClient(
             url=url
         )  # * parametrise this later if you want
-        self._encoder = Encoder(model)
+        self._encoder = encoder
 
-    async def _create_metadata(self, metadata: Metadata):
+        self._upsert_batch_size = upsert_batch_size
+        self._upsert_concurrency = upsert_concurrency
+        self._collection_concurrency = collection_concurrency
+        self._retention = retention  # * seconds that replaced versions are kept
+
+        if quantization is not None and quantization not in QUANTIZATIONS:
+            raise ValueError(
+                f"The quantization '{quantization}' is not one of {list(QUANTIZATIONS)}"
+            )
+        self._quantization = quantization
+        self._on_disk = on_disk  # * keep the original vectors on disk
+
+        if dedup_threshold is not None and not 0 < dedup_threshold <= 1:
+            raise ValueError("'dedup_threshold' must be in (0, 1]")
+        self._dedup_threshold = dedup_threshold
+
+    async def _create_metadata_collection(self):
         METADATA_COLLECTION_NAME = "metadata"
 
         # Check if the metadata collection exists
@@ -120,37 +379,50 @@ class Database:
         if not collection_exists:
             await self._qdrant_client.create_collection(
                 collection_name=METADATA_COLLECTION_NAME,
-                vectors_config=VectorParams(size=1, distance=Distance.EUCLID),
+                vectors_config=models.VectorParams(
+                    size=1, distance=models.Distance.EUCLID
+                ),
             )
 
-        # Delete the existing metadata
-        await self._qdrant_client.delete(
-            collection_name=METADATA_COLLECTION_NAME,
-            points_selector=FilterSelector(
-                filter=Filter(
-                    must=[
-                        FieldCondition(
-                            key="name",
-                            match=MatchValue(value=metadata.name),
-                        ),
-                    ],
-                )
-            ),
+    async def _create_metadata(self, metadata: Metadata):
+        METADATA_COLLECTION_NAME = "metadata"
+
+        # * one point per collection, overwritten in place so that it is never missing
+        point_id = str(
+            uuid.uuid5(
+                uuid.NAMESPACE_URL, f"{METADATA_COLLECTION_NAME}/{metadata.name}"
+            )
         )
 
-        # Create the metadata
+        # Write the metadata
         await self._qdrant_client.upsert(
             collection_name=METADATA_COLLECTION_NAME,
             wait=True,
             points=[
-                PointStruct(
-                    id=str(uuid.uuid4()),
+                models.PointStruct(
+                    id=point_id,
                     vector=[0],
                     payload=metadata.to_dict(),
                 )
             ],
         )
 
+        # Delete any other metadata (e.g. written before the point id was fixed)
+        await self._qdrant_client.delete(
+            collection_name=METADATA_COLLECTION_NAME,
+            points_selector=models.FilterSelector(
+                filter=models.Filter(
+                    must=[
+                        models.FieldCondition(
+                            key="name",
+                            match=models.MatchValue(value=metadata.name),
+                        ),
+                    ],
+                    must_not=[models.HasIdCondition(has_id=[point_id])],
+                )
+            ),
+        )
+
     @staticmethod
     def _get_collections(directory_path: Path) -> list[Collection]:
         # Get all the JSON collections in the directory
@@ -164,74 +436,382 @@ class Database:
         return collections
 
     def _get_chunks(self, collection: Collection) -> list[Chunk]:
-        chunks: list[Chunk] = []
+        chunks: dict[str, Chunk] = {}
 
         for summary in collection.summaries:
             summary: Summary
-            for chunk in summary.chunks:
-                chunks.append(Chunk(text=chunk, file=summary.file))
+            for index, text in enumerate(summary.chunks):
+                chunk = Chunk(
+                    collection=collection.name,
+                    text=text,
+                    file=summary.file,
+                    pages=summary.pages[index] if summary.pages else None,
+                )
+                chunks[chunk.id] = chunk  # * identical chunks share an id
 
-        return chunks
+        if self._dedup_threshold is None:
+            return list(chunks.values())
 
-    async def create(self, directory_path: Path):
-        if not directory_path.is_dir():
-            raise ValueError(
-                f"The provided path {directory_path} is not a valid directory."
-            )
+        return self._collapse_near_duplicates(collection.name, list(chunks.values()))
 
-        # Get all the JSON collections in the directory
-        collections: list[Collection] = self._get_collections(directory_path)
+    def _collapse_near_duplicates(self, name: str, chunks: list[Chunk]) -> list[Chunk]:
+        """
+        Collapse chunks with near-identical text into one point.
 
-        for collection in collections:
-            collection: Collection
-            with yaspin(
-                spinner=Spinners.dots, text=f"{collection.name} - Processing ..."
-            ) as sp:
-                # Get a list of all text
-                chunks: list[Chunk] = self._get_chunks(collection)
-
-                # Embed all text
-                sp.spinner = Spinners.binary
-                sp.text = f"{collection.name} - Encoding chunks ..."
-                embeddings = await self._encoder.encode_collection(
-                    chunks=[chunk.text for chunk in chunks]
-                )
-                for embedding, chunk in zip(embeddings, chunks, strict=True):
-                    chunk.add_vector(embedding)
+        The longest text of each group of near duplicates is kept, and the point
+        lists every file the group came from.
+        """
+        groups = near_duplicates(
+            [chunk.text for chunk in chunks], self._dedup_threshold
+        )
 
-                # Create the collection
-                sp.spinner = Spinners.material
-                sp.text = f"{collection.name} - Creating collection ..."
-                await self._qdrant_client.delete_collection(
-                    collection_name=collection.name
-                )
-                await self._qdrant_client.create_collection(
-                    collection_name=collection.name,
-                    vectors_config=VectorParams(
-                        size=self._encoder.dimensionality, distance=Distance.COSINE
-                    ),
+        collapsed = []
+        for group in groups:
+            members = [chunks[index] for index in group]
+            if len(members) == 1:
+                collapsed.append(members[0])
+                continue
+
+            kept = members[0]  # * the longest text, which the others duplicate
+            files = list(
+                dict.fromkeys(file for chunk in members for file in chunk.files)
+            )
+            collapsed.append(
+                Chunk(
+                    collection=name,
+                    text=kept.text,
+                    file=kept.file,
+                    pages=kept.pages,
+                    files=files,
                 )
+            )
 
-                # Add data to database
+        removed = len(chunks) - len(collapsed)
+        if removed:
+            logger.info(f"Collapsed {removed} near-duplicate chunks in {name}")
+        return collapsed
+
+    async def _read_metadata(self, name: str) -> dict | None:
+        METADATA_COLLECTION_NAME = "metadata"
+
+        if not await self._qdrant_client.collection_exists(METADATA_COLLECTION_NAME):
+            return None
+
+        points, _ = await self._qdrant_client.scroll(
+            collection_name=METADATA_COLLECTION_NAME,
+            scroll_filter=models.Filter(
+                must=[
+                    models.FieldCondition(
+                        key="name", match=models.MatchValue(value=name)
+                    )
+                ]
+            ),
+            limit=1,
+            with_payload=True,
+            with_vectors=False,
+        )
+        return points[0].payload if points else None
+
+    async def _get_point_ids(self, name: str) -> set[str]:
+        BATCH_SIZE = 1000
+
+        ids = set()
+        offset = None
+        while True:
+            points, offset = await self._qdrant_client.scroll(
+                collection_name=name,
+                limit=BATCH_SIZE,
+                offset=offset,
+                with_payload=False,
+                with_vectors=False,
+            )
+            ids.update(str(point.id) for point in points)
+            if offset is None:
+                return ids
+
+    async def _resolve(self, name: str) -> str | None:
+        """Get the versioned collection behind an alias (or a legacy collection)."""
+        aliases = await self._qdrant_client.get_aliases()
+        for alias in aliases.aliases:
+            if alias.alias_name == name:
+                return alias.collection_name
+
+        if await self._qdrant_client.collection_exists(name):
+            return name
+        return None
+
+    async def _can_update(self, name: str) -> bool:
+        """Whether the existing collection was embedded the same way as this run."""
+        if await self._resolve(name) is None:
+            return False
+
+        metadata = await self._read_metadata(name)
+        return (
+            metadata is not None
+            and metadata.get("embedding_model") == self._encoder.model
+            and metadata.get("dimensionality") == self._encoder.dimensionality
+            and metadata.get("dimensions") == self._encoder.dimensions
+            and metadata.get("quantization") == self._quantization
+        )
+
+    async def _encode_chunks(self, name: str, chunks: list[Chunk], progress: Progress):
+        embeddings = await self._encoder.encode_collection(
+            chunks=[chunk.text for chunk in chunks],
+            report=lambda message: progress.update(name, message),
+        )
+        for embedding, chunk in zip(embeddings, chunks, strict=True):
+            chunk.add_vector(embedding)
+
+    async def _upsert(
+        self, name: str, collection_name: str, chunks: list[Chunk], progress: Progress
+    ):
+        """Upsert chunks in batches, with a bounded number of batches in flight."""
+        semaphore = asyncio.Semaphore(self._upsert_concurrency)
+        started = time.monotonic()
+        done = 0
+
+        async def upsert_batch(batch: list[Chunk]):
+            nonlocal done
+            async with semaphore:
                 await self._qdrant_client.upsert(
-                    collection_name=collection.name,
+                    collection_name=collection_name,
                     wait=True,
                     points=[
-                        PointStruct(
-                            id=chunk.id, vector=chunk.vector, payload=chunk.payload
+                        models.PointStruct(
+                            id=chunk.id,
+                            vector=chunk.vector.tolist(),  # * one batch at a time
+                            payload=chunk.payload,
                         )
-                        for chunk in chunks
+                        for chunk in batch
                     ],
                 )
 
-                # Create the metadata
-                await self._create_metadata(
-                    Metadata(
-                        name=collection.name,
-                        embedding_model=self._encoder.model,
-                        dimensionality=self._encoder.dimensionality,
-                    )
+            done += len(batch)
+            elapsed = max(time.monotonic() - started, 1e-6)
+            progress.update(
+                name,
+                f"Upserted {done}/{len(chunks)} points ({done / elapsed:.0f} points/s)",
+            )
+
+        await asyncio.gather(
+            *[
+                upsert_batch(chunks[start : start + self._upsert_batch_size])
+                for start in range(0, len(chunks), self._upsert_batch_size)
+            ]
+        )
+
+    async def create(self, directory_path: Path, incremental: bool = False):
+        if not directory_path.is_dir():
+            raise ValueError(
+                f"The provided path {directory_path} is not a valid directory."
+            )
+
+        # Get all the JSON collections in the directory
+        collections: list[Collection] = self._get_collections(directory_path)
+        await self._create_metadata_collection()
+
+        semaphore = asyncio.Semaphore(self._collection_concurrency)
+        with yaspin(spinner=Spinners.dots, text="Processing ...") as sp:
+            progress = Progress(sp)
+
+            async def process(collection: Collection):
+                async with semaphore:
+                    await self._process(collection, incremental, progress)
+
+            await asyncio.gather(*[process(collection) for collection in collections])
+
+    async def _process(
+        self, collection: Collection, incremental: bool, progress: Progress
+    ):
+        started = time.monotonic()
+        progress.update(collection.name, "Processing ...")
+
+        # Get a list of all text
+        chunks: list[Chunk] = self._get_chunks(collection)
+        removed = sum(len(summary.chunks) for summary in collection.summaries) - len(
+            chunks
+        )
+
+        existing = await self._read_metadata(collection.name) or {}
+        metadata = Metadata(
+            name=collection.name,
+            embedding_model=self._encoder.model,
+            dimensionality=self._encoder.dimensionality,
+            dimensions=self._encoder.dimensions,
+            quantization=self._quantization,
+            replaced=existing.get("replaced"),
+        )
+        if incremental and await self._can_update(collection.name):
+            if not await self._update(collection, chunks, progress):
+                # * readers only rebuild their local index when the version changes
+                metadata.version = existing.get("version") or metadata.version
+            metadata.collection = await self._resolve(collection.name)
+            await self._create_metadata(metadata)
+        else:
+            await self._rebuild(collection, chunks, metadata, progress)
+        progress.finish(
+            collection.name,
+            f"{len(chunks)} chunks ({removed} duplicates removed) "
+            f"in {time.monotonic() - started:.1f}s",
+        )
+
+    async def _rebuild(
+        self,
+        collection: Collection,
+        chunks: list[Chunk],
+        metadata: Metadata,
+        progress: Progress,
+    ):
+        """Build a new version of the collection, then point the alias at it."""
+        version = f"{collection.name}{VERSION_SEPARATOR}{int(time.time() * 1000)}"
+        metadata.version = version
+        metadata.collection = version
+
+        # Embed all text
+        progress.update(collection.name, "Encoding chunks ...")
+        await self._encode_chunks(collection.name, chunks, progress)
+
+        # Create the collection
+        progress.update(collection.name, "Creating collection ...")
+        await self._qdrant_client.create_collection(
+            collection_name=version,
+            vectors_config=models.VectorParams(
+                size=self._encoder.dimensionality,
+                distance=models.Distance.COSINE,
+                on_disk=self._on_disk,
+            ),
+            quantization_config=(
+                QUANTIZATIONS[self._quantization] if self._quantization else None
+            ),
+        )
+
+        # Add data to database
+        await self._upsert(collection.name, version, chunks, progress)
+
+        # Swap the live collection over once the new version is ready
+        progress.update(collection.name, "Warming up collection ...")
+        await self._warm(version, chunks)
+
+        # Record when the live version is replaced, which starts its retention period
+        collections = await self._qdrant_client.get_collections()
+        names = {existing.name for existing in collections.collections}
+        metadata.replaced = {
+            name: replaced
+            for name, replaced in metadata.replaced.items()
+            if name in names
+        }
+        live = await self._resolve(collection.name)
+        if live is not None and live != collection.name:
+            metadata.replaced[live] = int(time.time() * 1000)
+
+        #! the metadata is written first, so that readers which find a vector size
+        #! mismatch after the swap can always re-read the new embedding settings, and
+        #! it names the new collection so that readers mirror it rather than the alias
+        await self._create_metadata(metadata)
+        await self._swap_alias(collection.name, version)
+        await self._collect_garbage(collection.name, version, metadata.replaced)
+
+    async def _warm(self, name: str, chunks: list[Chunk]):
+        """Wait for indexing to finish and run a query so the first search is fast."""
+        TIMEOUT = 300.0  # seconds
+        POLLING_PERIOD = 0.5  # seconds
+
+        deadline = time.monotonic() + TIMEOUT
+        while time.monotonic() < deadline:
+            info = await self._qdrant_client.get_collection(collection_name=name)
+            if info.status == models.CollectionStatus.GREEN:
+                break
+            await asyncio.sleep(POLLING_PERIOD)
+        else:
+            logger.warning(f"{name} is still being indexed, swapping anyway")
+
+        if chunks:
+            await self._qdrant_client.query_points(
+                collection_name=name, query=chunks[0].vector.tolist(), limit=1
+            )
+
+    async def _swap_alias(self, name: str, version: str):
+        """Atomically point the alias `name` at `version`."""
+        operations = []
+        aliases = await self._qdrant_client.get_aliases()
+        if any(alias.alias_name == name for alias in aliases.aliases):
+            operations.append(
+                models.DeleteAliasOperation(
+                    delete_alias=models.DeleteAlias(alias_name=name)
+                )
+            )
+        elif await self._qdrant_client.collection_exists(name):
+            #! a collection created before aliases were used has to be removed first
+            logger.warning(f"Replacing the unversioned collection {name} with an alias")
+            await self._qdrant_client.delete_collection(collection_name=name)
+
+        operations.append(
+            models.CreateAliasOperation(
+                create_alias=models.CreateAlias(
+                    collection_name=version, alias_name=name
                 )
+            )
+        )
+        await self._qdrant_client.update_collection_aliases(
+            change_aliases_operations=operations
+        )
+        logger.info(f"{name} now points to {version}")
+
+    async def _collect_garbage(self, name: str, current: str, replaced: dict[str, int]):
+        """
+        Delete versions of the collection replaced longer ago than the retention period.
+
+        Versions without a recorded replacement time (e.g. builds that never went live)
+        are aged from when they were built.
+        """
+        cutoff = (time.time() - self._retention) * 1000
+        prefix = f"{name}{VERSION_SEPARATOR}"
+
+        collections = await self._qdrant_client.get_collections()
+        for collection in collections.collections:
+            if collection.name == current or not collection.name.startswith(prefix):
+                continue
+
+            built = collection.name.removeprefix(prefix)
+            if not built.isdigit():
+                continue
+            if replaced.get(collection.name, int(built)) < cutoff:
+                await self._qdrant_client.delete_collection(
+                    collection_name=collection.name
+                )
+                logger.info(f"Deleted old collection version {collection.name}")
+
+    async def _update(
+        self, collection: Collection, chunks: list[Chunk], progress: Progress
+    ) -> bool:
+        """
+        Bring a live collection in line with the chunks, touching only the changes.
+
+        Returns whether any points were added or removed.
+        """
+        progress.update(collection.name, "Comparing with existing points ...")
+        existing = await self._get_point_ids(collection.name)
+        added = [chunk for chunk in chunks if chunk.id not in existing]
+        removed = existing - {chunk.id for chunk in chunks}
+
+        # Embed and add the new chunks
+        progress.update(collection.name, f"Encoding {len(added)} new chunks ...")
+        await self._encode_chunks(collection.name, added, progress)
+        await self._upsert(collection.name, collection.name, added, progress)
+
+        # Remove the chunks that no longer exist
+        if removed:
+            await self._qdrant_client.delete(
+                collection_name=collection.name,
+                points_selector=models.PointIdsList(points=list(removed)),
+                wait=True,
+            )
+
+        logger.info(
+            f"{collection.name}: {len(added)} added, {len(removed)} removed, "
+            f"{len(chunks) - len(added)} unchanged"
+        )
+        return bool(added or removed)
 
 
 def parse_arguments():
@@ -260,6 +840,100 @@ def parse_arguments():
         help="Hostname of the vector database (Qdrant defaults to port 6333)",
     )
 
+    parser.add_argument(
+        "--cache",
+        "-c",
+        default="~/.cache/msm_assistant/embeddings.sqlite",
+        help="Path to the embedding cache shared between runs (default: '~/.cache/msm_assistant/embeddings.sqlite')",
+    )
+
+    parser.add_argument(
+        "--incremental",
+        "-i",
+        action="store_true",
+        help="Only embed new chunks and delete removed ones, keeping existing collections live",
+    )
+
+    parser.add_argument(
+        "--batch-size",
+        type=int,
+        default=256,
+        help="Maximum number of chunks per embedding request (default: 256)",
+    )
+
+    parser.add_argument(
+        "--batch-tokens",
+        type=int,
+        default=100_000,
+        help="Maximum number of tokens per embedding request (default: 100000)",
+    )
+
+    parser.add_argument(
+        "--concurrency",
+        type=int,
+        default=4,
+        help="Maximum number of concurrent embedding requests (default: 4)",
+    )
+
+    parser.add_argument(
+        "--upsert-batch-size",
+        type=int,
+        default=128,
+        help="Number of points per Qdrant upsert (default: 128)",
+    )
+
+    parser.add_argument(
+        "--upsert-concurrency",
+        type=int,
+        default=4,
+        help="Maximum number of concurrent Qdrant upserts (default: 4)",
+    )
+
+    parser.add_argument(
+        "--collection-concurrency",
+        type=int,
+        default=2,
+        help="Maximum number of collections processed concurrently (default: 2)",
+    )
+
+    parser.add_argument(
+        "--retention",
+        type=float,
+        default=24.0,
+        help="Hours to keep replaced collection versions before deleting them (default: 24)",
+    )
+
+    parser.add_argument(
+        "--dimensions",
+        type=int,
+        help="Shortened embedding size for the text-embedding-3 models (default: the model's full size)",
+    )
+
+    parser.add_argument(
+        "--quantization",
+        choices=list(QUANTIZATIONS),
+        help="Quantize the stored vectors, rescoring results with the originals (default: none)",
+    )
+
+    parser.add_argument(
+        "--dedup-threshold",
+        type=float,
+        default=0.9,
+        help="Minimum text similarity (Jaccard of character shingles) at which chunks are collapsed as near duplicates (default: 0.9)",
+    )
+
+    parser.add_argument(
+        "--no-dedup",
+        action="store_true",
+        help="Keep near-duplicate chunks as separate points",
+    )
+
+    parser.add_argument(
+        "--on-disk",
+        action="store_true",
+        help="Keep the original vectors on disk rather than in memory",
+    )
+
     return parser.parse_args()
 
 
@@ -269,8 +943,26 @@ def main():
 
     model = args.model if args.model else "text-embedding-3-small"
 
-    database = Database(url=args.url, model=model)
-    asyncio.run(database.create(Path(args.directory)))
+    encoder = Encoder(
+        model=model,
+        cache=embedding_cache.EmbeddingCache(args.cache),
+        batch_size=args.batch_size,
+        batch_tokens=args.batch_tokens,
+        concurrency=args.concurrency,
+        dimensions=args.dimensions,
+    )
+    database = Database(
+        url=args.url,
+        encoder=encoder,
+        upsert_batch_size=args.upsert_batch_size,
+        upsert_concurrency=args.upsert_concurrency,
+        collection_concurrency=args.collection_concurrency,
+        retention=args.retention * 3600,
+        quantization=args.quantization,
+        on_disk=args.on_disk,
+        dedup_threshold=None if args.no_dedup else args.dedup_threshold,
+    )
+    asyncio.run(database.create(Path(args.directory), incremental=args.incremental))
 
 
 if __name__ == "__main__":
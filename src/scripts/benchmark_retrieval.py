@@ -0,0 +1,529 @@
+#!/usr/bin/env python3
+import argparse
+import asyncio
+import hashlib
+import json
+import logging
+import random
+import time
+from pathlib import Path
+
+import numpy as np
+from dotenv import load_dotenv
+from qdrant_client import AsyncQdrantClient, models
+
+from msm_assistant.utils.helper.embedding_cache import EmbeddingCache
+from msm_assistant.utils.helper.vector_index import VectorIndex
+from scripts import add_collections
+from scripts.add_collections import Chunk, Encoder
+from scripts.utils.interfaces import Collection
+
+logger = logging.getLogger(__name__)
+
+SYNTHETIC_DIMENSIONS = 1536
+
+
+class Embeddings:
+    """
+    Provides the embeddings of the benchmarked texts without a live index.
+
+    Embeddings are either read from the embedding cache shared with the ingest script
+    and the assistant (optionally embedding any misses through the OpenAI API), or
+    generated synthetically from a hash of each text so the benchmark runs offline.
+    Synthetic embeddings carry no meaning, so they measure how faithfully an index
+    reproduces exact search rather than how relevant its results are.
+    """
+
+    def __init__(
+        self,
+        source: str,
+        model: str,
+        cache: EmbeddingCache | None = None,
+        embed_missing: bool = False,
+    ):
+        if source == "cache" and cache is None:
+            raise ValueError("Cached embeddings need an embedding cache")
+
+        self._source = source
+        self._model = model
+        self._cache = cache
+        self._embed_missing = embed_missing
+
+    @property
+    def shortenable(self) -> bool:
+        """Whether truncating the embeddings matches asking the model for fewer."""
+        if self._source == "synthetic":
+            return True
+        return add_collections.EMBEDDING_MODELS[self._model]["shortenable"]
+
+    async def embed(self, texts: list[str]) -> np.ndarray:
+        """
+        Embed texts as an (N, D) float32 matrix of full size embeddings.
+
+        Raises:
+            ValueError: If an embedding is missing from the cache.
+        """
+        if self._source == "synthetic":
+            return np.stack([self._synthetic(text) for text in texts])
+
+        if self._embed_missing:
+            encoder = Encoder(model=self._model, cache=self._cache)
+            vectors = await encoder.encode_collection(texts)
+        else:
+            # * full size embeddings are cached under the bare model name
+            vectors = self._cache.get_many(self._model, texts)
+            missing = sum(vector is None for vector in vectors)
+            if missing:
+                raise ValueError(
+                    f"{missing} of {len(texts)} texts have no cached '{self._model}' "
+                    "embedding, pass --embed-missing to embed them"
+                )
+
+        return np.asarray(vectors, dtype=np.float32)
+
+    @staticmethod
+    def _synthetic(text: str) -> np.ndarray:
+        seed = hashlib.sha256(EmbeddingCache.normalise(text).encode()).digest()
+        generator = np.random.default_rng(int.from_bytes(seed[:8], "little"))
+        return generator.standard_normal(SYNTHETIC_DIMENSIONS).astype(np.float32)
+
+
+class Benchmark:
+    """
+    Measures the recall@k and latency of Qdrant searches across index settings.
+
+    The ground truth is an exact NumPy search over the full size embeddings, so the
+    recall of a setting includes the loss from shortening the embeddings as well as
+    from approximate search and quantization. In Qdrant's local mode (`:memory:` or a
+    path) every search is exhaustive and quantization is ignored, so `hnsw_ef` and
+    `quantization` only change the results when benchmarking against a server.
+    """
+
+    def __init__(
+        self,
+        location: str = ":memory:",
+        k: int = 10,
+        warmup: int = 10,
+        hnsw_m: int = 16,
+        ef_construct: int = 100,
+        oversampling: float = 2.0,
+    ):
+        self.local = not location.startswith(("http://", "https://"))
+        if location == ":memory:":
+            self._qdrant_client = AsyncQdrantClient(location=location)
+        elif self.local:
+            self._qdrant_client = AsyncQdrantClient(path=location)
+        else:
+            self._qdrant_client = AsyncQdrantClient(url=location)
+
+        self.location = location
+        self._k = k
+        self._warmup = warmup
+        self._hnsw_m = hnsw_m
+        self._ef_construct = ef_construct
+        self._oversampling = oversampling
+
+    async def run(
+        self,
+        chunks: list[Chunk],
+        vectors: np.ndarray,
+        queries: np.ndarray,
+        dimensions: list[int | None],
+        quantizations: list[str | None],
+        hnsw_efs: list[int | None],
+    ) -> dict:
+        """
+        Benchmark every combination of dimensions, quantization and `hnsw_ef`.
+
+        Args:
+            chunks (list[Chunk]): The points of the collection.
+            vectors (np.ndarray): The full size embedding of each chunk.
+            queries (np.ndarray): The full size embedding of each query.
+            dimensions (list[int | None]): Shortened embedding sizes (None is full size).
+            quantizations (list[str | None]): Quantizations (None is unquantized).
+            hnsw_efs (list[int | None]): Search time `ef` values (None is the default).
+        Returns:
+            dict: The exact baseline and a result per setting.
+        """
+        ids = [chunk.id for chunk in chunks]
+        index = VectorIndex(ids=ids, vectors=vectors, payloads=[{}] * len(ids))
+
+        truth, latencies = [], []
+        for query in queries:
+            started = time.perf_counter()
+            results = index.search(query, limit=self._k)
+            latencies.append(time.perf_counter() - started)
+            truth.append({point_id for point_id, _, _ in results})
+
+        report = {
+            "baseline": {"method": "numpy exact", **self._latency(latencies)},
+            "results": [],
+        }
+
+        for size in dimensions:
+            for quantization in quantizations:
+                name = await self._create(
+                    chunks, self._shorten(vectors, size), size, quantization
+                )
+                shortened = self._shorten(queries, size)
+
+                for hnsw_ef in hnsw_efs:
+                    result = await self._measure(
+                        name, shortened, truth, quantization, hnsw_ef
+                    )
+                    report["results"].append(
+                        {
+                            "dimensions": size or vectors.shape[1],
+                            "quantization": quantization,
+                            "hnsw_ef": hnsw_ef,
+                            **result,
+                        }
+                    )
+                    logger.info(
+                        f"dimensions={size or vectors.shape[1]} "
+                        f"quantization={quantization} hnsw_ef={hnsw_ef}: "
+                        f"recall@{self._k}={result[f'recall@{self._k}']:.3f} "
+                        f"p95={result['p95_ms']:.2f}ms"
+                    )
+
+                await self._qdrant_client.delete_collection(collection_name=name)
+
+        return report
+
+    async def _create(
+        self,
+        chunks: list[Chunk],
+        vectors: np.ndarray,
+        size: int | None,
+        quantization: str | None,
+    ) -> str:
+        UPSERT_BATCH_SIZE = 256
+
+        name = f"benchmark_{size or 'full'}_{quantization or 'none'}"
+        if await self._qdrant_client.collection_exists(name):
+            await self._qdrant_client.delete_collection(collection_name=name)
+        await self._qdrant_client.create_collection(
+            collection_name=name,
+            vectors_config=models.VectorParams(
+                size=vectors.shape[1], distance=models.Distance.COSINE
+            ),
+            hnsw_config=models.HnswConfigDiff(
+                m=self._hnsw_m, ef_construct=self._ef_construct
+            ),
+            quantization_config=(
+                add_collections.QUANTIZATIONS[quantization] if quantization else None
+            ),
+        )
+
+        for start in range(0, len(chunks), UPSERT_BATCH_SIZE):
+            await self._qdrant_client.upsert(
+                collection_name=name,
+                wait=True,
+                points=[
+                    models.PointStruct(
+                        id=chunk.id, vector=vector.tolist(), payload=chunk.payload
+                    )
+                    for chunk, vector in zip(
+                        chunks[start : start + UPSERT_BATCH_SIZE],
+                        vectors[start : start + UPSERT_BATCH_SIZE],
+                    )
+                ],
+            )
+
+        return name
+
+    async def _measure(
+        self,
+        name: str,
+        queries: np.ndarray,
+        truth: list[set],
+        quantization: str | None,
+        hnsw_ef: int | None,
+    ) -> dict:
+        params = models.SearchParams(
+            hnsw_ef=hnsw_ef,
+            quantization=(
+                models.QuantizationSearchParams(
+                    rescore=True, oversampling=self._oversampling
+                )
+                if quantization
+                else None
+            ),
+        )
+
+        async def search(query: np.ndarray) -> set:
+            response = await self._qdrant_client.query_points(
+                collection_name=name,
+                query=query.tolist(),
+                limit=self._k,
+                search_params=params,
+            )
+            return {str(point.id) for point in response.points}
+
+        for query in queries[: self._warmup]:
+            await search(query)
+
+        recalls, latencies = [], []
+        for query, expected in zip(queries, truth):
+            started = time.perf_counter()
+            found = await search(query)
+            latencies.append(time.perf_counter() - started)
+            recalls.append(len(found & expected) / max(len(expected), 1))
+
+        return {
+            f"recall@{self._k}": round(float(np.mean(recalls)), 4),
+            **self._latency(latencies),
+        }
+
+    @staticmethod
+    def _shorten(vectors: np.ndarray, size: int | None) -> np.ndarray:
+        """Truncate and renormalise embeddings, as the API does for shortened ones."""
+        if size is None:
+            return vectors
+        vectors = vectors[:, :size]
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        return vectors / np.maximum(norms, np.finfo(np.float32).tiny)
+
+    @staticmethod
+    def _latency(latencies: list[float]) -> dict:
+        p50, p95, p99 = np.percentile(np.asarray(latencies) * 1000, [50, 95, 99])
+        return {
+            "p50_ms": round(float(p50), 3),
+            "p95_ms": round(float(p95), 3),
+            "p99_ms": round(float(p99), 3),
+        }
+
+
+def load_chunks(path: Path) -> list[Chunk]:
+    with open(path, "r") as file:
+        collection = Collection.from_dict(json.load(file))
+
+    chunks: dict[str, Chunk] = {}
+    for summary in collection.summaries:
+        for text in summary.chunks:
+            chunk = Chunk(collection=collection.name, text=text, file=summary.file)
+            chunks[chunk.id] = chunk  # * identical chunks share an id, as in ingest
+
+    return list(chunks.values())
+
+
+def load_queries(path: Path | None, chunks: list[Chunk], sample: int) -> list[str]:
+    """Read one query per line (or a JSON list), or sample chunk texts as queries."""
+    if path is None:
+        texts = [chunk.text for chunk in chunks]
+        return random.Random(0).sample(texts, min(sample, len(texts)))
+
+    with open(path, "r") as file:
+        if path.suffix == ".json":
+            return json.load(file)
+        return [line.strip() for line in file if line.strip()]
+
+
+def parse_dimensions(value: str) -> int | None:
+    return None if value == "full" else int(value)
+
+
+def parse_quantization(value: str) -> str | None:
+    if value == "none":
+        return None
+    if value not in add_collections.QUANTIZATIONS:
+        raise argparse.ArgumentTypeError(
+            f"'{value}' is not one of {['none', *add_collections.QUANTIZATIONS]}"
+        )
+    return value
+
+
+def parse_hnsw_ef(value: str) -> int | None:
+    return None if value == "default" else int(value)
+
+
+def parse_arguments():
+    parser = argparse.ArgumentParser(
+        prog="Retrieval benchmark",
+        description="Measures the recall@k and latency of a collection across Qdrant index settings",
+    )
+
+    parser.add_argument(
+        "--collection",
+        "-c",
+        required=True,
+        help="Path to a collection JSON file (e.g. temp/msm.json)",
+    )
+
+    parser.add_argument(
+        "--queries",
+        "-q",
+        help="Path to a file of queries, one per line or a JSON list (default: sample chunk texts)",
+    )
+
+    parser.add_argument(
+        "--sample",
+        type=int,
+        default=100,
+        help="Number of chunk texts sampled as queries when no queries are given (default: 100)",
+    )
+
+    parser.add_argument(
+        "--embeddings",
+        "-e",
+        choices=["synthetic", "cache"],
+        default="synthetic",
+        help="Use synthetic embeddings or the embedding cache (default: 'synthetic')",
+    )
+
+    parser.add_argument(
+        "--model",
+        "-m",
+        default="text-embedding-3-small",
+        help="OpenAI embedding model of the cached embeddings (default: 'text-embedding-3-small')",
+    )
+
+    parser.add_argument(
+        "--cache",
+        default="~/.cache/msm_assistant/embeddings.sqlite",
+        help="Path to the embedding cache (default: '~/.cache/msm_assistant/embeddings.sqlite')",
+    )
+
+    parser.add_argument(
+        "--embed-missing",
+        action="store_true",
+        help="Embed texts missing from the cache with the OpenAI API",
+    )
+
+    parser.add_argument(
+        "--url",
+        "-u",
+        default=":memory:",
+        help="Qdrant location: ':memory:', a local path or a server URL (default: ':memory:')",
+    )
+
+    parser.add_argument(
+        "--k",
+        "-k",
+        type=int,
+        default=10,
+        help="Number of results compared (default: 10)",
+    )
+
+    parser.add_argument(
+        "--dimensions",
+        nargs="+",
+        type=parse_dimensions,
+        default=[None],
+        help="Embedding sizes to compare, 'full' for the model's size (default: full)",
+    )
+
+    parser.add_argument(
+        "--quantization",
+        nargs="+",
+        type=parse_quantization,
+        default=[None],
+        help=f"Quantizations to compare: none, {', '.join(add_collections.QUANTIZATIONS)} (default: none)",
+    )
+
+    parser.add_argument(
+        "--hnsw-ef",
+        nargs="+",
+        type=parse_hnsw_ef,
+        default=[None],
+        help="Search time hnsw_ef values to compare, 'default' for Qdrant's (default: default)",
+    )
+
+    parser.add_argument(
+        "--hnsw-m", type=int, default=16, help="HNSW graph degree (default: 16)"
+    )
+
+    parser.add_argument(
+        "--ef-construct",
+        type=int,
+        default=100,
+        help="HNSW construction time ef (default: 100)",
+    )
+
+    parser.add_argument(
+        "--warmup",
+        type=int,
+        default=10,
+        help="Number of untimed queries run against each setting first (default: 10)",
+    )
+
+    parser.add_argument(
+        "--output", "-o", help="Path to write the JSON report to (default: stdout)"
+    )
+
+    return parser.parse_args()
+
+
+async def benchmark(args) -> dict:
+    chunks = load_chunks(Path(args.collection))
+    queries = load_queries(
+        Path(args.queries) if args.queries else None, chunks, args.sample
+    )
+
+    embeddings = Embeddings(
+        source=args.embeddings,
+        model=args.model,
+        cache=EmbeddingCache(args.cache) if args.embeddings == "cache" else None,
+        embed_missing=args.embed_missing,
+    )
+    if any(args.dimensions) and not embeddings.shortenable:
+        raise ValueError(f"The model '{args.model}' cannot be shortened")
+
+    vectors = await embeddings.embed([chunk.text for chunk in chunks])
+    if any(size and size > vectors.shape[1] for size in args.dimensions):
+        raise ValueError(f"The embeddings only have {vectors.shape[1]} dimensions")
+    query_vectors = await embeddings.embed(queries)
+
+    runner = Benchmark(
+        location=args.url,
+        k=args.k,
+        warmup=args.warmup,
+        hnsw_m=args.hnsw_m,
+        ef_construct=args.ef_construct,
+    )
+    if runner.local:
+        logger.warning(
+            "Qdrant's local mode searches exhaustively and ignores quantization, "
+            "so only the dimensions change its results"
+        )
+
+    results = await runner.run(
+        chunks=chunks,
+        vectors=vectors,
+        queries=query_vectors,
+        dimensions=args.dimensions,
+        quantizations=args.quantization,
+        hnsw_efs=args.hnsw_ef,
+    )
+
+    return {
+        "collection": args.collection,
+        "points": len(chunks),
+        "queries": len(queries),
+        "k": args.k,
+        "embeddings": args.embeddings,
+        "model": args.model if args.embeddings == "cache" else None,
+        "location": args.url,
+        "local": runner.local,
+        "hnsw": {"m": args.hnsw_m, "ef_construct": args.ef_construct},
+        **results,
+    }
+
+
+def main():
+    load_dotenv()
+    logging.basicConfig(level=logging.INFO)
+    args = parse_arguments()
+
+    report = asyncio.run(benchmark(args))
+
+    if args.output:
+        with open(args.output, "w") as file:
+            json.dump(report, file, indent=4)
+        print(f"Saved benchmark report to {args.output}")
+    else:
+        print(json.dumps(report, indent=4))
+
+
+if __name__ == "__main__":
+    main()
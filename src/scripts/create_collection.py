@@ -1,17 +1,42 @@
 #!/usr/bin/env python3
 import argparse
 import asyncio
+import hashlib
+import io
 import json
+import logging
 import os
+import random
+import re
+import sqlite3
+import time
+from concurrent.futures import ProcessPoolExecutor
 from pathlib import Path
 
 from dotenv import load_dotenv
 from google import genai
+from google.genai.errors import ClientError, ServerError
 from google.genai.types import Part
 from tqdm.asyncio import tqdm
 
+from msm_assistant.utils.helper.tokens import count_tokens
 from scripts.utils.interfaces import Collection, Summary
 
+logger = logging.getLogger(__name__)
+
+try:
+    import pypdf as _pypdf
+except ImportError:
+    _pypdf = None
+    logger.info("pypdf is not installed, large PDFs cannot be split into page ranges")
+
+# * inline PDFs must be under 20 MB, leaving room for the prompt
+MAX_INLINE_BYTES = 19 * 1024 * 1024
+
+# * chunks are sized for the embedding model's tokenizer
+CHUNK_TOKENIZER_MODEL = "text-embedding-3-small"
+SENTENCE_BOUNDARY = re.compile(r"(?<=[.!?])\s+")
+
 GEMINI_MODELS = [
     "gemini-2.0-flash",
     "gemini-2.0-pro-exp-02-05",
@@ -51,43 +76,408 @@ class CollectionError(Exception):
         super().__init__(self.message)
 
 
+def split_pdf(data: bytes, max_bytes: int) -> list[tuple[int, int, bytes]]:
+    """
+    Split a PDF into consecutive page ranges that are each at most `max_bytes`.
+
+    Args:
+        data (bytes): The PDF.
+        max_bytes (int): The maximum size of each part.
+    Returns:
+        list[tuple[int, int, bytes]]: The first and last page (from 1) and the PDF of
+            each range, in page order.
+    Raises:
+        CollectionError: If pypdf is not installed or a single page is too large.
+    """
+    if _pypdf is None:
+        raise CollectionError(
+            "PDFs over the inline size limit need pypdf to be split into page ranges"
+        )
+
+    reader = _pypdf.PdfReader(io.BytesIO(data))
+
+    def write(first: int, last: int) -> bytes:
+        writer = _pypdf.PdfWriter()
+        for index in range(first, last):
+            writer.add_page(reader.pages[index])
+        buffer = io.BytesIO()
+        writer.write(buffer)
+        return buffer.getvalue()
+
+    def split(first: int, last: int) -> list[tuple[int, int, bytes]]:
+        part = write(first, last)
+        if len(part) <= max_bytes:
+            return [(first + 1, last, part)]
+        if last - first == 1:
+            raise CollectionError(f"Page {first + 1} alone is over {max_bytes} bytes")
+
+        # * shared resources (e.g. fonts) are copied into every part, so halve
+        # * ranges until they fit rather than trusting the estimate
+        middle = (first + last) // 2
+        return split(first, middle) + split(middle, last)
+
+    page_count = len(reader.pages)
+    pages_per_range = max(1, int(page_count * 0.8 * max_bytes / len(data)))
+    return [
+        part
+        for first in range(0, page_count, pages_per_range)
+        for part in split(first, min(first + pages_per_range, page_count))
+    ]
+
+
+def file_sha256(path: Path) -> str:
+    with open(path, "rb") as file:
+        return hashlib.file_digest(file, "sha256").hexdigest()
+
+
+class Journal:
+    """
+    An append-only JSONL record of the summaries of a collection.
+
+    Every finished (or failed) PDF is written as one line as soon as it completes, so
+    an interrupted run loses no work. Only successful lines for the same model and
+    the same PDF contents (by SHA-256) are treated as done when the journal is read
+    back, so edited PDFs are summarised again.
+    """
+
+    def __init__(self, path: Path):
+        self._path = path
+
+    def read(self, model: str, digests: dict[str, str]) -> dict[str, Summary]:
+        """
+        Get the summaries already completed with `model`.
+
+        Args:
+            model (str): The model the summaries were made with.
+            digests (dict[str, str]): The current SHA-256 of each PDF by relative path.
+        Returns:
+            dict[str, Summary]: The summary of each completed PDF by relative path.
+        """
+        completed = {}
+        if not self._path.exists():
+            return completed
+
+        with open(self._path, "r") as file:
+            for line in file:
+                try:
+                    entry = json.loads(line)
+                except json.JSONDecodeError:
+                    continue  # * a line cut short by an interrupted run
+
+                if entry.get("model") != model:
+                    continue
+                if "chunks" in entry and entry.get("sha256") == digests.get(
+                    entry["path"]
+                ):
+                    completed[entry["path"]] = Summary.from_dict(entry)
+                else:
+                    completed.pop(entry["path"], None)
+
+        return completed
+
+    def append(self, entry: dict):
+        with open(self._path, "a") as file:
+            file.write(json.dumps(entry) + "\n")
+            file.flush()
+
+
+class SummaryCache:
+    """
+    A persistent SQLite cache of the chunks summarised from each PDF.
+
+    Entries are keyed by the SHA-256 of the PDF bytes, the model and the SHA-256 of
+    the prompt, so a PDF is only summarised again when its contents, the model or
+    `SUMMARY_PROMPT` change, wherever the file lives and whatever it is called.
+    """
+
+    def __init__(self, path: Path | str):
+        self._path = Path(path).expanduser()
+        self._path.parent.mkdir(parents=True, exist_ok=True)
+        try:
+            self._db = self._open()
+        except sqlite3.DatabaseError as e:
+            # * the cache only saves requests, so an unreadable one is started afresh
+            logger.warning(f"Replacing the unreadable summary cache {self._path}: {e}")
+            self._path.unlink()
+            self._db = self._open()
+
+        self.hits = 0
+        self.misses = 0
+
+    def _open(self) -> sqlite3.Connection:
+        db = sqlite3.connect(self._path)
+        try:
+            db.execute(
+                "CREATE TABLE IF NOT EXISTS summaries ("
+                "document TEXT NOT NULL, model TEXT NOT NULL, prompt TEXT NOT NULL, "
+                "chunks TEXT NOT NULL, created REAL NOT NULL, "
+                "PRIMARY KEY (document, model, prompt))"
+            )
+            db.commit()
+        except sqlite3.DatabaseError:
+            db.close()
+            raise
+        return db
+
+    @staticmethod
+    def key(
+        data: bytes, model: str, prompt: str, pages: tuple[int, int] | None = None
+    ) -> tuple[str, str, str]:
+        """The cache key of a PDF, or of the `pages` (first, last) range of a PDF."""
+        document = hashlib.sha256(data).hexdigest()
+        if pages:
+            document += f":{pages[0]}-{pages[1]}"
+        return (document, model, hashlib.sha256(prompt.encode()).hexdigest())
+
+    def get(self, key: tuple[str, str, str]) -> list[str] | None:
+        """Get the cached chunks, or None on a miss (including unreadable entries)."""
+        chunks = None
+        try:
+            row = self._db.execute(
+                "SELECT chunks FROM summaries "
+                "WHERE document = ? AND model = ? AND prompt = ?",
+                key,
+            ).fetchone()
+            if row is not None:
+                chunks = json.loads(row[0])
+        except (sqlite3.DatabaseError, json.JSONDecodeError) as e:
+            logger.warning(f"Ignoring an unreadable cached summary: {e}")
+
+        if not isinstance(chunks, list):
+            self.misses += 1
+            return None
+
+        self.hits += 1
+        return chunks
+
+    def put(self, key: tuple[str, str, str], chunks: list[str]):
+        try:
+            self._db.execute(
+                "INSERT OR REPLACE INTO summaries "
+                "(document, model, prompt, chunks, created) VALUES (?, ?, ?, ?, ?)",
+                (*key, json.dumps(chunks), time.time()),
+            )
+            self._db.commit()
+        except sqlite3.DatabaseError as e:
+            logger.warning(f"Failed to cache a summary: {e}")
+
+    def close(self):
+        self._db.close()
+
+
 class CollectionFactory:
-    def __init__(self, name: str, description: str = None):
+    """
+    Summarises a directory of PDFs into a collection.
+
+    A bounded number of PDFs are summarised concurrently and quota or server errors
+    are retried with jittered exponential backoff. With a journal, each summary is
+    recorded as soon as it finishes and a rerun only summarises the PDFs that are
+    missing from the journal or failed. With a cache, unchanged PDFs are never sent
+    to Gemini again, even by a new collection. PDFs that are too large to inline are
+    split into page ranges which are summarised in parallel and merged in page order.
+    """
+
+    INITIAL_BACKOFF = 2.0  # seconds
+    MAX_BACKOFF = 60.0  # seconds
+    RETRYABLE_CODES = {408, 429}
+
+    def __init__(
+        self,
+        name: str,
+        description: str = None,
+        concurrency: int = 4,
+        max_retries: int = 5,
+        cache: SummaryCache | None = None,
+        max_inline_bytes: int = MAX_INLINE_BYTES,
+    ):
         if name == "" or name is None:
             raise ValueError("'name' cannot be empty or None")
 
+        if concurrency < 1:
+            raise ValueError("'concurrency' must be at least 1")
+
         self._name = name
         self._description = description
         self._google_client = genai.Client(api_key=os.getenv("GEMINI_API_KEY"))
+        # * PDFs are bounded to limit memory, requests (including page ranges) to
+        # * limit the load on the API
+        self._documents = asyncio.Semaphore(concurrency)
+        self._requests = asyncio.Semaphore(concurrency)
+        self._max_retries = max_retries
+        self._cache = cache
+        self._max_inline_bytes = max_inline_bytes
 
     async def create(
-        self, directory_path: Path, model: str = "gemini-2.0-flash"
-    ) -> list[dict]:
+        self,
+        directory_path: Path,
+        model: str = "gemini-2.0-flash",
+        journal: Journal | None = None,
+    ) -> Collection:
+        """
+        Summarise every PDF in a directory.
+
+        Args:
+            directory_path (Path): The directory searched (recursively) for PDFs.
+            model (str): The Gemini model used to summarise.
+            journal (Journal | None): Records finished summaries and resumes from them.
+        Raises:
+            CollectionError: If any PDF could not be summarised.
+        """
         if not directory_path.is_dir():
             raise ValueError(
                 f"The provided path {directory_path} is not a valid directory."
             )
 
         # find all pdf files in directory
-        pdf_paths = list(directory_path.rglob("*.pdf"))
+        pdf_paths = sorted(directory_path.rglob("*.pdf"))
+        paths = [
+            pdf_path.relative_to(directory_path).as_posix() for pdf_path in pdf_paths
+        ]
+
+        digests = await asyncio.to_thread(
+            lambda: {path: file_sha256(pdf) for path, pdf in zip(paths, pdf_paths)}
+        )
+        summaries: dict[str, Summary] = journal.read(model, digests) if journal else {}
+        pending = [
+            (path, pdf_path)
+            for path, pdf_path in zip(paths, pdf_paths)
+            if path not in summaries
+        ]
+        if summaries:
+            logger.info(f"Resuming with {len(summaries)} summaries from the journal")
+
+        failed: dict[str, Exception] = {}
+        progress = tqdm(total=len(paths), initial=len(paths) - len(pending))
+
+        async def summarise(path: str, pdf_path: Path):
+            try:
+                async with self._documents:
+                    summary = await self._summarise(pdf_path, model)
+            except Exception as e:
+                logger.error(f"Failed to summarise {path}: {e}")
+                failed[path] = e
+                if journal:
+                    journal.append(
+                        {
+                            "path": path,
+                            "model": model,
+                            "sha256": digests[path],
+                            "error": str(e),
+                        }
+                    )
+                return
+            finally:
+                progress.update()
+
+            summaries[path] = summary
+            if journal:
+                journal.append(
+                    {
+                        "path": path,
+                        "model": model,
+                        "sha256": digests[path],
+                        **summary.to_dict(),
+                    }
+                )
+
+        await asyncio.gather(*[summarise(path, pdf_path) for path, pdf_path in pending])
+        progress.close()
+
+        if self._cache:
+            logger.info(
+                f"Summary cache: {self._cache.hits} hits, {self._cache.misses} misses"
+            )
 
-        # summarise each pdf - perhaps all at once?
-        tasks = [self._summarise(pdf_path, model) for pdf_path in pdf_paths]
-        summaries: list[Summary] = await tqdm.gather(*tasks, total=len(tasks))
+        if failed:
+            raise CollectionError(
+                f"Failed to summarise {len(failed)} of {len(paths)} PDFs "
+                f"({', '.join(failed)}), rerun to retry them"
+            )
 
         return Collection(
-            name=self._name, description=self._description, summaries=summaries
+            name=self._name,
+            description=self._description,
+            summaries=[summaries[path] for path in paths],
         )
 
     async def _summarise(self, file_path: Path, model: str) -> Summary:
         if model not in GEMINI_MODELS:
             raise ValueError("The selected model is not a supported PDF model")
 
+        data = file_path.read_bytes()
+        if len(data) <= self._max_inline_bytes:
+            chunks = await self._summarise_part(
+                file_path.name,
+                data,
+                model,
+                SummaryCache.key(data, model, SUMMARY_PROMPT),
+            )
+            return Summary(file=file_path.name, chunks=chunks)
+
+        # Split PDFs that are too large to inline into page ranges
+        parts = await asyncio.to_thread(split_pdf, data, self._max_inline_bytes)
+        logger.info(f"Split {file_path.name} into {len(parts)} page ranges")
+
+        results = await asyncio.gather(
+            *[
+                self._summarise_part(
+                    f"{file_path.name} (pages {first}-{last})",
+                    part,
+                    model,
+                    SummaryCache.key(data, model, SUMMARY_PROMPT, pages=(first, last)),
+                )
+                for first, last, part in parts
+            ]
+        )
+
+        # Merge the ranges back together in page order
+        chunks, pages = [], []
+        for (first, last, _), part_chunks in zip(parts, results):
+            chunks.extend(part_chunks)
+            pages.extend([first, last] for _ in part_chunks)
+
+        return Summary(file=file_path.name, chunks=chunks, pages=pages)
+
+    async def _summarise_part(
+        self, label: str, data: bytes, model: str, key: tuple[str, str, str]
+    ) -> list[str]:
+        if self._cache:
+            chunks = self._cache.get(key)
+            if chunks is not None:
+                return chunks
+
+        chunks = await self._generate_with_retries(label, data, model)
+        if self._cache:
+            self._cache.put(key, chunks)
+
+        return chunks
+
+    async def _generate_with_retries(
+        self, label: str, data: bytes, model: str
+    ) -> list[str]:
+        for attempt in range(self._max_retries + 1):
+            try:
+                async with self._requests:
+                    return await self._generate(data, model)
+            except (ClientError, ServerError, json.JSONDecodeError) as e:
+                retryable = (
+                    not isinstance(e, ClientError) or e.code in self.RETRYABLE_CODES
+                )
+                if not retryable or attempt == self._max_retries:
+                    raise
+
+                backoff = min(self.INITIAL_BACKOFF * 2**attempt, self.MAX_BACKOFF)
+                delay = random.uniform(backoff / 2, backoff)
+                logger.warning(
+                    f"Summarising {label} failed ({e.__class__.__name__}), "
+                    f"retrying in {delay:.1f}s"
+                )
+                await asyncio.sleep(delay)
+
+    async def _generate(self, data: bytes, model: str) -> list[str]:
         # Encode the file (only works for <20MB files)
         # https://ai.google.dev/gemini-api/docs/document-processing?lang=python#prompting-pdfs
-        pdf_file = Part.from_bytes(
-            data=file_path.read_bytes(), mime_type="application/pdf"
-        )
+        pdf_file = Part.from_bytes(data=data, mime_type="application/pdf")
 
         # Generate the response
         response = await self._google_client.aio.models.generate_content(
@@ -98,9 +488,171 @@ class CollectionFactory:
                 "response_schema": list[str],
             },
         )
-        chunks = json.loads(response.text)
+        return json.loads(response.text)
+
+
+def chunk_pages(
+    pages: list[str], max_tokens: int, overlap: int
+) -> tuple[list[str], list[list[int]]]:
+    """
+    Split the text of a document into overlapping chunks of at most `max_tokens`.
+
+    Chunks are built from whole sentences where possible (sentences that are too long
+    are split on words) and each chunk starts with the trailing sentences of the
+    previous one, up to `overlap` tokens.
+
+    Args:
+        pages (list[str]): The text of each page.
+        max_tokens (int): The maximum number of tokens in a chunk.
+        overlap (int): The maximum number of tokens repeated between chunks.
+    Returns:
+        tuple[list[str], list[list[int]]]: The chunks and the [first, last] page
+            (from 1) of each chunk.
+    """
+    # (text, tokens, page) of every sentence or sentence fragment
+    units: list[tuple[str, int, int]] = []
+    for page, text in enumerate(pages, start=1):
+        for sentence in SENTENCE_BOUNDARY.split(" ".join(text.split())):
+            if not sentence:
+                continue
+            tokens = count_tokens(sentence, CHUNK_TOKENIZER_MODEL)
+            if tokens <= max_tokens:
+                units.append((sentence, tokens, page))
+                continue
+
+            fragment, fragment_tokens = [], 0
+            for word in sentence.split(" "):
+                word_tokens = count_tokens(" " + word, CHUNK_TOKENIZER_MODEL)
+                if fragment and fragment_tokens + word_tokens > max_tokens:
+                    units.append((" ".join(fragment), fragment_tokens, page))
+                    fragment, fragment_tokens = [], 0
+                fragment.append(word)
+                fragment_tokens += word_tokens
+            if fragment:
+                units.append((" ".join(fragment), fragment_tokens, page))
+
+    chunks, pages_of_chunks = [], []
+    window: list[tuple[str, int, int]] = []
+    window_tokens = 0
+
+    def emit():
+        chunks.append(" ".join(text for text, _, _ in window))
+        pages_of_chunks.append([window[0][2], window[-1][2]])
+
+    for unit in units:
+        if window and window_tokens + unit[1] > max_tokens:
+            emit()
+
+            # keep the trailing units that fit in the overlap
+            kept, kept_tokens = [], 0
+            for previous in reversed(window):
+                if kept_tokens + previous[1] > overlap:
+                    break
+                kept.insert(0, previous)
+                kept_tokens += previous[1]
+            while kept and kept_tokens + unit[1] > max_tokens:
+                kept_tokens -= kept.pop(0)[1]
+            window, window_tokens = kept, kept_tokens
+
+        window.append(unit)
+        window_tokens += unit[1]
+
+    if window:
+        emit()
+
+    return chunks, pages_of_chunks
+
+
+def chunk_pdf(file_path: Path, max_tokens: int, overlap: int) -> tuple[Summary, int]:
+    """
+    Extract the text of a PDF and chunk it (run in a worker process).
+
+    Returns:
+        tuple[Summary, int]: The chunks of the PDF and its number of pages.
+    """
+    reader = _pypdf.PdfReader(file_path)
+    pages = [page.extract_text() or "" for page in reader.pages]
+    chunks, pages_of_chunks = chunk_pages(pages, max_tokens, overlap)
+    summary = Summary(file=file_path.name, chunks=chunks, pages=pages_of_chunks)
+    return summary, len(pages)
+
+
+class LocalChunker:
+    """
+    Chunks a directory of PDFs locally, as an alternative to summarising them.
+
+    The text of each PDF is extracted and split into overlapping token-bounded chunks
+    in a pool of worker processes. The result is deterministic and needs no network,
+    but the chunks are raw text rather than self-contained summary sentences.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        description: str = None,
+        max_tokens: int = 400,
+        overlap: int = 50,
+        workers: int | None = None,
+    ):
+        if name == "" or name is None:
+            raise ValueError("'name' cannot be empty or None")
+
+        if not 0 <= overlap < max_tokens:
+            raise ValueError("'overlap' must be at least 0 and less than 'max_tokens'")
+
+        if _pypdf is None:
+            raise CollectionError("The local chunker needs pypdf to extract text")
+
+        self._name = name
+        self._description = description
+        self._max_tokens = max_tokens
+        self._overlap = overlap
+        self._workers = workers if workers else os.cpu_count()
+
+    async def create(self, directory_path: Path) -> Collection:
+        if not directory_path.is_dir():
+            raise ValueError(
+                f"The provided path {directory_path} is not a valid directory."
+            )
+
+        pdf_paths = sorted(directory_path.rglob("*.pdf"))
+        loop = asyncio.get_running_loop()
+        started = time.monotonic()
+        page_count = 0
+        progress = tqdm(total=len(pdf_paths), unit="pdf")
+
+        with ProcessPoolExecutor(max_workers=self._workers) as executor:
+            futures = [
+                loop.run_in_executor(
+                    executor, chunk_pdf, pdf_path, self._max_tokens, self._overlap
+                )
+                for pdf_path in pdf_paths
+            ]
+            for future in asyncio.as_completed(futures):
+                _, pages = await future
+                page_count += pages
+                elapsed = max(time.monotonic() - started, 1e-6)
+                progress.set_postfix_str(f"{page_count / elapsed:.1f} pages/s")
+                progress.update()
+            results = [future.result() for future in futures]
+
+        progress.close()
+        elapsed = max(time.monotonic() - started, 1e-6)
+        logger.info(
+            f"Chunked {page_count} pages from {len(pdf_paths)} PDFs in {elapsed:.1f}s "
+            f"({page_count / elapsed:.1f} pages/s)"
+        )
+
+        summaries = []
+        for summary, _ in results:
+            if not summary.chunks:
+                logger.warning(f"No text could be extracted from {summary.file}")
+                continue
+            summaries.append(summary)
 
-        return Summary(file=file_path.name, chunks=chunks)
+        return Collection(
+            name=self._name, description=self._description, summaries=summaries
+        )
 
 
 def parse_arguments():
@@ -126,6 +678,60 @@ def parse_arguments():
         "--description", "-de", help="Description of the collection's intended use"
     )
 
+    parser.add_argument(
+        "--concurrency",
+        type=int,
+        default=4,
+        help="Maximum number of PDFs summarised concurrently (default: 4)",
+    )
+
+    parser.add_argument(
+        "--max-retries",
+        type=int,
+        default=5,
+        help="Number of times a quota or server error is retried per PDF (default: 5)",
+    )
+
+    parser.add_argument(
+        "--cache",
+        "-c",
+        default="~/.cache/msm_assistant/summaries.sqlite",
+        help="Path to the summary cache shared between runs (default: '~/.cache/msm_assistant/summaries.sqlite')",
+    )
+
+    parser.add_argument(
+        "--journal",
+        "-j",
+        help="Path to the JSONL journal of finished summaries (default: <directory>/<name>.jsonl)",
+    )
+
+    parser.add_argument(
+        "--local-chunker",
+        "-l",
+        action="store_true",
+        help="Extract and chunk the text of the PDFs locally instead of summarising them",
+    )
+
+    parser.add_argument(
+        "--chunk-tokens",
+        type=int,
+        default=400,
+        help="Maximum number of tokens per chunk with --local-chunker (default: 400)",
+    )
+
+    parser.add_argument(
+        "--chunk-overlap",
+        type=int,
+        default=50,
+        help="Number of tokens repeated between chunks with --local-chunker (default: 50)",
+    )
+
+    parser.add_argument(
+        "--workers",
+        type=int,
+        help="Number of worker processes with --local-chunker (default: all cores)",
+    )
+
     return parser.parse_args()
 
 
@@ -137,9 +743,32 @@ def main():
     model = args.model if args.model else "gemini-2.0-flash"
     description = args.description if args.description else ""
 
-    collection_client = CollectionFactory(args.name, description)
     pdf_directory = Path(args.directory)
-    collection: Collection = asyncio.run(collection_client.create(pdf_directory, model))
+    if args.local_chunker:
+        chunker = LocalChunker(
+            args.name,
+            description,
+            max_tokens=args.chunk_tokens,
+            overlap=args.chunk_overlap,
+            workers=args.workers,
+        )
+        collection: Collection = asyncio.run(chunker.create(pdf_directory))
+    else:
+        collection_client = CollectionFactory(
+            args.name,
+            description,
+            concurrency=args.concurrency,
+            max_retries=args.max_retries,
+            cache=SummaryCache(args.cache),
+        )
+        journal_path = (
+            Path(args.journal) if args.journal else pdf_directory / f"{args.name}.jsonl"
+        )
+        collection: Collection = asyncio.run(
+            collection_client.create(
+                pdf_directory, model, journal=Journal(journal_path)
+            )
+        )
 
     # Save the output
     output_path = pdf_directory / f"{args.name}.json"
@@ -0,0 +1,119 @@
+import re
+import zlib
+
+import numpy as np
+
+WORD = re.compile(r"\w+")
+NUMBER = re.compile(r"\d+(?:[.,]\d+)*")
+LSH_MARGIN = 0.8  # * fraction of the threshold at which pairs become candidates
+
+
+def shingles(text: str, size: int = 5) -> set[str]:
+    """The character `size`-grams of a text, ignoring case and punctuation."""
+    text = " ".join(WORD.findall(text.casefold()))
+    return {text[i : i + size] for i in range(max(1, len(text) - size + 1))}
+
+
+def jaccard(a: set, b: set) -> float:
+    return len(a & b) / len(a | b) if a or b else 1.0
+
+
+def _bands(num_perm: int, threshold: float) -> tuple[int, int]:
+    """
+    Pick the (bands, rows) split of the signatures for LSH.
+
+    The split's own threshold, (1 / bands) ** (1 / rows), is kept well below
+    `threshold` so that few true near duplicates are missed. The extra candidates
+    are filtered out by the exact Jaccard similarity.
+    """
+    splits = [
+        (num_perm // rows, rows)
+        for rows in range(1, num_perm + 1)
+        if not num_perm % rows
+    ]
+    below = [
+        split
+        for split in splits
+        if (1 / split[0]) ** (1 / split[1]) <= LSH_MARGIN * threshold
+    ]
+    if not below:
+        return num_perm, 1
+    return max(below, key=lambda split: (1 / split[0]) ** (1 / split[1]))
+
+
+def near_duplicates(
+    texts: list[str],
+    threshold: float,
+    num_perm: int = 128,
+    shingle_size: int = 5,
+    seed: int = 0,
+) -> list[list[int]]:
+    """
+    Group texts whose shingles have a Jaccard similarity of at least `threshold`.
+
+    Candidate pairs are found with MinHash signatures and locality sensitive hashing
+    over bands of the signatures, then confirmed with the exact Jaccard similarity.
+    Texts that mention different numbers (e.g. temperatures or part sizes) are never
+    near duplicates. Each group is led by its longest text, and every other member is
+    a near duplicate of that text (not merely of another member), so groups never
+    drift through chains of small edits.
+
+    Args:
+        texts (list[str]): The texts to group.
+        threshold (float): The minimum Jaccard similarity of near duplicates.
+        num_perm (int): The number of hash functions in each signature.
+        shingle_size (int): The number of characters in each shingle.
+        seed (int): Seeds the hash functions, so groups are reproducible.
+    Returns:
+        list[list[int]]: The indices of each group (including texts without
+            duplicates), starting with its longest text and ordered by that index.
+    """
+    sets = [shingles(text, shingle_size) for text in texts]
+    numbers = [frozenset(NUMBER.findall(text)) for text in texts]
+
+    # * multiply-shift hash functions, h(x) = (a * x + b mod 2^64) >> 32 with odd a
+    generator = np.random.default_rng(seed)
+    maximum = np.iinfo(np.uint64).max
+    a = generator.integers(0, maximum, num_perm, np.uint64, endpoint=True) | np.uint64(
+        1
+    )
+    b = generator.integers(0, maximum, num_perm, np.uint64, endpoint=True)
+
+    bands, rows = _bands(num_perm, threshold)
+    keys = []
+    for shingle_set in sets:
+        hashes = np.fromiter(
+            (zlib.crc32(shingle.encode()) for shingle in shingle_set),
+            dtype=np.uint64,
+            count=len(shingle_set),
+        )
+        signature = ((np.outer(hashes, a) + b) >> np.uint64(32)).min(axis=0)
+        keys.append(
+            [
+                (band, signature[band * rows : (band + 1) * rows].tobytes())
+                for band in range(bands)
+            ]
+        )
+
+    # * the longest texts are kept, so they lead the groups the others join
+    buckets: dict[tuple, list[int]] = {}  # * the leading texts in each bucket
+    groups: dict[int, list[int]] = {}
+    for index in sorted(range(len(texts)), key=lambda index: -len(texts[index])):
+        candidates = dict.fromkeys(
+            leader for key in keys[index] for leader in buckets.get(key, [])
+        )
+        similarities = {
+            leader: jaccard(sets[index], sets[leader])
+            for leader in candidates
+            if numbers[index] == numbers[leader]
+        }
+        leader = max(similarities, key=similarities.get, default=None)
+        if leader is not None and similarities[leader] >= threshold:
+            groups[leader].append(index)
+            continue
+
+        groups[index] = [index]
+        for key in keys[index]:
+            buckets.setdefault(key, []).append(index)
+
+    return [groups[leader] for leader in sorted(groups)]
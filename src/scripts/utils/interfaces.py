@@ -1,10 +1,16 @@
 class Summary:
-    def __init__(self, file: str, chunks: list[str]):
+    def __init__(
+        self, file: str, chunks: list[str], pages: list[list[int]] | None = None
+    ):
         self.file = file
         self.chunks = chunks
+        self.pages = pages  # * the [first, last] page of each chunk, if split
 
     def to_dict(self) -> dict:
-        return {"file": self.file, "chunks": self.chunks}
+        summary = {"file": self.file, "chunks": self.chunks}
+        if self.pages is not None:
+            summary["pages"] = self.pages
+        return summary
 
     @classmethod
     def from_dict(cls, object: dict):
@@ -13,7 +19,9 @@ class Summary:
         if not all(key in object_keys for key in REQUIRED_KEYS):
             raise ValueError("The provided object is missing required keys")
 
-        return cls(file=object["file"], chunks=object["chunks"])
+        return cls(
+            file=object["file"], chunks=object["chunks"], pages=object.get("pages")
+        )
 
 
 class Collection:
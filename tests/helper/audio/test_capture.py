@@ -0,0 +1,124 @@
+import sys
+import types
+
+import numpy as np
+import pytest
+
+# --- Stub out sounddevice (PortAudio) before importing the module under test ---
+fake_sounddevice = types.ModuleType("sounddevice")
+
+
+class FakeInputStream:
+    def __init__(self, samplerate, channels, dtype, callback):
+        self.callback = callback
+        self.channels = channels
+        self.dtype = dtype
+
+    def start(self):
+        pass
+
+    def close(self):
+        pass
+
+    def push(self, samples):
+        """Simulate PortAudio delivering a block of captured audio."""
+        indata = np.asarray(samples, dtype=self.dtype).reshape(-1, self.channels)
+        self.callback(indata, len(indata), None, None)
+
+
+fake_sounddevice.InputStream = FakeInputStream
+sys.modules["sounddevice"] = fake_sounddevice
+
+from msm_assistant.utils.helper.audio import capture  # noqa: E402
+
+
+# --- Recording ---
+def test_recording_grows_geometrically():
+    recording = capture.Recording(
+        sample_rate=10, initial_duration=1.0, max_duration=10.0
+    )
+    assert len(recording._buffer) == 10
+
+    recording.append(np.arange(12, dtype=np.int16))
+    assert len(recording._buffer) == 20
+    recording.append(np.arange(12, 15, dtype=np.int16))
+
+    assert recording.data[:, 0].tolist() == list(range(15))
+    assert not recording.full
+
+
+def test_recording_is_bounded_by_max_duration():
+    recording = capture.Recording(
+        sample_rate=10, initial_duration=1.0, max_duration=2.0
+    )
+    assert recording.append(np.ones(15, dtype=np.int16)) == 15
+    assert recording.append(np.ones(15, dtype=np.int16)) == 5
+
+    assert recording.full
+    assert len(recording._buffer) == 20
+    assert len(recording.data) == 20
+
+
+# --- CaptureEngine ---
+@pytest.mark.asyncio
+async def test_rewind_gives_pre_roll():
+    engine = capture.CaptureEngine(sample_rate=10, history_duration=2.0)
+    await engine.start()
+
+    engine._stream.push(np.arange(15))
+    engine.rewind(0.3)
+    engine._stream.push(np.arange(15, 17))
+
+    samples, overflowed = engine.read(5, timeout=0)
+    assert samples[:, 0].tolist() == [12, 13, 14, 15, 16]
+    assert not overflowed
+
+
+@pytest.mark.asyncio
+async def test_rewind_leaves_out_audio_before_a_position():
+    engine = capture.CaptureEngine(sample_rate=10, history_duration=2.0)
+    await engine.start()
+
+    engine._stream.push(np.arange(15))
+    engine.rewind(0.5, not_before=13)  # * e.g. where a chime stopped being heard
+    engine._stream.push(np.arange(15, 17))
+
+    samples, _ = engine.read(4, timeout=0)
+    assert samples[:, 0].tolist() == [13, 14, 15, 16]
+
+
+@pytest.mark.asyncio
+async def test_rewind_can_skip_audio_not_yet_captured():
+    engine = capture.CaptureEngine(sample_rate=10, history_duration=2.0)
+    await engine.start()
+
+    engine._stream.push(np.arange(15))
+    engine.rewind(0.5, not_before=engine.position + 2)
+    engine._stream.push(np.arange(15, 20))
+
+    samples, _ = engine.read(3, timeout=0)
+    assert samples[:, 0].tolist() == [17, 18, 19]
+
+
+@pytest.mark.asyncio
+async def test_read_reports_overflow():
+    engine = capture.CaptureEngine(sample_rate=10, history_duration=1.0)
+    await engine.start()
+
+    engine.rewind(0)
+    engine._stream.push(np.arange(25))
+
+    samples, overflowed = engine.read(10, timeout=0)
+    assert overflowed
+    assert samples[:, 0].tolist() == list(range(15, 25))
+
+
+@pytest.mark.asyncio
+async def test_read_times_out_with_partial_data():
+    engine = capture.CaptureEngine(sample_rate=10)
+    await engine.start()
+
+    engine.rewind(0)
+    engine._stream.push(np.arange(3))
+    samples, _ = engine.read(5, timeout=0.02)
+    assert len(samples) == 3
@@ -0,0 +1,57 @@
+import io
+
+import numpy as np
+import pytest
+import soundfile as sf
+
+from msm_assistant.utils.helper.audio import encoding
+
+
+def tone(sample_rate, seconds=1.0, frequency=440.0, amplitude=10000):
+    t = np.arange(int(seconds * sample_rate)) / sample_rate
+    return (amplitude * np.sin(2 * np.pi * frequency * t)).astype(np.int16)
+
+
+def test_resample_length_and_frequency():
+    audio = tone(44100)
+    resampled = encoding.resample(audio, 44100, 16000)
+
+    assert resampled.dtype == np.float32
+    assert len(resampled) == 16000
+    spectrum = np.abs(np.fft.rfft(resampled))
+    assert np.argmax(spectrum) == 440  # 1 Hz bins for a 1 s clip
+
+
+def test_resample_removes_content_above_nyquist():
+    audio = tone(44100, frequency=12000)
+    resampled = encoding.resample(audio, 44100, 16000)
+    assert np.max(np.abs(resampled)) < 100
+
+
+def test_resample_identity_and_upsample():
+    audio = tone(16000)
+    assert np.array_equal(
+        encoding.resample(audio, 16000, 16000), audio.astype(np.float32)
+    )
+    assert len(encoding.resample(audio, 16000, 48000)) == 48000
+
+
+@pytest.mark.parametrize(
+    "format, mime_type", [("flac", "audio/flac"), ("ogg", "audio/ogg")]
+)
+def test_encode_for_upload_round_trip(format, mime_type):
+    audio = tone(44100, seconds=2.0)[:, np.newaxis]
+    name, content, mime = encoding.encode_for_upload(audio, 44100, format=format)
+
+    assert name == f"user.{format}"
+    assert mime == mime_type
+    assert len(content) < audio.nbytes / 4
+
+    decoded, sample_rate = sf.read(io.BytesIO(content), dtype="int16")
+    assert sample_rate == 16000
+    assert abs(len(decoded) - 32000) < 1000
+
+
+def test_encode_for_upload_invalid_format():
+    with pytest.raises(ValueError, match="upload format must be one of"):
+        encoding.encode_for_upload(tone(16000), 16000, format="mp3")
@@ -0,0 +1,116 @@
+import asyncio
+import sys
+import types
+
+import numpy as np
+import pytest
+
+# --- Stub out sounddevice (PortAudio) before importing the module under test ---
+fake_sounddevice = types.ModuleType("sounddevice")
+
+
+class FakeOutputStream:
+    def __init__(self, samplerate, channels, dtype, callback):
+        self.callback = callback
+        self.channels = channels
+        self.latency = 0.0
+        self.closed = False
+
+    def start(self):
+        pass
+
+    def close(self):
+        self.closed = True
+
+    def pull(self, frames):
+        """Simulate PortAudio requesting a block of audio."""
+        out = np.zeros((frames, self.channels), dtype=np.float32)
+        self.callback(out, frames, None, None)
+        return out
+
+
+fake_sounddevice.OutputStream = FakeOutputStream
+sys.modules["sounddevice"] = fake_sounddevice
+
+from msm_assistant.utils.helper.audio.playback import AudioEngine  # noqa: E402
+from msm_assistant.utils.helper.audio.sounds import SoundBank  # noqa: E402
+
+
+@pytest.fixture
+def bank():
+    bank = SoundBank(sample_rate=100)
+    bank.add("chime", np.full((10, 1), 0.25, dtype=np.float32), 100)
+    return bank
+
+
+@pytest.mark.asyncio
+async def test_chime_is_mixed_over_speech(bank):
+    engine = AudioEngine(bank, sample_rate=100)
+    await engine.start()
+
+    await engine.enqueue_pcm(np.full(8, 16384, dtype=np.int16).tobytes())
+    await engine.play("chime", wait=False)
+    out = engine._stream.pull(12)
+
+    assert np.allclose(out[:8, 0], 0.75)
+    assert np.allclose(out[8:10, 0], 0.25)
+    assert np.allclose(out[10:, 0], 0.0)
+
+
+@pytest.mark.asyncio
+async def test_play_waits_for_completion(bank):
+    engine = AudioEngine(bank, sample_rate=100)
+    await engine.start()
+
+    playing = asyncio.create_task(engine.play("chime"))
+    await asyncio.sleep(0)
+    engine._stream.pull(5)
+    await asyncio.sleep(0)
+    assert not playing.done()
+
+    engine._stream.pull(5)
+    await asyncio.wait_for(playing, timeout=1)
+
+
+@pytest.mark.asyncio
+async def test_enqueue_handles_unaligned_chunks(bank):
+    engine = AudioEngine(bank, sample_rate=100)
+    await engine.start()
+
+    data = np.array([16384, -16384], dtype=np.int16).tobytes()
+    await engine.enqueue_pcm(data[:3])
+    await engine.enqueue_pcm(data[3:])
+
+    out = engine._stream.pull(2)
+    assert np.allclose(out[:, 0], [0.5, -0.5])
+
+
+@pytest.mark.asyncio
+async def test_clear_speech_and_drain(bank):
+    engine = AudioEngine(bank, sample_rate=100, buffer_duration=1.0)
+    await engine.start()
+
+    await engine.enqueue_pcm(np.ones(50, dtype=np.float32))
+    draining = asyncio.create_task(engine.drain())
+    await asyncio.sleep(0.05)
+    assert not draining.done()
+
+    engine.clear_speech()
+    out = engine._stream.pull(10)
+    assert np.allclose(out, 0.0)
+    await asyncio.wait_for(draining, timeout=1)
+
+
+@pytest.mark.asyncio
+async def test_drain_waits_for_the_output_latency(bank):
+    engine = AudioEngine(bank, sample_rate=100)
+    await engine.start()
+    engine._stream.latency = 0.2
+
+    await engine.enqueue_pcm(np.ones(10, dtype=np.float32))
+    draining = asyncio.create_task(engine.drain())
+    engine._stream.pull(10)
+    await asyncio.sleep(0.1)
+    assert not draining.done()  # * the buffer is empty but still being heard
+
+    await asyncio.wait_for(draining, timeout=1)
@@ -0,0 +1,72 @@
+import numpy as np
+
+from msm_assistant.utils.helper.audio.ring import RingBuffer
+
+
+def test_write_and_read_wraps_around():
+    ring = RingBuffer(capacity=5)
+    assert ring.write(np.arange(4, dtype=np.float32)) == 4
+
+    out = np.zeros((3, 1), dtype=np.float32)
+    assert ring.read_into(out) == 3
+    assert out[:, 0].tolist() == [0, 1, 2]
+
+    # wraps around the end of the storage
+    assert ring.write(np.arange(4, 8, dtype=np.float32)) == 4
+    assert ring.available == 5
+    assert ring.free == 0
+
+    out = np.zeros((6, 1), dtype=np.float32)
+    assert ring.read_into(out) == 5
+    assert out[:, 0].tolist() == [3, 4, 5, 6, 7, 0]
+
+
+def test_write_is_partial_when_full():
+    ring = RingBuffer(capacity=3)
+    assert ring.write(np.ones(5, dtype=np.float32)) == 3
+    assert ring.write(np.ones(1, dtype=np.float32)) == 0
+
+
+def test_discard():
+    ring = RingBuffer(capacity=4, channels=2)
+    ring.write(np.ones((3, 2), dtype=np.float32))
+    ring.discard()
+    assert ring.available == 0
+    assert ring.free == 4
+
+
+def test_overwrite_keeps_latest_history():
+    ring = RingBuffer(capacity=4, dtype=np.int16, overwrite=True)
+    assert ring.write(np.arange(6, dtype=np.int16)) == 4
+    assert ring.overrun
+
+    out = np.zeros((4, 1), dtype=np.int16)
+    assert ring.read_into(out) == 4
+    assert out[:, 0].tolist() == [2, 3, 4, 5]
+    assert not ring.overrun
+
+
+def test_rewind():
+    ring = RingBuffer(capacity=4, dtype=np.int16, overwrite=True)
+    ring.write(np.arange(3, dtype=np.int16))
+    ring.rewind(10)  # * limited to what has been written
+    assert ring.available == 3
+
+    ring.rewind(1)
+    out = np.zeros((4, 1), dtype=np.int16)
+    assert ring.read_into(out) == 1
+    assert out[0, 0] == 2
+
+
+def test_seek_waits_for_unwritten_samples():
+    ring = RingBuffer(capacity=4, dtype=np.int16, overwrite=True)
+    ring.write(np.arange(6, dtype=np.int16))
+    ring.seek(0)  # * clamped to the oldest sample kept
+    assert ring.available == 4
+
+    ring.seek(8)
+    assert ring.available == 0
+    ring.write(np.arange(6, 9, dtype=np.int16))
+    out = np.zeros((4, 1), dtype=np.int16)
+    assert ring.read_into(out) == 1
+    assert out[0, 0] == 8
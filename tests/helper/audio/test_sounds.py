@@ -0,0 +1,30 @@
+import numpy as np
+import pytest
+
+from msm_assistant.utils.helper.audio.sounds import SoundBank
+
+
+def test_load_package_decodes_assets_once():
+    bank = SoundBank(sample_rate=24000)
+    bank.load_package("msm_assistant.assets")
+
+    for name in ["available_chime", "button_chime", "correct_chime", "error"]:
+        assert name in bank
+        sound = bank[name]
+        assert sound.dtype == np.float32
+        assert sound.ndim == 2 and sound.shape[1] == 1
+
+
+def test_add_resamples_and_downmixes():
+    bank = SoundBank(sample_rate=24000)
+    stereo = np.full((48000, 2), 0.5, dtype=np.float32)
+    bank.add("tone", stereo, 48000)
+
+    assert bank["tone"].shape == (24000, 1)
+    assert np.allclose(bank["tone"], 0.5, atol=1e-3)
+
+
+def test_missing_sound_raises():
+    bank = SoundBank(sample_rate=24000)
+    with pytest.raises(KeyError, match="No sound named 'nope'"):
+        bank["nope"]
@@ -0,0 +1,64 @@
+import numpy as np
+
+from msm_assistant.utils.helper.audio.vad import VoiceActivityDetector
+
+SAMPLE_RATE = 16000
+CHUNK = SAMPLE_RATE // 10  # 100 ms, as read by the recorder
+
+
+def tone(seconds, amplitude=0.3, frequency=220.0):
+    t = np.arange(int(seconds * SAMPLE_RATE)) / SAMPLE_RATE
+    return (amplitude * 32767 * np.sin(2 * np.pi * frequency * t)).astype(np.int16)
+
+
+def silence(seconds, amplitude=0.0005):
+    rng = np.random.default_rng(0)
+    noise = rng.normal(0, amplitude * 32767, int(seconds * SAMPLE_RATE))
+    return noise.astype(np.int16)
+
+
+def feed(vad, audio):
+    """Feed audio in recorder-sized chunks, returning the chunk index that endpointed."""
+    for index in range(0, len(audio), CHUNK):
+        if vad.process(audio[index : index + CHUNK, np.newaxis]):
+            return index // CHUNK
+    return None
+
+
+def test_silence_never_endpoints():
+    vad = VoiceActivityDetector(SAMPLE_RATE, trailing_silence=0.5)
+    assert feed(vad, silence(3)) is None
+    assert not vad.speech_detected
+
+
+def test_endpoint_after_trailing_silence():
+    vad = VoiceActivityDetector(SAMPLE_RATE, trailing_silence=0.5)
+    audio = np.concatenate([silence(0.5), tone(1.0), silence(2.0)])
+
+    endpoint = feed(vad, audio)
+    assert vad.speech_detected
+    # speech ends at 1.5 s, so the capture should stop 0.5 s later
+    assert endpoint is not None
+    assert 19 <= endpoint <= 21
+
+
+def test_short_blip_does_not_arm_endpointing():
+    vad = VoiceActivityDetector(SAMPLE_RATE, trailing_silence=0.3, min_speech=0.2)
+    audio = np.concatenate([silence(0.5), tone(0.05), silence(1.0)])
+    assert feed(vad, audio) is None
+
+
+def test_trim_removes_leading_and_trailing_silence():
+    vad = VoiceActivityDetector(SAMPLE_RATE, trailing_silence=0.5, padding=0.1)
+    audio = np.concatenate([silence(1.0), tone(1.0), silence(1.0)])
+    feed(vad, audio)
+
+    trimmed = vad.trim(audio)
+    assert abs(len(trimmed) / SAMPLE_RATE - 1.2) < 0.05
+
+
+def test_trim_without_speech_keeps_audio():
+    vad = VoiceActivityDetector(SAMPLE_RATE)
+    audio = silence(1.0)
+    feed(vad, audio)
+    assert len(vad.trim(audio)) == len(audio)
@@ -0,0 +1,114 @@
+from types import SimpleNamespace
+
+import pytest
+
+from msm_assistant.utils.helper.completion import CompletionStream
+
+
+def chunk(content=None, tool_calls=None, finish_reason=None):
+    delta = SimpleNamespace(content=content, tool_calls=tool_calls)
+    return SimpleNamespace(
+        choices=[SimpleNamespace(delta=delta, finish_reason=finish_reason)]
+    )
+
+
+def tool_delta(index, id=None, name=None, arguments=None):
+    return SimpleNamespace(
+        index=index,
+        id=id,
+        function=SimpleNamespace(name=name, arguments=arguments),
+    )
+
+
+class FakeStream:
+    def __init__(self, chunks):
+        self._chunks = chunks
+        self.read = 0
+        self.closed = False
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        if self.read >= len(self._chunks):
+            raise StopAsyncIteration
+        self.read += 1
+        return self._chunks[self.read - 1]
+
+    async def close(self):
+        self.closed = True
+
+
+@pytest.mark.asyncio
+async def test_prime_stops_at_first_text():
+    fake = FakeStream([chunk("Hello"), chunk(" there"), chunk(finish_reason="stop")])
+    stream = CompletionStream(fake)
+
+    await stream.prime()
+    assert fake.read == 1
+    assert not stream.has_tool_calls
+
+    deltas = [delta async for delta in stream.text()]
+    assert deltas == ["Hello", " there"]
+    assert stream.content == "Hello there"
+    assert stream.finish_reason == "stop"
+
+
+@pytest.mark.asyncio
+async def test_tool_call_deltas_are_accumulated():
+    fake = FakeStream(
+        [
+            chunk(tool_calls=[tool_delta(0, id="call1", name="get_", arguments="")]),
+            chunk(tool_calls=[tool_delta(0, name="weather", arguments='{"city"')]),
+            chunk(tool_calls=[tool_delta(1, id="call2", name="fn", arguments="{}")]),
+            chunk(tool_calls=[tool_delta(0, arguments=': "X"}')]),
+            chunk(finish_reason="tool_calls"),
+            SimpleNamespace(choices=[]),
+        ]
+    )
+    stream = CompletionStream(fake)
+
+    await stream.prime()
+    assert stream.has_tool_calls
+    await stream.collect()
+
+    assert stream.finish_reason == "tool_calls"
+    assert stream.tool_calls() == [
+        {
+            "id": "call1",
+            "type": "function",
+            "function": {"name": "get_weather", "arguments": '{"city": "X"}'},
+        },
+        {
+            "id": "call2",
+            "type": "function",
+            "function": {"name": "fn", "arguments": "{}"},
+        },
+    ]
+
+
+@pytest.mark.asyncio
+async def test_close_stops_reading():
+    fake = FakeStream([chunk("a"), chunk("b")])
+    stream = CompletionStream(fake)
+    await stream.prime()
+    await stream.close()
+
+    assert fake.closed
+    assert [delta async for delta in stream.text()] == ["a"]
+
+
+@pytest.mark.asyncio
+async def test_usage_is_recorded_from_trailing_chunk():
+    usage = SimpleNamespace(total_tokens=42)
+    fake = FakeStream(
+        [
+            chunk("Hi"),
+            chunk(finish_reason="stop"),
+            SimpleNamespace(choices=[], usage=usage),
+        ]
+    )
+    stream = CompletionStream(fake)
+    await stream.collect()
+
+    assert stream.usage.total_tokens == 42
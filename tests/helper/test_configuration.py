@@ -9,7 +9,9 @@ from msm_assistant.utils.helper.configuration import (CategoryConfig,
                                                       ConfigurationError,
                                                       DatabaseConfig,
                                                       OPCUAConfig,
+                                                      RecordingConfig,
                                                       SpeechConfig,
+                                                      ToolsConfig,
                                                       TranscriptionConfig)
 
 
@@ -30,6 +32,24 @@ def test_transcription_config_invalid(config, error_msg):
 def test_transcription_config_valid():
     cfg = TranscriptionConfig({"model": "whisper-1"})
     assert cfg.model == "whisper-1"
+    assert cfg.upload_format == "flac"
+    assert cfg.upload_sample_rate == 16000
+
+
+@pytest.mark.parametrize(
+    "config, error_msg",
+    [
+        ({"model": "whisper-1", "upload_format": "mp3"}, "upload format must be one of"),
+        (
+            {"model": "whisper-1", "upload_sample_rate": 44100},
+            "upload sample rate must be one of",
+        ),
+    ],
+)
+def test_transcription_config_invalid_upload(config, error_msg):
+    with pytest.raises(ConfigurationError) as exc:
+        TranscriptionConfig(config)
+    assert error_msg in str(exc.value)
 
 
 # --- ChatConfig ---
@@ -51,6 +71,27 @@ def test_chat_config_valid():
     cfg = ChatConfig({"model": "gpt-4", "prompt": "Hello"})
     assert cfg.model == "gpt-4"
     assert cfg.prompt == "Hello"
+    assert cfg.max_steps == 4
+    assert cfg.max_tokens == 20000
+    assert cfg.max_duration == 20.0
+    assert cfg.context_budget == 8000
+    assert cfg.keep_turns == 2
+
+
+@pytest.mark.parametrize(
+    "budget, error_msg",
+    [
+        ({"max_steps": 0}, "'max_steps' field must be a positive integer"),
+        ({"max_steps": 1}, "'max_steps' field must be at least 2"),
+        ({"max_tokens": 1.5}, "'max_tokens' field must be a positive integer"),
+        ({"max_duration": -2}, "'max_duration' field must be a positive number"),
+        ({"context_budget": 0}, "'context_budget' field must be a positive integer"),
+    ],
+)
+def test_chat_config_invalid_budget(budget, error_msg):
+    with pytest.raises(ConfigurationError) as exc:
+        ChatConfig({"model": "gpt-4", "prompt": "Hello", **budget})
+    assert error_msg in str(exc.value)
 
 
 # --- SpeechConfig ---
@@ -108,6 +149,38 @@ def test_database_config_valid():
     assert cfg.collection == "col"
 
 
+def test_database_config_local_index():
+    base = {"url": "http://db", "collection": "col", "description": "d"}
+    cfg = DatabaseConfig(base)
+    assert cfg.local_index is False
+    assert cfg.max_local_points == 10_000
+    assert cfg.index_snapshot is None
+
+    cfg = DatabaseConfig(
+        {**base, "local_index": True, "index_snapshot": "/tmp/index.npy"}
+    )
+    assert cfg.local_index is True
+    assert cfg.index_snapshot == "/tmp/index.npy"
+
+    assert cfg.payload_fields == ["text", "file", "pages", "files"]
+    assert cfg.max_limit == 10
+    assert cfg.score_threshold is None
+
+    for key, value in [
+        ("payload_fields", []),
+        ("max_limit", 0),
+        ("max_result_tokens", "many"),
+        ("score_threshold", 2.0),
+        ("local_index", "yes"),
+        ("max_local_points", 0),
+        ("refresh_interval", -1),
+        ("index_snapshot", 3),
+    ]:
+        with pytest.raises(ConfigurationError) as exc:
+            DatabaseConfig({**base, key: value})
+        assert f"'{key}'" in str(exc.value)
+
+
 # --- CategoryConfig ---
 @pytest.mark.parametrize(
     "config, error_msg",
@@ -158,6 +231,24 @@ def test_category_config_valid():
             {"url": "u", "conversation_node_id": "c"},
             "Missing required key 'state_node_id'",
         ),
+        (
+            {
+                "url": "u",
+                "conversation_node_id": "c",
+                "state_node_id": "s",
+                "publish_window": -1,
+            },
+            "'publish_window' field must be a non-negative number",
+        ),
+        (
+            {
+                "url": "u",
+                "conversation_node_id": "c",
+                "state_node_id": "s",
+                "publish_last": 0,
+            },
+            "'publish_last' field must be a positive integer",
+        ),
     ],
 )
 def test_opcua_config_invalid(config, error_msg):
@@ -185,6 +276,65 @@ def test_opcua_config_valid():
     assert cfg.state_node_id == "s"
     assert len(cfg.categories) == 1
     assert isinstance(cfg.categories[0], CategoryConfig)
+    assert cfg.publish_window == 0.1
+    assert cfg.publish_last is None
+
+
+# --- RecordingConfig ---
+@pytest.mark.parametrize(
+    "config, error_msg",
+    [
+        ({"endpointing": "yes"}, "'endpointing' field must be true or false"),
+        ({"trailing_silence": 0}, "'trailing_silence' field must be a positive"),
+        ({"energy_threshold": 3}, "'energy_threshold' field must be a negative"),
+        ({"pre_roll": 5}, "'pre_roll' field must be between 0 and 2 seconds"),
+        ({"max_duration": -1}, "'max_duration' field must be a positive"),
+    ],
+)
+def test_recording_config_invalid(config, error_msg):
+    with pytest.raises(ConfigurationError) as exc:
+        RecordingConfig(config)
+    assert error_msg in str(exc.value)
+
+
+def test_recording_config_defaults():
+    cfg = RecordingConfig({})
+    assert cfg.endpointing is True
+    assert cfg.trailing_silence == 1.0
+    assert cfg.energy_threshold == -45.0
+    assert cfg.pre_roll == 0.3
+    assert cfg.max_duration == 30.0
+
+
+def test_recording_config_valid():
+    cfg = RecordingConfig(
+        {"endpointing": False, "trailing_silence": 0.6, "energy_threshold": -50}
+    )
+    assert cfg.endpointing is False
+    assert cfg.trailing_silence == 0.6
+    assert cfg.energy_threshold == -50
+
+
+# --- ToolsConfig ---
+@pytest.mark.parametrize(
+    "config, error_msg",
+    [
+        ({"timeout": 0}, "'timeout' field must be a positive"),
+        ({"timeouts": {"get_weather": "slow"}}, "'timeouts' field must map"),
+        ({"timeouts": ["get_weather"]}, "'timeouts' field must map"),
+    ],
+)
+def test_tools_config_invalid(config, error_msg):
+    with pytest.raises(ConfigurationError) as exc:
+        ToolsConfig(config)
+    assert error_msg in str(exc.value)
+
+
+def test_tools_config_timeout_for():
+    cfg = ToolsConfig({"timeout": 5, "timeouts": {"search_knowledge_base": 2.5}})
+    assert cfg.timeout_for("search_knowledge_base") == 2.5
+    assert cfg.timeout_for("get_opcua_nodes") == 5
+    assert ToolsConfig({}).timeout_for("get_weather") == 10.0
 
 
 # --- Configuration class ---
@@ -0,0 +1,95 @@
+import pytest
+
+from msm_assistant.utils.helper.embedding_cache import EmbeddingCache
+
+
+def test_miss_then_hit_in_memory():
+    cache = EmbeddingCache()
+    assert cache.get("model", "hello") is None
+    cache.put("model", "hello", [1.0, 2.0])
+
+    assert cache.get("model", "hello") == [1.0, 2.0]
+    assert (cache.hits, cache.misses) == (1, 1)
+    assert cache.hit_rate == 0.5
+
+
+def test_keys_are_normalised_and_per_model():
+    cache = EmbeddingCache()
+    cache.put("model", "What printers  are in the lab?", [1.0])
+
+    assert cache.get("model", " what printers are in the LAB? ") == [1.0]
+    assert cache.get("other-model", "What printers are in the lab?") is None
+
+
+def test_memory_tier_is_lru():
+    cache = EmbeddingCache(max_memory_entries=2)
+    cache.put("m", "a", [1.0])
+    cache.put("m", "b", [2.0])
+    cache.get("m", "a")  # * "b" is now the least recently used
+    cache.put("m", "c", [3.0])
+
+    assert cache.get("m", "b") is None
+    assert cache.get("m", "a") == [1.0]
+    assert cache.get("m", "c") == [3.0]
+
+
+def test_disk_tier_survives_restarts(tmp_path):
+    path = tmp_path / "cache" / "embeddings.sqlite"
+    cache = EmbeddingCache(path)
+    cache.put_many("m", ["a", "b"], [[0.5, 0.25], [1.0, 2.0]])
+    cache.close()
+
+    cache = EmbeddingCache(path)
+    assert cache.get_many("m", ["a", "b", "c"]) == [[0.5, 0.25], [1.0, 2.0], None]
+    assert (cache.hits, cache.misses) == (2, 1)
+
+
+def test_disk_tier_evicts_least_recently_used(tmp_path):
+    cache = EmbeddingCache(
+        tmp_path / "embeddings.sqlite", max_memory_entries=1, max_disk_entries=2
+    )
+    for text in ["a", "b", "c"]:
+        cache.put("m", text, [1.0])
+
+    cache = EmbeddingCache(tmp_path / "embeddings.sqlite")
+    assert cache.get("m", "a") is None
+    assert cache.get("m", "c") == [1.0]
+
+
+def test_disk_hits_buffer_access_times(tmp_path):
+    path = tmp_path / "embeddings.sqlite"
+    cache = EmbeddingCache(path, max_memory_entries=1)
+    cache.put_many("m", ["a", "b"], [[1.0], [2.0]])
+    cache._db.execute("UPDATE embeddings SET accessed = 0")
+
+    def accessed():
+        return cache._db.execute(
+            "SELECT accessed FROM embeddings WHERE key = ?", (cache.key("a"),)
+        ).fetchone()[0]
+
+    assert cache.get("m", "a") == [1.0]  # * from disk, as "b" is in memory
+    assert list(cache._accessed) == [("m", cache.key("a"))]
+    assert accessed() == 0
+
+    cache.flush()
+    assert not cache._accessed
+    assert accessed() > 0
+
+
+def test_eviction_sees_buffered_access_times(tmp_path):
+    cache = EmbeddingCache(
+        tmp_path / "embeddings.sqlite", max_memory_entries=1, max_disk_entries=2
+    )
+    cache.put_many("m", ["a", "b"], [[1.0], [2.0]])
+    cache._db.execute("UPDATE embeddings SET accessed = 0")
+    assert cache.get("m", "a") == [1.0]  # * "b" is now the least recently used
+    cache.put("m", "c", [3.0])
+    cache.close()
+
+    cache = EmbeddingCache(tmp_path / "embeddings.sqlite")
+    assert cache.get_many("m", ["a", "b", "c"]) == [[1.0], None, [3.0]]
+
+
+def test_put_many_requires_matching_lengths():
+    with pytest.raises(ValueError):
+        EmbeddingCache().put_many("m", ["a", "b"], [[1.0]])
@@ -1,3 +1,4 @@
+import json
 import sys
 import types
 from enum import Enum
@@ -23,6 +24,8 @@ openai_module.types = types_module
 sys.modules["openai"] = openai_module
 sys.modules["openai.types"] = types_module
 sys.modules["openai.types.chat"] = chat_module
+# the module may already have been imported against the real openai (e.g. by completion)
+sys.modules.pop("msm_assistant.utils.helper.message", None)
 
 from openai.types.chat import ChatCompletionMessage  # noqa: E402
 
@@ -31,6 +34,7 @@ from msm_assistant.utils.helper.message import AssistantMessage  # noqa: E402
 from msm_assistant.utils.helper.message import Conversation  # noqa: E402
 from msm_assistant.utils.helper.message import Message  # noqa: E402
 from msm_assistant.utils.helper.message import MessageRole  # noqa: E402
+from msm_assistant.utils.helper.message import ToolCallMessage  # noqa: E402
 from msm_assistant.utils.helper.message import (DeveloperMessage, ToolMessage, # noqa: E402
                                                 UserMessage)
 
@@ -148,24 +152,194 @@ def test_conversation_with_tool_call_messages():
     conv = Conversation(prompt)
     conv.add(cc)
 
-    # to_dict=False (default): message object preserved
-    msgs_obj = conv.to_messages()
-    assert msgs_obj[0] == prompt.to_dict()
-    assert isinstance(msgs_obj[1], ChatCompletionMessage)
+    # to_dict=False (default): tool calls converted once into API dicts
+    msgs_api = conv.to_messages()
+    assert msgs_api == [
+        prompt.to_dict(),
+        {
+            "role": MessageRole.ASSISTANT.value,
+            "content": None,
+            "tool_calls": [
+                {
+                    "id": "call1",
+                    "type": "function",
+                    "function": {"name": "fn", "arguments": "args"},
+                }
+            ],
+        },
+    ]
+    assert isinstance(conv._state[0], ToolCallMessage)
 
-    # to_dict=True: convert tool call to dict
+    # to_dict=True: compact tool call record
     msgs_dict = conv.to_messages(to_dict=True)
     assert msgs_dict == [
         prompt.to_dict(),
-        {"id": "call1", "function_name": "fn", "arguments": "fn"},
+        {
+            "role": MessageRole.ASSISTANT.value,
+            "tool_calls": [
+                {"id": "call1", "function_name": "fn", "arguments": "args"}
+            ],
+        },
     ]
 
 
-def test_to_messages_unknown_message_type_raises():
+def test_tool_call_message_keeps_all_tool_calls():
+    from types import SimpleNamespace
+
+    tool_calls = [
+        SimpleNamespace(
+            id=f"call{i}", function=SimpleNamespace(name=f"fn{i}", arguments="{}")
+        )
+        for i in range(3)
+    ]
+    message = ToolCallMessage.from_completion(
+        ChatCompletionMessage(tool_calls=tool_calls)
+    )
+    assert [call["id"] for call in message.to_dict()["tool_calls"]] == [
+        "call0",
+        "call1",
+        "call2",
+    ]
+    assert len(message.to_record()["tool_calls"]) == 3
+
+
+def test_add_unknown_message_type_raises():
     prompt = DeveloperMessage("p")
     conv = Conversation(prompt)
-    # Append an unsupported type
-    conv._state.append(42)
     with pytest.raises(ValueError) as exc:
-        conv.to_messages()
+        conv.add(42)
     assert "Unknown message type" in str(exc.value)
+
+
+def test_serialized_forms_are_cached():
+    prompt = DeveloperMessage("p")
+    conv = Conversation(prompt)
+    conv.add(UserMessage("hello"))
+
+    first = conv.to_json()
+    assert conv.to_json() is first
+    assert conv.to_messages()[1] is conv.to_messages()[1]
+
+    conv.add(AssistantMessage("hi"))
+    assert conv.to_json() != first
+    assert len(conv.to_messages(to_dict=True)) == 3
+
+    conv.reset()
+    assert conv.to_messages() == [prompt.to_dict()]
+    assert conv.to_json() == '[{"role": "developer", "content": "p"}]'
+
+
+def test_messages_use_slots():
+    message = UserMessage("u")
+    with pytest.raises(AttributeError):
+        message.extra = 1
+
+
+# --- Tests for token accounting and summary folding ---
+
+
+def make_turns(conv, count, words=50):
+    for index in range(count):
+        conv.add(UserMessage(f"question {index} " + "word " * words))
+        conv.add(AssistantMessage(f"answer {index} " + "word " * words))
+
+
+def test_tokens_are_counted_on_add():
+    conv = Conversation(DeveloperMessage("prompt"))
+    before = conv.tokens
+    conv.add(UserMessage("hello there"))
+    assert conv.tokens > before
+    assert len(conv._tokens) == 1
+
+    conv.reset()
+    assert conv.tokens == before
+
+
+def test_foldable_within_budget_is_empty():
+    conv = Conversation(DeveloperMessage("prompt"))
+    make_turns(conv, 3)
+    assert conv.foldable(budget=10_000) == []
+
+
+def test_foldable_keeps_recent_turns():
+    conv = Conversation(DeveloperMessage("prompt"))
+    make_turns(conv, 5)
+
+    # a tiny budget folds everything but the kept turns
+    messages = conv.foldable(budget=1, keep_turns=2)
+    assert len(messages) == 6
+    assert messages[0].content.startswith("question 0")
+
+    # a budget just under the total folds only the oldest turn
+    messages = conv.foldable(budget=conv.tokens - 1, keep_turns=2)
+    assert len(messages) == 2
+
+
+def test_fold_replaces_messages_with_summary():
+    prompt = DeveloperMessage("prompt")
+    conv = Conversation(prompt)
+    make_turns(conv, 4)
+    before = conv.tokens
+
+    messages = conv.foldable(budget=1, keep_turns=1)
+    conv.fold(messages, "The user asked three questions.")
+
+    assert conv.summary == "The user asked three questions."
+    assert conv.tokens < before
+    msgs = conv.to_messages()
+    assert msgs[0] == prompt.to_dict()
+    assert msgs[1]["role"] == MessageRole.DEVELOPER.value
+    assert msgs[1]["content"].endswith("The user asked three questions.")
+    assert msgs[2]["content"].startswith("question 3")
+
+
+def test_fold_rejects_stale_messages():
+    conv = Conversation(DeveloperMessage("prompt"))
+    make_turns(conv, 3)
+    messages = conv.foldable(budget=1, keep_turns=1)
+
+    conv.reset()
+    with pytest.raises(ValueError):
+        conv.fold(messages, "summary")
+
+
+def test_transcript_includes_summary_and_tool_calls():
+    from types import SimpleNamespace
+
+    conv = Conversation(DeveloperMessage("prompt"))
+    make_turns(conv, 3, words=0)
+    conv.fold(conv.foldable(budget=1, keep_turns=2), "earlier chat")
+
+    tool_call = SimpleNamespace(
+        id="call1", function=SimpleNamespace(name="fn", arguments='{"a": 1}')
+    )
+    text = conv.transcript(
+        [
+            UserMessage("hi"),
+            ToolCallMessage.from_completion(
+                ChatCompletionMessage(tool_calls=[tool_call])
+            ),
+        ]
+    )
+    assert text == 'summary: earlier chat\nuser: hi\nassistant called fn({"a": 1})'
+
+
+def test_listeners_are_called_on_change():
+    conv = Conversation(DeveloperMessage("p"))
+    calls = []
+    conv.add_listener(lambda: calls.append(len(conv.to_messages())))
+
+    conv.add(UserMessage("hello"))
+    conv.reset()
+    assert calls == [2, 1]
+
+
+def test_to_json_last_messages():
+    conv = Conversation(DeveloperMessage("p"))
+    make_turns(conv, 3, words=0)
+    records = json.loads(conv.to_json(last=2))
+    assert records[0] == {"role": "developer", "content": "p"}
+    assert [record["content"] for record in records[1:]] == [
+        "question 2 ",
+        "answer 2 ",
+    ]
@@ -0,0 +1,102 @@
+import asyncio
+
+import pytest
+
+from msm_assistant.utils.helper import publisher as publisher_module
+from msm_assistant.utils.helper.publisher import StatePublisher
+
+
+class FakeClient:
+    instances = []
+    fail_writes = 0
+
+    def __init__(self, url):
+        self.url = url
+        self.writes = []
+        self.connected = False
+        FakeClient.instances.append(self)
+
+    async def connect(self):
+        self.connected = True
+
+    async def disconnect(self):
+        self.connected = False
+
+    def get_node(self, node_id):
+        return node_id
+
+    async def write_values(self, nodes, values):
+        if FakeClient.fail_writes:
+            FakeClient.fail_writes -= 1
+            raise ConnectionError("session closed")
+        self.writes.append((list(nodes), [value.Value for value in values]))
+
+
+@pytest.fixture
+def fake_client(monkeypatch):
+    FakeClient.instances = []
+    FakeClient.fail_writes = 0
+    monkeypatch.setattr(publisher_module, "Client", FakeClient)
+    return FakeClient
+
+
+def make_publisher(values, window=0.01):
+    return StatePublisher(
+        url="opc.tcp://test",
+        state_node_id="state",
+        conversation_node_id="conversation",
+        read_state=lambda: values["state"],
+        read_conversation=lambda: values["conversation"],
+        window=window,
+    )
+
+
+@pytest.mark.asyncio
+async def test_publishes_both_nodes_in_one_write(fake_client):
+    values = {"state": "idle", "conversation": "[]"}
+    publisher = make_publisher(values)
+    await publisher.start()
+    await asyncio.sleep(0.05)
+    await publisher.stop()
+
+    (client,) = fake_client.instances
+    assert client.writes == [(["state", "conversation"], ["idle", "[]"])]
+
+
+@pytest.mark.asyncio
+async def test_bursts_are_coalesced_and_unchanged_values_skipped(fake_client):
+    values = {"state": "idle", "conversation": "[]"}
+    publisher = make_publisher(values, window=0.05)
+    await publisher.start()
+    await asyncio.sleep(0.1)
+
+    for state in ["listening", "processing", "speaking"]:
+        values["state"] = state
+        publisher.notify()
+    await asyncio.sleep(0.1)
+
+    publisher.notify()  # * nothing changed
+    await asyncio.sleep(0.1)
+    await publisher.stop()
+
+    (client,) = fake_client.instances
+    assert [values for _, values in client.writes] == [
+        ["idle", "[]"],
+        ["speaking", "[]"],
+    ]
+
+
+@pytest.mark.asyncio
+async def test_reconnects_after_failed_write(fake_client, monkeypatch):
+    monkeypatch.setattr(StatePublisher, "INITIAL_BACKOFF", 0.01)
+    fake_client.fail_writes = 1
+    values = {"state": "idle", "conversation": "[]"}
+    publisher = make_publisher(values)
+    await publisher.start()
+    await asyncio.sleep(0.1)
+    await publisher.stop()
+
+    assert len(fake_client.instances) == 2
+    assert fake_client.instances[1].writes == [
+        (["state", "conversation"], ["idle", "[]"])
+    ]
@@ -0,0 +1,103 @@
+import asyncio
+
+import pytest
+
+from msm_assistant.utils.helper.speech import SentenceSplitter, SpeechPipeline
+
+
+# --- SentenceSplitter ---
+def test_splitter_emits_complete_sentences():
+    splitter = SentenceSplitter()
+    assert splitter.feed("G'day mate, welcome to the lab") == []
+    assert splitter.feed("! The gantry has eight printers. It") == [
+        "G'day mate, welcome to the lab!",
+        "The gantry has eight printers.",
+    ]
+    assert splitter.flush() == "It"
+    assert splitter.flush() is None
+
+
+def test_splitter_skips_abbreviations_and_decimals():
+    splitter = SentenceSplitter()
+    sentences = splitter.feed("Ask Dr. Keenan Granland about the 3.5 kg spool. Then ")
+    assert sentences == ["Ask Dr. Keenan Granland about the 3.5 kg spool."]
+
+
+def test_splitter_merges_short_fragments():
+    splitter = SentenceSplitter(min_length=10)
+    assert splitter.feed("Hi! Welcome along to the lab. ") == [
+        "Hi! Welcome along to the lab."
+    ]
+
+
+def test_splitter_splits_paragraphs():
+    splitter = SentenceSplitter()
+    assert splitter.feed("First paragraph here\n\nSecond") == ["First paragraph here"]
+
+
+# --- SpeechPipeline ---
+async def _deltas(parts, delay=0.0):
+    for part in parts:
+        await asyncio.sleep(delay)
+        yield part
+
+
+@pytest.mark.asyncio
+async def test_pipeline_plays_sentences_in_order():
+    played = []
+
+    async def synthesise(sentence):
+        # * later sentences finish synthesising first
+        await asyncio.sleep(0.02 if sentence.startswith("One") else 0)
+        for word in sentence.split():
+            yield word.encode()
+
+    async def play(chunk):
+        played.append(chunk.decode())
+
+    pipeline = SpeechPipeline(synthesise=synthesise, play=play)
+    text = await pipeline.run(
+        _deltas(["One sentence here. ", "Two sentences ", "here."]), asyncio.Event()
+    )
+
+    assert text == "One sentence here. Two sentences here."
+    assert played == ["One", "sentence", "here.", "Two", "sentences", "here."]
+
+
+@pytest.mark.asyncio
+async def test_pipeline_interrupt_cancels_streams():
+    stop_flag = asyncio.Event()
+    played = []
+
+    async def synthesise(sentence):
+        while True:
+            yield b"x"
+            await asyncio.sleep(0.01)
+
+    async def play(chunk):
+        played.append(chunk)
+        if len(played) == 3:
+            stop_flag.set()
+
+    async def endless():
+        while True:
+            yield "More words to say. "
+            await asyncio.sleep(0.01)
+
+    pipeline = SpeechPipeline(synthesise=synthesise, play=play)
+    await asyncio.wait_for(pipeline.run(endless(), stop_flag), timeout=1)
+    assert len(played) == 3
+
+
+@pytest.mark.asyncio
+async def test_pipeline_raises_synthesis_errors():
+    async def synthesise(sentence):
+        raise RuntimeError("tts failed")
+        yield b""
+
+    async def play(chunk):
+        pass
+
+    pipeline = SpeechPipeline(synthesise=synthesise, play=play)
+    with pytest.raises(RuntimeError, match="tts failed"):
+        await pipeline.run(_deltas(["A full sentence here."]), asyncio.Event())
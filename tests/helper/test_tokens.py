@@ -0,0 +1,20 @@
+import msm_assistant.utils.helper.tokens as tokens_mod
+from msm_assistant.utils.helper.tokens import count_tokens
+
+
+def test_count_tokens_empty():
+    assert count_tokens(None) == 0
+    assert count_tokens("") == 0
+
+
+def test_count_tokens_estimate_without_tiktoken(monkeypatch):
+    monkeypatch.setattr(tokens_mod, "_tiktoken", None)
+    assert count_tokens("abcd") == 1
+    assert count_tokens("abcde") == 2
+    assert count_tokens("x" * 400) == 100
+
+
+def test_count_tokens_grows_with_text():
+    short = count_tokens("The gantry has eight printers.")
+    long = count_tokens("The gantry has eight printers. " * 10)
+    assert 0 < short < long
@@ -0,0 +1,109 @@
+import os
+
+import numpy as np
+import pytest
+
+from msm_assistant.utils.helper.vector_index import VectorIndex
+
+
+def make_index():
+    return VectorIndex(
+        ids=["a", "b", "c", "d"],
+        vectors=np.array([[1, 0], [0, 3], [1, 1], [-1, 0]], dtype=np.float64),
+        payloads=[{"n": "a"}, {"n": "b"}, {"n": "c"}, {"n": "d"}],
+        version="v1",
+    )
+
+
+def test_vectors_are_normalised_float32():
+    index = make_index()
+    assert index.vectors.dtype == np.float32
+    assert np.allclose(np.linalg.norm(index.vectors, axis=1), 1.0)
+
+
+def test_search_returns_top_k_by_cosine_similarity():
+    results = make_index().search([2.0, 0.2], limit=2)
+    assert [result[0] for result in results] == ["a", "c"]
+    assert results[0][1] == pytest.approx(0.995, abs=1e-3)
+    assert results[0][2] == {"n": "a"}
+
+
+def test_search_limit_larger_than_index():
+    assert len(make_index().search([1.0, 0.0], limit=10)) == 4
+    assert make_index().search([1.0, 0.0], limit=0) == []
+
+
+def test_mismatched_lengths_raise():
+    with pytest.raises(ValueError):
+        VectorIndex(ids=[1], vectors=np.zeros((2, 2)), payloads=[{}])
+
+
+def test_snapshot_roundtrip(tmp_path):
+    path = tmp_path / "snapshots" / "index.npy"
+    assert VectorIndex.load(path) is None
+
+    make_index().save(path)
+    loaded = VectorIndex.load(path)
+    assert isinstance(loaded.vectors, np.memmap)
+    assert loaded.version == "v1"
+    assert loaded.ids == ["a", "b", "c", "d"]
+    assert [result[0] for result in loaded.search([0.0, 1.0], limit=1)] == ["b"]
+
+
+def test_snapshot_keeps_the_metadata(tmp_path):
+    path = tmp_path / "index.npy"
+    index = make_index()
+    index.metadata = {"name": "col", "embedding_model": "m", "dimensionality": 2}
+    index.save(path)
+
+    assert VectorIndex.load(path).metadata == index.metadata
+
+
+def test_snapshot_is_replaced_atomically(tmp_path, monkeypatch):
+    path = tmp_path / "index.npy"
+    make_index().save(path)
+    stale = VectorIndex.load(path)
+
+    replaced = []
+    replace = os.replace
+    monkeypatch.setattr(
+        os,
+        "replace",
+        lambda source, target: replaced.append(target) or replace(source, target),
+    )
+    index = make_index()
+    index.version = "v2"
+    index.save(path)
+
+    # * the sidecar (and its version) is replaced last, and no temporary file is left
+    assert replaced == [path.with_suffix(".npy"), path.with_suffix(".json")]
+    assert sorted(tmp_path.iterdir()) == [path.with_suffix(".json"), path]
+    assert VectorIndex.load(path).version == "v2"
+    assert [result[0] for result in stale.search([0.0, 1.0], limit=1)] == ["b"]
+
+
+def test_failed_save_keeps_the_previous_snapshot(tmp_path, monkeypatch):
+    path = tmp_path / "index.npy"
+    make_index().save(path)
+
+    def fail(file, vectors):
+        file.write(b"partial")
+        raise OSError("No space left on device")
+
+    monkeypatch.setattr(np, "save", fail)
+    index = make_index()
+    index.version = "v2"
+    with pytest.raises(OSError):
+        index.save(path)
+
+    monkeypatch.undo()
+    assert VectorIndex.load(path).version == "v1"
+    assert sorted(tmp_path.iterdir()) == [path.with_suffix(".json"), path]
+
+
+def test_mismatched_snapshot_is_ignored(tmp_path):
+    path = tmp_path / "index.npy"
+    make_index().save(path)
+    np.save(path, np.zeros((2, 2), dtype=np.float32))
+
+    assert VectorIndex.load(path) is None
@@ -0,0 +1,307 @@
+import asyncio
+import sys
+import time
+from types import SimpleNamespace
+
+import httpx
+import pytest
+
+# --- Import with the real clients, even if another test module stubbed them ---
+_modules = dict(sys.modules)
+for name in list(sys.modules):
+    if name.split(".")[0] in ("openai", "qdrant_client", "msm_assistant", "scripts"):
+        del sys.modules[name]
+
+import openai  # noqa: E402
+from qdrant_client import AsyncQdrantClient  # noqa: E402
+from qdrant_client.models import Distance, VectorParams  # noqa: E402
+
+from msm_assistant.utils.helper.tokens import count_tokens  # noqa: E402
+from scripts import add_collections  # noqa: E402
+from scripts.add_collections import Chunk, Database, Encoder  # noqa: E402
+from scripts.utils.interfaces import Collection, Summary  # noqa: E402
+
+# * restore the modules so that other test modules import their own stubs
+for name in list(sys.modules):
+    if name not in _modules and name.split(".")[0] in ("msm_assistant", "scripts"):
+        del sys.modules[name]
+sys.modules.update(_modules)
+
+
+class FakeEmbeddings:
+    def __init__(self, errors=()):
+        self.errors = list(errors)  # * raised by the first requests
+        self.calls = 0
+        self.in_flight = 0
+        self.max_in_flight = 0
+
+    async def create(self, input, model, dimensions=1):
+        self.calls += 1
+        if self.errors:
+            raise self.errors.pop(0)
+
+        self.in_flight += 1
+        self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        await asyncio.sleep(0.01)
+        self.in_flight -= 1
+        return SimpleNamespace(
+            data=[
+                SimpleNamespace(index=index, embedding=[float(len(text))] * dimensions)
+                for index, text in enumerate(input)
+            ]
+        )
+
+
+class FakeSpinner:
+    text = ""
+
+    def write(self, message):
+        pass
+
+
+def status_error(error_class, status, headers=None):
+    request = httpx.Request("POST", "https://api.openai.com/v1/embeddings")
+    response = httpx.Response(status, headers=headers, request=request)
+    return error_class(f"Error code: {status}", response=response, body=None)
+
+
+# --- Encoder ---
+@pytest.fixture
+def encoder(monkeypatch):
+    monkeypatch.setenv("OPENAI_API_KEY", "test")
+    encoder = Encoder("text-embedding-3-small")
+    encoder.INITIAL_BACKOFF = 0.001
+    return encoder
+
+
+def test_batches_are_limited_by_count(encoder):
+    encoder._batch_size = 2
+    batches = encoder._batch([f"chunk {i}" for i in range(5)])
+    assert [batch for batch, _ in batches] == [
+        ["chunk 0", "chunk 1"],
+        ["chunk 2", "chunk 3"],
+        ["chunk 4"],
+    ]
+
+
+def test_batches_are_limited_by_tokens(encoder):
+    chunks = ["word " * 40, "word " * 40, "word " * 40, "word " * 400]
+    tokens = [count_tokens(chunk, encoder.model) for chunk in chunks]
+    encoder._batch_tokens = tokens[0] * 2
+
+    batches = encoder._batch(chunks)
+    assert [len(batch) for batch, _ in batches] == [2, 1, 1]
+    assert [batch_tokens for _, batch_tokens in batches] == [
+        tokens[0] * 2,
+        tokens[2],
+        tokens[3],  # * an oversized chunk is still sent, on its own
+    ]
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize(
+    "error",
+    [
+        status_error(openai.RateLimitError, 429),
+        status_error(openai.InternalServerError, 500),
+        status_error(openai.InternalServerError, 503),
+    ],
+)
+async def test_rate_limit_and_server_errors_are_retried(encoder, error):
+    embeddings = FakeEmbeddings(errors=[error, error])
+    encoder._openai_client = SimpleNamespace(embeddings=embeddings)
+
+    assert await encoder._encode_batch(["abc"]) == [[3.0]]
+    assert embeddings.calls == 3
+
+
+@pytest.mark.asyncio
+async def test_other_client_errors_are_not_retried(encoder):
+    embeddings = FakeEmbeddings(errors=[status_error(openai.BadRequestError, 400)])
+    encoder._openai_client = SimpleNamespace(embeddings=embeddings)
+
+    with pytest.raises(openai.BadRequestError):
+        await encoder._encode_batch(["abc"])
+    assert embeddings.calls == 1
+
+
+@pytest.mark.asyncio
+async def test_retries_give_up_after_max_retries(encoder):
+    encoder.MAX_RETRIES = 2
+    embeddings = FakeEmbeddings(errors=[status_error(openai.RateLimitError, 429)] * 3)
+    encoder._openai_client = SimpleNamespace(embeddings=embeddings)
+
+    with pytest.raises(openai.RateLimitError):
+        await encoder._encode_batch(["abc"])
+    assert embeddings.calls == 3
+
+
+def test_retry_delay_honours_retry_after(encoder):
+    error = status_error(openai.RateLimitError, 429, headers={"retry-after": "7"})
+    for attempt in range(3):
+        assert 7.0 <= encoder._retry_delay(error, attempt) <= 8.0
+
+
+def test_retry_delay_backs_off_exponentially_up_to_a_cap(encoder):
+    encoder.INITIAL_BACKOFF = 1.0
+    error = status_error(openai.RateLimitError, 429)
+
+    for attempt in range(3):
+        backoff = 2**attempt
+        assert backoff / 2 <= encoder._retry_delay(error, attempt) <= backoff
+
+    delay = encoder._retry_delay(error, 20)
+    assert encoder.MAX_BACKOFF / 2 <= delay <= encoder.MAX_BACKOFF
+
+
+@pytest.mark.asyncio
+async def test_concurrency_is_shared_between_collections(monkeypatch):
+    monkeypatch.setenv("OPENAI_API_KEY", "test")
+    encoder = Encoder("text-embedding-3-small", batch_size=1, concurrency=2)
+    embeddings = FakeEmbeddings()
+    encoder._openai_client = SimpleNamespace(embeddings=embeddings)
+
+    first, second = await asyncio.gather(
+        encoder.encode_collection([f"a{i}" for i in range(6)]),
+        encoder.encode_collection([f"bb{i}" for i in range(6)]),
+    )
+
+    assert first == [[2.0]] * 6
+    assert second == [[3.0]] * 6
+    assert embeddings.max_in_flight == 2
+
+
+# --- Collection versions ---
+@pytest.fixture
+def database(monkeypatch):
+    monkeypatch.setenv("OPENAI_API_KEY", "test")
+    monkeypatch.setattr(
+        add_collections, "AsyncQdrantClient", lambda url: AsyncQdrantClient(":memory:")
+    )
+    encoder = Encoder("text-embedding-3-small", dimensions=2)
+    encoder._openai_client = SimpleNamespace(embeddings=FakeEmbeddings())
+    return Database(url="http://localhost:6333", encoder=encoder, retention=3600)
+
+
+async def create_collections(database, *names):
+    for name in names:
+        await database._qdrant_client.create_collection(
+            collection_name=name,
+            vectors_config=VectorParams(size=2, distance=Distance.COSINE),
+        )
+
+
+async def collection_names(database):
+    collections = await database._qdrant_client.get_collections()
+    return {collection.name for collection in collections.collections}
+
+
+@pytest.mark.asyncio
+async def test_swap_alias_points_at_the_new_version(database):
+    await create_collections(database, "col__v1", "col__v2")
+
+    await database._swap_alias("col", "col__v1")
+    assert await database._resolve("col") == "col__v1"
+
+    await database._swap_alias("col", "col__v2")
+    assert await database._resolve("col") == "col__v2"
+    assert await collection_names(database) == {"col__v1", "col__v2"}
+
+
+@pytest.mark.asyncio
+async def test_swap_alias_replaces_an_unversioned_collection(database):
+    await create_collections(database, "col", "col__v1")
+
+    await database._swap_alias("col", "col__v1")
+    assert await database._resolve("col") == "col__v1"
+    assert await collection_names(database) == {"col__v1"}
+
+
+@pytest.mark.asyncio
+async def test_collect_garbage_ages_versions_from_when_they_were_replaced(database):
+    now = int(time.time() * 1000)
+    hour = 3600 * 1000
+    live = f"col__v{now - 48 * hour}"  # * built long ago, but still live
+    recent = f"col__v{now - 47 * hour}"  # * built long ago, replaced recently
+    expired = f"col__v{now - 46 * hour}"  # * replaced longer ago than the retention
+    abandoned = f"col__v{now - 2 * hour}"  # * never went live
+    building = f"col__v{now}"
+    await create_collections(
+        database, live, recent, expired, abandoned, building, "other__v1"
+    )
+
+    await database._collect_garbage(
+        "col", live, {recent: now - hour // 2, expired: now - 2 * hour}
+    )
+    assert await collection_names(database) == {live, recent, building, "other__v1"}
+
+
+# --- Incremental updates ---
+def make_collection(*texts):
+    return Collection(
+        name="col",
+        description="Printer manuals",
+        summaries=[Summary(file="manual.pdf", chunks=list(texts))],
+    )
+
+
+async def ingest(database, collection, incremental=True):
+    await database._create_metadata_collection()
+    await database._process(
+        collection, incremental, add_collections.Progress(FakeSpinner())
+    )
+    return await database._read_metadata(collection.name)
+
+
+def record_upserts(database):
+    upserted = []
+    upsert = database._qdrant_client.upsert
+
+    async def record_upsert(collection_name, points, **kwargs):
+        if collection_name != "metadata":
+            upserted.extend(point.id for point in points)
+        return await upsert(collection_name=collection_name, points=points, **kwargs)
+
+    database._qdrant_client.upsert = record_upsert
+    return upserted
+
+
+def test_chunk_ids_are_content_addressed():
+    def chunk_id(text="Print at 210 C.", file="manual.pdf", collection="col"):
+        return Chunk(collection=collection, file=file, text=text).id
+
+    assert chunk_id() == chunk_id()
+    assert chunk_id() != chunk_id(text="Print at 215 C.")
+    assert chunk_id() != chunk_id(file="other.pdf")
+    assert chunk_id() != chunk_id(collection="other")
+
+
+@pytest.mark.asyncio
+async def test_incremental_update_only_touches_changed_chunks(database):
+    kept, stale, new = "Print PLA at 210 C.", "Dry PETG for 4 h.", "Level the bed."
+    first = await ingest(database, make_collection(kept, stale), incremental=False)
+    ids = {
+        text: Chunk(collection="col", file="manual.pdf", text=text).id
+        for text in (kept, stale, new)
+    }
+    assert await database._get_point_ids("col") == {ids[kept], ids[stale]}
+
+    upserted = record_upserts(database)
+    second = await ingest(database, make_collection(kept, new))
+
+    assert upserted == [ids[new]]
+    assert await database._get_point_ids("col") == {ids[kept], ids[new]}
+    assert second["collection"] == first["collection"]  # * updated in place
+    assert second["version"] != first["version"]
+
+
+@pytest.mark.asyncio
+async def test_incremental_update_without_changes_keeps_the_version(database):
+    texts = ("Print PLA at 210 C.", "Dry PETG for 4 h.")
+    first = await ingest(database, make_collection(*texts), incremental=False)
+
+    upserted = record_upserts(database)
+    second = await ingest(database, make_collection(*texts))
+
+    assert upserted == []
+    assert second["version"] == first["version"]
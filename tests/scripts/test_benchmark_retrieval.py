@@ -0,0 +1,84 @@
+import json
+import sys
+from types import SimpleNamespace
+
+import pytest
+
+# --- Import with the real clients, even if another test module stubbed them ---
+_modules = dict(sys.modules)
+for name in list(sys.modules):
+    if name.split(".")[0] in ("openai", "qdrant_client", "msm_assistant", "scripts"):
+        del sys.modules[name]
+
+from scripts.benchmark_retrieval import benchmark  # noqa: E402
+
+# * restore the modules so that other test modules import their own stubs
+for name in list(sys.modules):
+    if name not in _modules and name.split(".")[0] in ("msm_assistant", "scripts"):
+        del sys.modules[name]
+sys.modules.update(_modules)
+
+
+def make_arguments(tmp_path, **kwargs):
+    collection = tmp_path / "collection.json"
+    collection.write_text(
+        json.dumps(
+            {
+                "name": "col",
+                "description": "Printer manuals",
+                "summaries": [
+                    {
+                        "file": "manual.pdf",
+                        "chunks": [f"Step {step} of the manual." for step in range(12)],
+                    }
+                ],
+            }
+        )
+    )
+    return SimpleNamespace(
+        **{
+            "collection": str(collection),
+            "queries": None,
+            "sample": 5,
+            "embeddings": "synthetic",
+            "model": "text-embedding-3-small",
+            "cache": str(tmp_path / "embeddings.sqlite"),
+            "embed_missing": False,
+            "url": ":memory:",
+            "k": 3,
+            "dimensions": [None],
+            "quantization": [None],
+            "hnsw_ef": [None],
+            "hnsw_m": 16,
+            "ef_construct": 100,
+            "warmup": 1,
+            **kwargs,
+        }
+    )
+
+
+@pytest.mark.asyncio
+async def test_benchmark_report(tmp_path):
+    report = await benchmark(make_arguments(tmp_path, dimensions=[None, 64]))
+
+    assert report["points"] == 12
+    assert report["queries"] == 5
+    assert report["local"] is True
+    assert report["baseline"]["method"] == "numpy exact"
+
+    exact, shortened = report["results"]
+    assert set(exact) == {
+        "dimensions",
+        "quantization",
+        "hnsw_ef",
+        "recall@3",
+        "p50_ms",
+        "p95_ms",
+        "p99_ms",
+    }
+    assert exact["dimensions"] == 1536 and shortened["dimensions"] == 64
+    assert exact["p50_ms"] <= exact["p95_ms"] <= exact["p99_ms"]
+
+    # * unquantized full size search is exact, shortening may lose some neighbours
+    assert exact["recall@3"] == 1.0
+    assert 0.0 <= shortened["recall@3"] <= 1.0
@@ -0,0 +1,291 @@
+import io
+
+import pytest
+
+from msm_assistant.utils.helper.tokens import count_tokens
+from scripts import create_collection
+from scripts.create_collection import Journal, chunk_pages, split_pdf
+from scripts.utils.interfaces import Summary
+
+
+def make_pdf(page_count: int) -> bytes:
+    """A PDF whose page widths (100, 101, ...) identify each page."""
+    pypdf = pytest.importorskip("pypdf")
+    writer = pypdf.PdfWriter()
+    for index in range(page_count):
+        writer.add_blank_page(width=100 + index, height=100)
+    buffer = io.BytesIO()
+    writer.write(buffer)
+    return buffer.getvalue()
+
+
+def widths(data: bytes) -> list[int]:
+    pypdf = pytest.importorskip("pypdf")
+    return [
+        int(page.mediabox.width) for page in pypdf.PdfReader(io.BytesIO(data)).pages
+    ]
+
+
+# --- Journal ---
+def test_journal_resumes_unchanged_pdfs(tmp_path):
+    pdf = tmp_path / "manual.pdf"
+    pdf.write_bytes(b"%PDF-1.4 version 1")
+    journal = Journal(tmp_path / "collection.jsonl")
+    journal.append(
+        {
+            "path": "manual.pdf",
+            "model": "gemini-2.0-flash",
+            "sha256": create_collection.file_sha256(pdf),
+            **Summary(file="manual.pdf", chunks=["Print at 210 C."]).to_dict(),
+        }
+    )
+
+    digests = {"manual.pdf": create_collection.file_sha256(pdf)}
+    assert journal.read("gemini-2.0-flash", digests)["manual.pdf"].chunks == [
+        "Print at 210 C."
+    ]
+    assert journal.read("gemini-2.5-pro", digests) == {}
+
+
+def test_journal_skips_edited_pdfs(tmp_path):
+    pdf = tmp_path / "manual.pdf"
+    pdf.write_bytes(b"%PDF-1.4 version 1")
+    journal = Journal(tmp_path / "collection.jsonl")
+    journal.append(
+        {
+            "path": "manual.pdf",
+            "model": "gemini-2.0-flash",
+            "sha256": create_collection.file_sha256(pdf),
+            **Summary(file="manual.pdf", chunks=["Print at 210 C."]).to_dict(),
+        }
+    )
+
+    pdf.write_bytes(b"%PDF-1.4 version 2")
+    assert (
+        journal.read(
+            "gemini-2.0-flash", {"manual.pdf": create_collection.file_sha256(pdf)}
+        )
+        == {}
+    )
+
+
+def test_journal_forgets_failed_pdfs(tmp_path):
+    journal = Journal(tmp_path / "collection.jsonl")
+    entry = {"path": "manual.pdf", "model": "gemini-2.0-flash", "sha256": "abc"}
+    journal.append({**entry, **Summary(file="manual.pdf", chunks=["a"]).to_dict()})
+    journal.append({**entry, "error": "quota exceeded"})
+
+    assert journal.read("gemini-2.0-flash", {"manual.pdf": "abc"}) == {}
+
+
+# --- Summary cache ---
+def cache_key(data=b"%PDF-1.4", model="gemini-2.0-flash", prompt="Summarise."):
+    return create_collection.SummaryCache.key(data, model, prompt)
+
+
+def test_summary_cache_misses_then_hits(tmp_path):
+    cache = create_collection.SummaryCache(tmp_path / "summaries.sqlite")
+    assert cache.get(cache_key()) is None
+
+    cache.put(cache_key(), ["Print at 210 C."])
+    assert cache.get(cache_key()) == ["Print at 210 C."]
+    assert (cache.hits, cache.misses) == (1, 1)
+    cache.close()
+
+    # * and the summary survives a restart
+    cache = create_collection.SummaryCache(tmp_path / "summaries.sqlite")
+    assert cache.get(cache_key()) == ["Print at 210 C."]
+
+
+def test_summary_cache_key_changes_with_the_prompt_and_model(tmp_path):
+    cache = create_collection.SummaryCache(tmp_path / "summaries.sqlite")
+    cache.put(cache_key(), ["Print at 210 C."])
+
+    keys = [
+        cache_key(prompt="Summarise briefly."),
+        cache_key(model="gemini-1.5-pro"),
+        cache_key(data=b"%PDF-1.5"),
+        create_collection.SummaryCache.key(
+            b"%PDF-1.4", "gemini-2.0-flash", "Summarise.", pages=(1, 2)
+        ),
+    ]
+    assert len(set(keys + [cache_key()])) == 5
+    assert all(cache.get(key) is None for key in keys)
+
+
+def test_summary_cache_treats_a_corrupt_file_as_a_miss(tmp_path):
+    path = tmp_path / "summaries.sqlite"
+    path.write_bytes(b"not a database " * 100)
+
+    cache = create_collection.SummaryCache(path)
+    assert cache.get(cache_key()) is None
+    cache.put(cache_key(), ["Print at 210 C."])
+    assert cache.get(cache_key()) == ["Print at 210 C."]
+
+
+def test_summary_cache_treats_a_partial_file_as_a_miss(tmp_path):
+    path = tmp_path / "summaries.sqlite"
+    cache = create_collection.SummaryCache(path)
+    keys = [cache_key(data=str(index).encode()) for index in range(200)]
+    for key in keys:
+        cache.put(key, ["Print at 210 C. " * 10])
+    cache.close()
+    path.write_bytes(path.read_bytes()[: path.stat().st_size // 2])
+
+    cache = create_collection.SummaryCache(path)
+    assert all(cache.get(key) is None for key in keys)
+
+
+def test_summary_cache_treats_a_partial_entry_as_a_miss(tmp_path):
+    cache = create_collection.SummaryCache(tmp_path / "summaries.sqlite")
+    cache.put(cache_key(), ["Print at 210 C."])
+    cache._db.execute("UPDATE summaries SET chunks = ?", ('["Print at',))
+
+    assert cache.get(cache_key()) is None
+    assert cache.misses == 1
+
+
+# --- Summarising ---
+@pytest.mark.asyncio
+async def test_pdfs_can_be_summarised_outside_create(tmp_path, monkeypatch):
+    monkeypatch.setenv("GEMINI_API_KEY", "test")
+    factory = create_collection.CollectionFactory("col", concurrency=1)
+    requests = []
+
+    async def generate(data, model):
+        requests.append(data)
+        return ["Print at 210 C."]
+
+    factory._generate = generate
+    pdf = tmp_path / "manual.pdf"
+    pdf.write_bytes(b"%PDF-1.4")
+
+    summary = await factory._summarise(pdf, "gemini-2.0-flash")
+    assert summary.chunks == ["Print at 210 C."]
+    assert requests == [b"%PDF-1.4"]
+
+
+# --- Splitting PDFs ---
+def test_split_pdf_keeps_pages_in_order_and_under_the_limit():
+    data = make_pdf(20)
+    max_bytes = len(data) // 3
+
+    parts = split_pdf(data, max_bytes)
+
+    assert len(parts) > 1
+    assert all(len(part) <= max_bytes for _, _, part in parts)
+    assert [first for first, _, _ in parts] == [1] + [
+        last + 1 for _, last, _ in parts[:-1]
+    ]
+    assert parts[-1][1] == 20
+    assert [width for _, _, part in parts for width in widths(part)] == list(
+        range(100, 120)
+    )
+
+
+def test_split_pdf_keeps_small_pdfs_whole():
+    data = make_pdf(3)
+    assert [(first, last) for first, last, _ in split_pdf(data, len(data) * 2)] == [
+        (1, 3)
+    ]
+
+
+def test_split_pdf_rejects_oversized_pages():
+    with pytest.raises(create_collection.CollectionError):
+        split_pdf(make_pdf(2), 10)
+
+
+# --- Local chunking ---
+PAGES = [
+    " ".join(f"Step {page}.{step} of the printer manual." for step in range(12))
+    for page in range(1, 4)
+]
+
+
+def sentence_tokens(chunk: str) -> int:
+    return sum(
+        count_tokens(sentence, create_collection.CHUNK_TOKENIZER_MODEL)
+        for sentence in create_collection.SENTENCE_BOUNDARY.split(chunk)
+    )
+
+
+def test_chunk_pages_are_bounded_and_in_page_order():
+    chunks, pages = chunk_pages(PAGES, max_tokens=40, overlap=0)
+
+    assert len(chunks) > 3
+    assert all(sentence_tokens(chunk) <= 40 for chunk in chunks)
+    assert " ".join(chunks) == " ".join(PAGES)  # * no overlap, nothing lost
+    assert pages[0][0] == 1 and pages[-1][1] == 3
+    assert all(first <= last for first, last in pages)
+    assert [first for first, _ in pages] == sorted(first for first, _ in pages)
+
+
+def test_chunk_pages_overlap():
+    chunks, _ = chunk_pages(PAGES, max_tokens=40, overlap=12)
+
+    for previous, chunk in zip(chunks, chunks[1:]):
+        last_sentence = create_collection.SENTENCE_BOUNDARY.split(previous)[-1]
+        assert chunk.startswith(last_sentence)
+        assert sentence_tokens(chunk) <= 40
+
+
+def test_chunk_pages_split_long_sentences_on_words():
+    chunks, pages = chunk_pages(["word " * 100], max_tokens=20, overlap=0)
+
+    assert len(chunks) > 1
+    assert all(
+        count_tokens(chunk, create_collection.CHUNK_TOKENIZER_MODEL) <= 20
+        for chunk in chunks
+    )
+    assert " ".join(chunks).split() == ["word"] * 100
+    assert pages == [[1, 1]] * len(chunks)
+
+
+def make_text_pdf(pages: list[str]) -> bytes:
+    """A PDF with one line of Helvetica text on each page."""
+    pypdf = pytest.importorskip("pypdf")
+    from pypdf.generic import DecodedStreamObject, DictionaryObject, NameObject
+
+    writer = pypdf.PdfWriter()
+    font = writer._add_object(
+        DictionaryObject(
+            {
+                NameObject("/Type"): NameObject("/Font"),
+                NameObject("/Subtype"): NameObject("/Type1"),
+                NameObject("/BaseFont"): NameObject("/Helvetica"),
+            }
+        )
+    )
+    for text in pages:
+        page = writer.add_blank_page(width=2000, height=100)
+        page[NameObject("/Resources")] = DictionaryObject(
+            {NameObject("/Font"): DictionaryObject({NameObject("/F1"): font})}
+        )
+        content = DecodedStreamObject()
+        content.set_data(f"BT /F1 10 Tf 10 50 Td ({text}) Tj ET".encode())
+        page[NameObject("/Contents")] = writer._add_object(content)
+    buffer = io.BytesIO()
+    writer.write(buffer)
+    return buffer.getvalue()
+
+
+@pytest.mark.asyncio
+async def test_local_chunker_creates_a_collection(tmp_path):
+    (tmp_path / "manual.pdf").write_bytes(make_text_pdf(PAGES))
+    (tmp_path / "blank.pdf").write_bytes(make_pdf(1))
+
+    chunker = create_collection.LocalChunker(
+        "col", "Printer manuals", max_tokens=40, overlap=12, workers=1
+    )
+    collection = (await chunker.create(tmp_path)).to_dict()
+
+    # * the blank PDF has no text and is left out
+    assert collection["name"] == "col"
+    assert collection["description"] == "Printer manuals"
+    [summary] = collection["summaries"]
+    assert summary["file"] == "manual.pdf"
+    assert len(summary["chunks"]) == len(summary["pages"]) > 3
+    assert summary["chunks"][0].startswith("Step 1.0 of the printer manual.")
+    assert "Step 3.11 of the printer manual." in summary["chunks"][-1]
+    assert summary["pages"][0][0] == 1 and summary["pages"][-1][1] == 3
+    assert all(sentence_tokens(chunk) <= 40 for chunk in summary["chunks"])
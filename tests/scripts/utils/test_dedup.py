@@ -0,0 +1,54 @@
+import pytest
+
+from scripts.utils import dedup
+from scripts.utils.dedup import _bands, jaccard, near_duplicates, shingles
+
+PLA = "Print PLA at 210 C with the bed at 60 C and the fan at full speed."
+PETG = "Print PETG at 210 C with the bed at 60 C and the fan at full speed."
+
+
+# --- Shingles ---
+def test_shingles_ignore_case_and_punctuation():
+    assert shingles("Hello, World!") == shingles("hello world")
+    assert jaccard(shingles(PLA), shingles(PLA.upper())) == 1.0
+
+
+# --- Bands ---
+@pytest.mark.parametrize("threshold", [0.5, 0.85, 0.9, 1.0])
+def test_bands_split_the_signature_below_the_threshold(threshold):
+    bands, rows = _bands(128, threshold)
+    assert bands * rows == 128
+    assert (1 / bands) ** (1 / rows) <= dedup.LSH_MARGIN * threshold
+
+
+def test_bands_fall_back_to_single_rows():
+    assert _bands(128, 0.001) == (128, 1)
+
+
+# --- Near duplicates ---
+def test_near_duplicates_groups_copies():
+    texts = [PLA, "Store spools in a dry box.", PLA.replace(".", "!")]
+    assert near_duplicates(texts, 0.9) == [[0, 2], [1]]
+
+
+def test_near_duplicates_keeps_different_materials_apart():
+    assert near_duplicates([PLA, PETG], 0.9) == [[0], [1]]
+
+
+def test_near_duplicates_keeps_different_numbers_apart():
+    assert near_duplicates([PLA, PLA.replace("210", "215")], 0.5) == [[0], [1]]
+
+
+def test_near_duplicates_are_led_by_the_longest_text():
+    assert near_duplicates([PLA, PLA + " "], 0.9) == [[1, 0]]
+
+
+def test_near_duplicates_does_not_chain():
+    cold = "Level the bed before every print and clean the nozzle with a brass brush when cold."
+    warm = cold.replace("cold", "warm")
+    each = warm.replace("every", "each")
+    assert jaccard(shingles(cold), shingles(warm)) >= 0.8
+    assert jaccard(shingles(warm), shingles(each)) >= 0.8
+    assert jaccard(shingles(cold), shingles(each)) < 0.8
+
+    assert near_duplicates([cold, warm, each], 0.8) == [[0, 1], [2]]
@@ -0,0 +1,455 @@
+import asyncio
+import json
+import sys
+import types
+from pathlib import Path
+from types import SimpleNamespace
+
+import pytest
+
+# --- Stub out PortAudio and the X server before importing the module under test ---
+_modules = dict(sys.modules)
+
+fake_sounddevice = types.ModuleType("sounddevice")
+fake_pynput = types.ModuleType("pynput")
+fake_pynput.keyboard = SimpleNamespace(Listener=None, Key=None, KeyCode=None)
+sys.modules["sounddevice"] = fake_sounddevice
+sys.modules["pynput"] = fake_pynput
+# * the real openai client is needed even if another test module has stubbed it, and
+# * the package is imported afresh so that none of its modules are bound to the stubs
+for name in list(sys.modules):
+    if name.split(".")[0] in ("openai", "msm_assistant"):
+        del sys.modules[name]
+
+from msm_assistant.utils import assistant as assistant_module  # noqa: E402
+from msm_assistant.utils.assistant import Assistant  # noqa: E402
+
+# * restore the modules so that other test modules import their own stubs
+for name in list(sys.modules):
+    if name not in _modules and name.split(".")[0] in (
+        "msm_assistant",
+        "sounddevice",
+        "pynput",
+    ):
+        del sys.modules[name]
+sys.modules.update(_modules)
+
+
+# --- Fakes ---
+def chunk(content=None, tool_calls=None, finish_reason=None):
+    delta = SimpleNamespace(content=content, tool_calls=tool_calls)
+    return SimpleNamespace(
+        choices=[SimpleNamespace(delta=delta, finish_reason=finish_reason)]
+    )
+
+
+def tool_delta(index, id=None, name=None, arguments=None):
+    return SimpleNamespace(
+        index=index,
+        id=id,
+        function=SimpleNamespace(name=name, arguments=arguments),
+    )
+
+
+def tool_call(id, name, arguments="{}"):
+    return {
+        "id": id,
+        "type": "function",
+        "function": {"name": name, "arguments": arguments},
+    }
+
+
+class FakeStream:
+    def __init__(self, chunks):
+        self._chunks = chunks
+        self.read = 0
+        self.closed = False
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        if self.read >= len(self._chunks):
+            raise StopAsyncIteration
+        self.read += 1
+        return self._chunks[self.read - 1]
+
+    async def close(self):
+        self.closed = True
+
+
+class FakeCompletions:
+    def __init__(self, replies):
+        self._replies = list(replies)
+        self.calls = []
+        self.streams = []
+
+    async def create(self, **kwargs):
+        self.calls.append(kwargs)
+        self.streams.append(FakeStream(self._replies.pop(0)))
+        return self.streams[-1]
+
+
+class FakeTool:
+    def __init__(self, name, result="{}", delay=0.0):
+        self._name = name
+        self._result = result
+        self._delay = delay
+        self.calls = []
+
+    def name(self):
+        return self._name
+
+    def get_definition(self):
+        return {"type": "function", "function": {"name": self._name}}
+
+    async def execute(self, args):
+        self.calls.append(args)
+        await asyncio.sleep(self._delay)
+        return self._result
+
+
+class FakeSoundBank:
+    def __init__(self, sample_rate):
+        pass
+
+    def load_package(self, package):
+        pass
+
+
+class FakeAudioEngine:
+    latency = 0.0
+
+    def __init__(self, sounds, sample_rate):
+        self.played = []
+
+    async def play(self, name, wait=True):
+        self.played.append(name)
+
+
+class FakeCaptureEngine:
+    position = 0
+    latency = 0.0
+
+    def __init__(self, sample_rate):
+        self.sample_rate = sample_rate
+
+
+class FakeController:
+    def __init__(self):
+        self.listeners = {}
+
+    async def add_listener(self, listener):
+        listener_id = len(self.listeners)
+        self.listeners[listener_id] = listener
+        return listener_id
+
+    async def remove_listener(self, listener_id):
+        self.listeners.pop(listener_id, None)
+
+    async def press(self, button):
+        for listener in list(self.listeners.values()):
+            await listener(button, assistant_module.State.PRESSED)
+
+
+class FakePublisher:
+    def __init__(self, read_state, **kwargs):
+        self._read_state = read_state
+        self.published = []
+
+    def notify(self, *args, **kwargs):
+        self.published.append(self._read_state())
+
+
+def make_config(additional=None, **chat):
+    return SimpleNamespace(
+        additional=additional or {},
+        chat=SimpleNamespace(
+            **{
+                "model": "gpt-4o",
+                "prompt": "You are a lab assistant.",
+                "max_steps": 4,
+                "max_tokens": 20000,
+                "max_duration": 20.0,
+                "context_budget": 8000,
+                "keep_turns": 2,
+                **chat,
+            }
+        ),
+        tools=SimpleNamespace(timeout_for=lambda name: 0.5),
+        opcua=SimpleNamespace(
+            url="opc.tcp://localhost:4840",
+            state_node_id="ns=2;s=State",
+            conversation_node_id="ns=2;s=Conversation",
+            publish_last=10,
+            publish_window=0.1,
+        ),
+        recording=SimpleNamespace(max_duration=5.0, pre_roll=0.3),
+    )
+
+
+async def until(predicate, timeout=1.0):
+    deadline = asyncio.get_running_loop().time() + timeout
+    while not predicate():
+        assert asyncio.get_running_loop().time() < deadline
+        await asyncio.sleep(0.01)
+
+
+@pytest.fixture
+def make_assistant(monkeypatch):
+    monkeypatch.setattr(assistant_module, "SoundBank", FakeSoundBank)
+    monkeypatch.setattr(assistant_module, "AudioEngine", FakeAudioEngine)
+    monkeypatch.setattr(assistant_module, "CaptureEngine", FakeCaptureEngine)
+    monkeypatch.setattr(assistant_module, "Keyboard", FakeController)
+    monkeypatch.setattr(assistant_module, "StatePublisher", FakePublisher)
+
+    def make(replies=(), tools=(), config=None):
+        completions = FakeCompletions(replies)
+        monkeypatch.setattr(
+            assistant_module,
+            "AsyncOpenAI",
+            lambda: SimpleNamespace(chat=SimpleNamespace(completions=completions)),
+        )
+        assistant = Assistant(config or make_config(), Path("."))
+        assistant._tools = {tool.name(): tool for tool in tools}
+        return assistant, completions
+
+    return make
+
+
+def add_user_message(assistant, content="What is the temperature?"):
+    assistant._conversation.add(
+        assistant_module.Message.create(
+            assistant_module.MessageRole.USER, content=content
+        )
+    )
+
+
+# --- Replies that start with text and then call tools ---
+@pytest.mark.asyncio
+async def test_text_followed_by_tool_calls_continues_the_tool_loop(make_assistant):
+    lookup = FakeTool("lookup", result='{"temperature":20}')
+    assistant, completions = make_assistant(
+        replies=[
+            [
+                chunk("Let me check that. "),
+                chunk(tool_calls=[tool_delta(0, id="call1", name="lookup")]),
+                chunk(tool_calls=[tool_delta(0, arguments="{}")]),
+                chunk(finish_reason="tool_calls"),
+            ],
+            [chunk("It is 20 degrees."), chunk(finish_reason="stop")],
+        ],
+        tools=[lookup],
+    )
+    add_user_message(assistant)
+
+    messages, assistant._args.response_stream = await assistant._generate_response(
+        assistant._conversation
+    )
+    assert messages == []  # * the reply started with text
+
+    preambles = []
+    text = "".join([delta async for delta in assistant._reply_text(preambles)])
+
+    assert text == "Let me check that. It is 20 degrees."
+    assert preambles == ["Let me check that. "]
+    assert lookup.calls == [{}]
+    assert assistant._conversation.to_messages()[2:] == [
+        {
+            "role": "assistant",
+            "content": "Let me check that. ",
+            "tool_calls": [tool_call("call1", "lookup")],
+        },
+        {"role": "tool", "tool_call_id": "call1", "content": '{"temperature":20}'},
+    ]
+    assert completions.calls[1]["messages"][-1]["role"] == "tool"
+
+
+@pytest.mark.asyncio
+async def test_speaking_records_only_the_final_reply(make_assistant, monkeypatch):
+    assistant, _ = make_assistant(
+        replies=[
+            [
+                chunk("Let me check that. "),
+                chunk(tool_calls=[tool_delta(0, id="call1", name="lookup")]),
+                chunk(finish_reason="tool_calls"),
+            ],
+            [chunk("It is 20 degrees."), chunk(finish_reason="stop")],
+        ],
+        tools=[FakeTool("lookup")],
+    )
+    add_user_message(assistant)
+    _, assistant._args.response_stream = await assistant._generate_response(
+        assistant._conversation
+    )
+
+    async def speak(deltas, stop_flag):
+        return "".join([delta async for delta in deltas])
+
+    async def start_idle():
+        pass
+
+    monkeypatch.setattr(assistant, "_generate_speech", speak)
+    monkeypatch.setattr(assistant, "_schedule_summary", lambda: None)
+    monkeypatch.setattr(assistant, "start_idle", start_idle)
+    await assistant.on_enter_speaking()
+
+    assert assistant._args.model_response == "Let me check that. It is 20 degrees."
+    assert assistant._conversation.to_messages()[-1] == {
+        "role": "assistant",
+        "content": "It is 20 degrees.",
+    }
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("fails", [False, True])
+async def test_speaking_closes_the_stream_before_the_next_state(
+    make_assistant, monkeypatch, fails
+):
+    assistant, completions = make_assistant(
+        replies=[[chunk("It is 20 degrees."), chunk(finish_reason="stop")]]
+    )
+    add_user_message(assistant)
+    _, assistant._args.response_stream = await assistant._generate_response(
+        assistant._conversation
+    )
+
+    async def speak(deltas, stop_flag):
+        if fails:
+            raise RuntimeError("The speech request failed")
+        return "".join([delta async for delta in deltas])
+
+    entered = []
+
+    async def start(state):
+        entered.append(state)
+        assert assistant._args.response_stream is None
+        assert all(stream.closed for stream in completions.streams)
+
+    monkeypatch.setattr(assistant, "_generate_speech", speak)
+    monkeypatch.setattr(assistant, "_schedule_summary", lambda: None)
+    monkeypatch.setattr(assistant, "start_idle", lambda: start("idle"))
+    monkeypatch.setattr(assistant, "start_error", lambda: start("error"))
+    await assistant.on_enter_speaking()
+
+    assert entered == ["error" if fails else "idle"]
+    assert assistant._controller.listeners == {}
+
+
+# --- Publishing the state ---
+@pytest.mark.asyncio
+async def test_entered_states_are_published(make_assistant, monkeypatch):
+    assistant, _ = make_assistant(config=make_config({"share_state": True}))
+
+    def record_audio(stop_flag, not_before):
+        stop_flag.wait()
+
+    monkeypatch.setattr(assistant, "_record_audio", record_audio)
+    task = asyncio.create_task(assistant.start_idle())
+    try:
+        await until(lambda: assistant._controller.listeners)
+        assert assistant._publisher.published == ["idle"]
+
+        await assistant._controller.press(assistant_module.Button.PRIMARY)
+        await until(lambda: assistant.state == "listening")
+        assert assistant._publisher.published == ["idle", "listening"]
+
+        await assistant._controller.press(assistant_module.Button.SECONDARY)
+        await until(lambda: len(assistant._publisher.published) == 3)
+        assert assistant._publisher.published == ["idle", "listening", "idle"]
+    finally:
+        task.cancel()
+        await asyncio.gather(task, return_exceptions=True)
+
+
+# --- Tool calls ---
+@pytest.mark.asyncio
+async def test_tool_results_keep_the_call_order(make_assistant):
+    slow = FakeTool("slow", result="slow result", delay=0.05)
+    fast = FakeTool("fast", result="fast result")
+    assistant, _ = make_assistant(tools=[slow, fast])
+
+    messages = await assistant._execute_tool_calls(
+        [
+            tool_call("call1", "slow", '{"a":1}'),
+            tool_call("call2", "fast", '{"b":2}'),
+        ]
+    )
+
+    assert slow.calls == [{"a": 1}] and fast.calls == [{"b": 2}]
+    assert [message.to_dict() for message in messages] == [
+        {"role": "tool", "tool_call_id": "call1", "content": "slow result"},
+        {"role": "tool", "tool_call_id": "call2", "content": "fast result"},
+    ]
+
+
+@pytest.mark.asyncio
+async def test_tool_failures_become_error_results(make_assistant):
+    assistant, _ = make_assistant(tools=[FakeTool("hang", delay=10.0)])
+    assistant._config.tools = SimpleNamespace(timeout_for=lambda name: 0.01)
+
+    messages = await assistant._execute_tool_calls(
+        [
+            tool_call("call1", "hang"),
+            tool_call("call2", "missing"),
+            tool_call("call3", "hang", "{not json"),
+        ]
+    )
+
+    errors = [json.loads(message.to_dict()["content"])["error"] for message in messages]
+    assert [message.to_dict()["tool_call_id"] for message in messages] == [
+        "call1",
+        "call2",
+        "call3",
+    ]
+    assert "timed out after 0.01s" in errors[0]
+    assert "No tool named 'missing'" in errors[1]
+    assert errors[2].startswith("The tool failed")
+
+
+def tool_call_reply(id, name):
+    return [
+        chunk(tool_calls=[tool_delta(0, id=id, name=name, arguments="{}")]),
+        chunk(finish_reason="tool_calls"),
+    ]
+
+
+@pytest.mark.asyncio
+async def test_step_budget_forces_a_reply(make_assistant):
+    lookup = FakeTool("lookup")
+    assistant, completions = make_assistant(
+        replies=[
+            tool_call_reply("call1", "lookup"),
+            [chunk("It is 20 degrees."), chunk(finish_reason="stop")],
+        ],
+        tools=[lookup],
+        config=make_config(max_steps=2),
+    )
+    add_user_message(assistant)
+
+    messages, stream = await assistant._generate_response(assistant._conversation)
+
+    assert len(lookup.calls) == 1
+    assert [message.to_dict()["role"] for message in messages] == ["assistant", "tool"]
+    assert [call["tool_choice"] for call in completions.calls] == ["auto", "none"]
+    assert "".join([delta async for delta in stream.text()]) == "It is 20 degrees."
+
+
+@pytest.mark.asyncio
+async def test_token_budget_forces_a_reply(make_assistant):
+    lookup = FakeTool("lookup")
+    usage = SimpleNamespace(choices=[], usage=SimpleNamespace(total_tokens=500))
+    assistant, completions = make_assistant(
+        replies=[
+            tool_call_reply("call1", "lookup") + [usage],
+            [chunk("Done."), chunk(finish_reason="stop")],
+        ],
+        tools=[lookup],
+        config=make_config(max_tokens=400),
+    )
+    add_user_message(assistant)
+
+    await assistant._generate_response(assistant._conversation)
+
+    assert len(lookup.calls) == 1
+    assert [call["tool_choice"] for call in completions.calls] == ["auto", "none"]
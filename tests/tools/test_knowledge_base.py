@@ -1,5 +1,6 @@
 # ─── tests/test_knowledge_base.py ───────────────────────────────────────────
 
+import json
 import sys
 import types
 
@@ -22,6 +23,11 @@ fake_models = types.SimpleNamespace(
     FieldCondition=lambda *a, **k: None,
     Filter=lambda *a, **k: None,
     MatchValue=lambda *a, **k: None,
+    QueryRequest=lambda **k: types.SimpleNamespace(**k),
+    SearchParams=type("SearchParams", (types.SimpleNamespace,), {}),
+    QuantizationSearchParams=type(
+        "QuantizationSearchParams", (types.SimpleNamespace,), {}
+    ),
     ScoredPoint=type("ScoredPoint", (), {}),
 )
 sys.modules["qdrant_client.models"] = fake_models
@@ -32,6 +38,7 @@ from types import SimpleNamespace  # noqa: E402
 # ─── NOW import your module under test ───────────────────────────────────────
 import pytest  # noqa: E402
 
+from msm_assistant.utils.helper.tokens import count_tokens  # noqa: E402
 from msm_assistant.utils.helper.tools.database_read import \
     DatabaseRead  # noqa: E402
 from msm_assistant.utils.helper.tools.database_read import \
@@ -46,11 +53,25 @@ def test_metadata_to_from_dict():
         "name": "foo",
         "embedding_model": "emb-model",
         "dimensionality": 42,
+        "version": None,
+        "dimensions": None,
+        "quantization": None,
+        "collection": None,
     }
     back = Metadata.from_dict(d)
     assert back.name == "foo"
     assert back.embedding_model == "emb-model"
     assert back.dimensionality == 42
+    assert back.version is None
+    assert back.dimensions is None
+    assert back.quantization is None
+
+
+def test_metadata_from_dict_with_version():
+    back = Metadata.from_dict(
+        {"name": "foo", "embedding_model": "m", "dimensionality": 2, "version": "v1"}
+    )
+    assert back.version == "v1"
 
 
 # ─── name() and get_definition() ────────────────────────────────────────────
@@ -61,8 +82,9 @@ def test_name_and_definition():
     assert fn["name"] == "search_knowledge_base"
     assert "Query a knowledge base" in fn["description"]
     params = fn["parameters"]
-    assert params["required"] == ["query", "limit"]
-    assert set(params["properties"]) == {"query", "limit"}
+    assert params["required"] == ["queries", "limit"]
+    assert set(params["properties"]) == {"queries", "limit"}
+    assert params["properties"]["queries"]["type"] == "array"
 
 
 # ─── init() ──────────────────────────────────────────────────────────────────
@@ -79,7 +101,7 @@ async def test_encode(monkeypatch):
     fake_resp = SimpleNamespace(data=[SimpleNamespace(embedding=[1, 2, 3])])
 
     async def fake_create(input, model):
-        assert input == "hello"
+        assert input == ["hello"]
         assert model == "emb-model"
         return fake_resp
 
@@ -89,3 +111,378 @@ async def test_encode(monkeypatch):
 
     emb = await kb._encode("hello")
     assert emb == [1, 2, 3]
+
+
+@pytest.mark.asyncio
+async def test_encode_uses_cache():
+    kb = DatabaseRead(url="u", collection="col")
+    kb._metadata = Metadata("col", "emb-model", 5)
+    calls = []
+
+    async def fake_create(input, model):
+        calls.append(input)
+        return SimpleNamespace(data=[SimpleNamespace(embedding=[1, 2, 3])])
+
+    kb._openai_client = SimpleNamespace(embeddings=SimpleNamespace(create=fake_create))
+
+    assert await kb._encode("How does the gantry work?") == [1, 2, 3]
+    assert await kb._encode("how does the gantry  work?") == [1, 2, 3]
+    assert calls == [["How does the gantry work?"]]
+    assert kb._cache.hits == 1
+
+
+# ─── local index ─────────────────────────────────────────────────────────────
+class FakeQdrant:
+    def __init__(self, points, version="v1", pages=2, collection=None, size=2):
+        self.points = points
+        self.version = version
+        self.pages = pages
+        self.collection = collection
+        self.size = size
+        self.scrolls = 0
+        self.scrolled = set()
+        self.queries = 0
+
+    async def scroll(self, collection_name, limit, offset=None, **kwargs):
+        if collection_name == "metadata":
+            payload = {
+                "name": "col",
+                "embedding_model": "emb-model",
+                "dimensionality": 2,
+                "version": self.version,
+                "collection": self.collection,
+            }
+            return [FakePoint(payload)], None
+
+        self.scrolls += 1
+        self.scrolled.add(collection_name)
+        start = offset or 0
+        size = -(-len(self.points) // self.pages)
+        page = self.points[start : start + size]
+        end = start + size
+        return page, (end if end < len(self.points) else None)
+
+    async def count(self, collection_name, exact):
+        return SimpleNamespace(count=len(self.points))
+
+    async def get_collection(self, collection_name):
+        params = SimpleNamespace(vectors=SimpleNamespace(size=self.size))
+        return SimpleNamespace(config=SimpleNamespace(params=params))
+
+    async def query_batch_points(self, collection_name, requests):
+        self.queries += 1
+        self.requests = requests
+        return [SimpleNamespace(points=[]) for _ in requests]
+
+
+def make_points():
+    return [
+        SimpleNamespace(id=1, vector=[1.0, 0.0], payload={"text": "x"}),
+        SimpleNamespace(id=2, vector=[0.0, 2.0], payload={"text": "y"}),
+        SimpleNamespace(id=3, vector=[1.0, 1.0], payload={"text": "xy"}),
+    ]
+
+
+def make_local_kb(qdrant, **kwargs):
+    kb = DatabaseRead(url="u", collection="col", local_index=True, **kwargs)
+    kb._qdrant_client = qdrant
+
+    async def fake_encode_many(queries):
+        return [[1.0, 0.1] for _ in queries]
+
+    kb._encode_many = fake_encode_many
+    return kb
+
+
+@pytest.mark.asyncio
+async def test_local_index_searches_in_process():
+    qdrant = FakeQdrant(make_points())
+    kb = make_local_kb(qdrant)
+    await kb.init()
+
+    results = json.loads(await kb.execute({"queries": ["q"], "limit": 2}))
+    assert [result["text"] for result in results] == ["x", "xy"]
+    assert qdrant.queries == 0
+    assert qdrant.scrolls == 2
+
+
+@pytest.mark.asyncio
+async def test_local_index_falls_back_when_collection_is_large():
+    qdrant = FakeQdrant(make_points())
+    kb = make_local_kb(qdrant, max_local_points=2)
+    await kb.init()
+
+    await kb.execute({"queries": ["q"], "limit": 2})
+    assert kb._index is None
+    assert qdrant.queries == 1
+
+
+@pytest.mark.asyncio
+async def test_local_index_snapshot_and_refresh(tmp_path):
+    snapshot = tmp_path / "index.npy"
+    qdrant = FakeQdrant(make_points())
+    kb = make_local_kb(qdrant, snapshot=snapshot, refresh_interval=0.0)
+    await kb.init()
+    assert snapshot.exists()
+
+    # a second instance loads the snapshot instead of scrolling
+    other = FakeQdrant(make_points())
+    kb2 = make_local_kb(other, snapshot=snapshot)
+    await kb2.init()
+    assert other.scrolls == 0
+    assert len(kb2._index) == 3
+
+    # a new metadata version rebuilds the index
+    qdrant.points = make_points()[:1]
+    qdrant.version = "v2"
+    results = json.loads(await kb.execute({"queries": ["q"], "limit": 5}))
+    assert [result["text"] for result in results] == ["x"]
+    assert kb._index.version == "v2"
+
+
+@pytest.mark.asyncio
+async def test_init_falls_back_to_the_snapshot_when_qdrant_is_down(tmp_path):
+    snapshot = tmp_path / "index.npy"
+    kb = make_local_kb(FakeQdrant(make_points()), snapshot=snapshot)
+    await kb.init()
+
+    class DownQdrant(FakeQdrant):
+        async def scroll(self, collection_name, limit, offset=None, **kwargs):
+            raise ConnectionError("Qdrant is unreachable")
+
+    down = DownQdrant(make_points())
+    kb2 = make_local_kb(down, snapshot=snapshot)
+    await kb2.init()
+    assert kb2._metadata.version == "v1"
+    assert kb2._metadata.dimensionality == 2
+
+    results = json.loads(await kb2.execute({"queries": ["q"], "limit": 1}))
+    assert [result["text"] for result in results] == ["x"]
+    assert down.queries == 0
+
+    # without a snapshot there is nothing to fall back to
+    with pytest.raises(ConnectionError):
+        await make_local_kb(down).init()
+
+
+# ─── replaced collections ────────────────────────────────────────────────────
+@pytest.mark.asyncio
+async def test_metadata_is_refreshed_without_a_local_index():
+    qdrant = FakeQdrant([])
+    kb = make_local_kb(qdrant, refresh_interval=0.0)
+    kb._local_index = False
+    await kb.init()
+    assert kb._metadata.version == "v1"
+
+    qdrant.version = "v2"
+    await kb.execute({"queries": ["q"], "limit": 2})
+    assert kb._metadata.version == "v2"
+    assert kb._index is None
+
+
+@pytest.mark.asyncio
+async def test_dimension_error_rereads_the_metadata():
+    qdrant = FakeQdrant([])
+    kb = make_local_kb(qdrant, refresh_interval=3600.0)
+    kb._local_index = False
+    await kb.init()
+
+    # the collection is rebuilt with another embedding size behind the alias
+    qdrant.version = "v2"
+    qdrant.size = 3
+    query_batch_points = qdrant.query_batch_points
+
+    async def fake_query_batch_points(collection_name, requests):
+        if qdrant.queries == 0:
+            qdrant.queries += 1
+            raise RuntimeError("Wrong input: Vector dimension error: expected dim: 3")
+        return await query_batch_points(collection_name, requests)
+
+    qdrant.query_batch_points = fake_query_batch_points
+    assert await kb.execute({"queries": ["q"], "limit": 2}) == "[]"
+    assert kb._metadata.version == "v2"
+    assert qdrant.queries == 2
+
+
+@pytest.mark.asyncio
+async def test_other_errors_are_raised_without_rereading_the_metadata():
+    qdrant = FakeQdrant([])
+    kb = make_local_kb(qdrant, refresh_interval=3600.0)
+    kb._local_index = False
+    await kb.init()
+
+    # the error mentions dimensions, but the collection still matches the metadata
+    qdrant.version = "v2"
+
+    async def fake_query_batch_points(collection_name, requests):
+        raise RuntimeError("Bad request: dimension of the payload index")
+
+    qdrant.query_batch_points = fake_query_batch_points
+    with pytest.raises(RuntimeError):
+        await kb.execute({"queries": ["q"], "limit": 2})
+    assert kb._metadata.version == "v1"
+
+
+@pytest.mark.asyncio
+async def test_local_index_mirrors_the_collection_named_by_the_metadata(tmp_path):
+    snapshot = tmp_path / "index.npy"
+    qdrant = FakeQdrant(make_points(), collection="col__v1")
+    kb = make_local_kb(qdrant, snapshot=snapshot, refresh_interval=0.0)
+    await kb.init()
+    assert qdrant.scrolled == {"col__v1"}
+
+    # the metadata of a rebuild is written before the alias is swapped
+    qdrant.scrolled.clear()
+    qdrant.version = "col__v2"
+    qdrant.collection = "col__v2"
+    await kb.execute({"queries": ["q"], "limit": 2})
+    assert qdrant.scrolled == {"col__v2"}
+    assert kb._index.version == "col__v2"
+
+
+# ─── multi-query search ──────────────────────────────────────────────────────
+@pytest.mark.asyncio
+async def test_encode_many_embeds_missing_queries_in_one_request():
+    kb = DatabaseRead(url="u", collection="col")
+    kb._metadata = Metadata("col", "emb-model", 5)
+    kb._cache.put("emb-model", "cached", [0, 0])
+    calls = []
+
+    async def fake_create(input, model):
+        calls.append(input)
+        return SimpleNamespace(
+            data=[SimpleNamespace(embedding=[i, i]) for i in range(len(input))]
+        )
+
+    kb._openai_client = SimpleNamespace(embeddings=SimpleNamespace(create=fake_create))
+
+    embeddings = await kb._encode_many(["a", "cached", "b", "a"])
+    assert calls == [["a", "b"]]
+    assert embeddings == [[0, 0], [0, 0], [1, 1], [0, 0]]
+
+
+@pytest.mark.asyncio
+async def test_execute_batches_queries_and_dedupes_by_point_id():
+    qdrant = FakeQdrant([])
+    kb = DatabaseRead(url="u", collection="col")
+    kb._metadata = Metadata("col", "emb-model", 2)
+    kb._qdrant_client = qdrant
+
+    async def fake_encode_many(queries):
+        return [[float(i), 1.0] for i, _ in enumerate(queries)]
+
+    async def fake_query_batch_points(collection_name, requests):
+        qdrant.requests = requests
+        point = lambda id, score: SimpleNamespace(  # noqa: E731
+            id=id, score=score, payload={"text": id}
+        )
+        return [
+            SimpleNamespace(points=[point("a", 0.9), point("b", 0.5)]),
+            SimpleNamespace(points=[point("b", 0.8), point("c", 0.4)]),
+        ]
+
+    kb._encode_many = fake_encode_many
+    qdrant.query_batch_points = fake_query_batch_points
+
+    results = json.loads(
+        await kb.execute({"queries": ["printers", "gantry"], "limit": 2})
+    )
+    assert [request.query for request in qdrant.requests] == [[0.0, 1.0], [1.0, 1.0]]
+    assert results == [
+        {"score": 0.9, "text": "a"},
+        {"score": 0.8, "text": "b"},
+        {"score": 0.4, "text": "c"},
+    ]
+
+
+# ─── projection and token budget ─────────────────────────────────────────────
+@pytest.mark.asyncio
+async def test_execute_caps_limit_and_projects_payload():
+    qdrant = FakeQdrant([])
+    kb = DatabaseRead(url="u", collection="col", max_limit=3, score_threshold=0.3)
+    kb._metadata = Metadata("col", "emb-model", 2)
+    kb._qdrant_client = qdrant
+
+    async def fake_encode_many(queries):
+        return [[1.0, 0.0] for _ in queries]
+
+    async def fake_query_batch_points(collection_name, requests):
+        qdrant.requests = requests
+        payload = {"text": "t", "file": "f.pdf", "page_image": "x" * 1000}
+        return [
+            SimpleNamespace(points=[SimpleNamespace(id=1, score=0.5, payload=payload)])
+        ]
+
+    kb._encode_many = fake_encode_many
+    qdrant.query_batch_points = fake_query_batch_points
+
+    output = await kb.execute({"queries": ["q"], "limit": 50})
+    (request,) = qdrant.requests
+    assert request.limit == 3
+    assert request.score_threshold == 0.3
+    assert request.with_payload == ["text", "file", "pages", "files"]
+    assert output == '[{"score":0.5,"text":"t","file":"f.pdf"}]'
+
+
+def test_pack_respects_token_budget():
+    kb = DatabaseRead(url="u", collection="col", max_tokens=40)
+    results = [{"score": 0.9 - i / 10, "text": "word " * 10} for i in range(5)]
+
+    packed = json.loads(kb._pack(results))
+    assert 0 < len(packed) < len(results)
+    assert packed == results[: len(packed)]
+
+
+def test_pack_truncates_an_oversized_first_result():
+    kb = DatabaseRead(url="u", collection="col", max_tokens=20)
+    output = kb._pack([{"score": 0.9, "text": "word " * 100}])
+    packed = json.loads(output)
+    assert len(packed) == 1
+    assert 0 < len(packed[0]["text"]) < 500
+    assert ("word " * 100).startswith(packed[0]["text"])
+    assert count_tokens(output) <= 20
+
+
+def test_pack_truncates_by_measured_tokens():
+    # * escaping doubles the length of the text once it is serialized
+    kb = DatabaseRead(url="u", collection="col", max_tokens=30)
+    output = kb._pack([{"score": 0.9, "text": '"\\' * 200, "file": "f.pdf"}])
+    packed = json.loads(output)
+    assert len(packed) == 1 and packed[0]["text"]
+    assert count_tokens(output) <= 30
+
+
+def test_pack_drops_a_result_without_room_for_any_text():
+    kb = DatabaseRead(url="u", collection="col", max_tokens=5)
+    assert kb._pack([{"score": 0.9, "text": "word " * 100, "file": "f.pdf"}]) == "[]"
+
+
+# ─── quantization and shortened embeddings ───────────────────────────────────
+@pytest.mark.asyncio
+async def test_encode_requests_recorded_dimensions():
+    kb = DatabaseRead(url="u", collection="col")
+    kb._metadata = Metadata("col", "emb-model", 256, dimensions=256)
+    calls = []
+
+    async def fake_create(input, model, **kwargs):
+        calls.append(kwargs)
+        return SimpleNamespace(data=[SimpleNamespace(embedding=[1.0] * 256)])
+
+    kb._openai_client = SimpleNamespace(embeddings=SimpleNamespace(create=fake_create))
+
+    await kb._encode("hello")
+    assert calls == [{"dimensions": 256}]
+
+    # embeddings of a different size are cached separately
+    kb._metadata = Metadata("col", "emb-model", 512, dimensions=512)
+    await kb._encode("hello")
+    assert calls[-1] == {"dimensions": 512}
+
+
+def test_search_params_rescore_quantized_collections():
+    kb = DatabaseRead(url="u", collection="col")
+    kb._metadata = Metadata("col", "emb-model", 2)
+    assert kb._search_params() is None
+
+    kb._metadata = Metadata("col", "emb-model", 2, quantization="binary")
+    assert kb._search_params().quantization.rescore is True